@@ -0,0 +1,652 @@
+# -*- coding: utf-8 -*-
+"""
+禁言插件辅助模块的压力测试与基准脚本 (不依赖 MaiBot 框架，可直接运行)。
+
+用法: python bench_mute.py [场景 ...]，不指定场景时运行全部。
+"""
+import asyncio
+import importlib
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime, timedelta
+
+_PACKAGE = "mute_and_unmute_bench"
+
+
+def _load(module: str):
+    """以包的形式加载 linglingbizui 目录下的辅助模块 (包的 __init__ 依赖框架，这里跳过它)。"""
+    if _PACKAGE not in sys.modules:
+        package = types.ModuleType(_PACKAGE)
+        package.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "linglingbizui")]
+        sys.modules[_PACKAGE] = package
+    return importlib.import_module(f"{_PACKAGE}.{module}")
+
+
+class _MemoryStorage:
+    """storage_api 本地存储的内存替身。"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+
+# --- 场景：并发禁言/解除 ---
+
+async def _stress_registry(streams: int = 50, tasks: int = 5000, cooldown: float = 30.0) -> None:
+    """
+    按命令与 Chatter 中的调用顺序并发修改注册表：别名禁言 (mute_if_extends)、别名解除 (unmute)、
+    @ 解除 (unmute_if_muted) 与批量禁言/解除 (mute_many / unmute_many)，每次修改后立即把提示放入发送队列。
+    修改与入队之间没有 await；每次修改的返回值与最终状态都和一份独立维护的期望状态对照。
+    """
+    registry_module = _load("mute_registry")
+    journal_module = _load("mute_journal")
+    sender = _load("notice_sender")
+
+    async def fake_send(text, stream_id):
+        await asyncio.sleep(random.random() / 1000)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = registry_module.MuteRegistry()
+        journal = journal_module.MuteJournal(os.path.join(tmp, "journal.jsonl"))
+        registry.bind_storage(_MemoryStorage(), journal=journal, compact_threshold=10 ** 9, flush_window_ms=5)
+        queue = sender.NoticeQueue(max_concurrency=8, rate_per_second=0, per_stream_rate=0, max_pending_per_stream=tasks)
+        queue.bind(fake_send)
+
+        stream_ids = [f"stream-{i}" for i in range(streams)]
+        expected = {}
+        violations = 0
+        op_counts = {}
+
+        def check(op: str, result, want) -> None:
+            nonlocal violations
+            op_counts[op] = op_counts.get(op, 0) + 1
+            if result != want:
+                violations += 1
+
+        def alias_mute(stream_id: str, now: float) -> None:
+            deadline = now + random.choice((60, 600, 3600))
+            current = expected.get(stream_id)
+            want = not (current is not None and current > now and deadline <= current + cooldown)
+            if want:
+                expected[stream_id] = deadline
+            check("mute_if_extends", registry.mute_if_extends(stream_id, deadline, cooldown, now=now), want)
+            if want:
+                queue.notify(stream_id, "好的，我将保持安静。")
+
+        def alias_unmute(stream_id: str, now: float) -> None:
+            want = expected.pop(stream_id, None) is not None
+            check("unmute", registry.unmute(stream_id), want)
+            queue.notify(stream_id, "好的，我恢复发言了！" if want else "我当前并未被禁言哦。")
+
+        def at_unmute(stream_id: str, now: float) -> None:
+            current = expected.get(stream_id)
+            want = current is not None and now < current
+            if want:
+                del expected[stream_id]
+            check("unmute_if_muted", registry.unmute_if_muted(stream_id, now), want)
+            if want:
+                queue.notify(stream_id, "收到 @，我恢复发言了！")
+
+        def bulk_mute(stream_id: str, now: float) -> None:
+            selected = random.sample(stream_ids, random.randint(1, streams))
+            deadline = now + 600
+            for sid in selected:
+                expected[sid] = deadline
+            check("mute_many", registry.mute_many(selected, deadline), selected)
+            for sid in selected:
+                queue.notify(sid, "好的，我将保持安静。")
+
+        def bulk_unmute(stream_id: str, now: float) -> None:
+            selected = random.sample(stream_ids, random.randint(1, streams))
+            want = [sid for sid in selected if expected.pop(sid, None) is not None]
+            check("unmute_many", registry.unmute_many(selected), want)
+            for sid in want:
+                queue.notify(sid, "好的，我恢复发言了！")
+
+        handlers = (alias_mute,) * 8 + (alias_unmute,) * 4 + (at_unmute,) * 4 + (bulk_mute, bulk_unmute)
+
+        async def worker(seq: int) -> None:
+            # 模拟消息到达的先后，各协程在不同时刻进入处理器
+            await asyncio.sleep(random.random() / 100)
+            random.choice(handlers)(random.choice(stream_ids), time.time())
+            # 处理器返回前的其他 await (例如发送回复)
+            await asyncio.sleep(random.random() / 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(tasks)))
+        elapsed = time.perf_counter() - start
+        registry.flush()
+        while queue.pending():
+            await asyncio.sleep(0.01)
+        await queue.shutdown()
+
+        # 最终状态应与期望状态一致，且能从日志完整恢复
+        mismatched = expected != registry.muted_streams
+        restored = registry_module.MuteRegistry()
+        restored.bind_storage(_MemoryStorage(), journal=journal_module.MuteJournal(journal.path))
+        replay_mismatched = restored.muted_streams != registry.muted_streams
+        stats = registry.flush_stats()
+        registry.close()
+        restored.close()
+
+    print(f"[stress] {tasks} coroutines over {streams} streams in {elapsed * 1000:.1f} ms, "
+          f"{int(stats['flush_count'])} flushes, {queue.sent} notices sent")
+    print(f"[stress] ops: {', '.join(f'{op}={count}' for op, count in sorted(op_counts.items()))}")
+    print(f"[stress] unexpected results={violations}, final state mismatch={mismatched}, "
+          f"journal replay mismatch={replay_mismatched}")
+    if violations or mismatched or replay_mismatched:
+        raise SystemExit(1)
+
+
+# --- 场景：批量解除禁言后的主动思考 ---
+
+async def _thinking_pool(streams: int = 200, duplicates: int = 3, latency: float = 0.02) -> None:
+    pool_module = _load("thinking_pool")
+    pool = pool_module.ThinkingPool(max_concurrency=4, timeout=1.0, max_pending=streams)
+    running = peak = 0
+
+    async def fake_generation() -> None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            running -= 1
+
+    start = time.perf_counter()
+    for _ in range(duplicates):
+        for i in range(streams):
+            pool.submit(f"stream-{i}", fake_generation)
+    submit_elapsed = time.perf_counter() - start
+    while pool.pending():
+        await asyncio.sleep(latency)
+    drain_elapsed = time.perf_counter() - start
+
+    print(f"[thinking] {streams * duplicates} triggers submitted in {submit_elapsed * 1000:.2f} ms, "
+          f"drained in {drain_elapsed * 1000:.1f} ms")
+    print(f"[thinking] accepted={pool.submitted}, merged={pool.deduplicated}, rejected={pool.rejected}, "
+          f"peak concurrency={peak} (limit {pool.max_concurrency})")
+    if peak > pool.max_concurrency or pool.submitted != streams:
+        raise SystemExit(1)
+
+
+# --- 场景：@ 提及扫描 ---
+
+class _Seg:
+    __slots__ = ("type", "data")
+
+    def __init__(self, type, data):
+        self.type = type
+        self.data = data
+
+
+def _extract_at_ids_recursive(segment):
+    """旧实现：递归提取全部 @ 的ID，每层构建新列表 (仅用于对比)。"""
+    ids = []
+    if segment.type == "at":
+        at_data = segment.data
+        if isinstance(at_data, str):
+            parts = at_data.split(":", 1)
+            ids.append(parts[1] if len(parts) == 2 else at_data)
+        elif isinstance(at_data, dict) and 'qq' in at_data:
+            ids.append(str(at_data['qq']))
+    elif segment.type == "seglist" and isinstance(segment.data, list):
+        for sub_seg in segment.data:
+            ids.extend(_extract_at_ids_recursive(sub_seg))
+    return ids
+
+
+def _deep_tree(depth: int, bot_id: str) -> _Seg:
+    segment = _Seg("seglist", [_Seg("at", f"绫绫:{bot_id}"), _Seg("text", "hi")])
+    for i in range(depth):
+        segment = _Seg("seglist", [_Seg("at", f"user{i}:{10000 + i}"), _Seg("text", "转发"), segment])
+    return segment
+
+
+def _wide_tree(width: int, bot_id: str) -> _Seg:
+    segments = [_Seg("seglist", [_Seg("text", "hello"), _Seg("at", f"user{i}:{10000 + i}")]) for i in range(width)]
+    segments.insert(width // 2, _Seg("at", {"qq": int(bot_id)}))
+    return _Seg("seglist", segments)
+
+
+def _time_call(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+async def _mention_scan(repeat: int = 200) -> None:
+    scanner = _load("mention_scanner")
+    bot_id = "123456"
+    targets = (bot_id,)
+    trees = {
+        "deep(500)": _deep_tree(500, bot_id),
+        "wide(5000)": _wide_tree(5000, bot_id),
+        "no-bot wide(5000)": _wide_tree(5000, "999999"),
+    }
+    for name, tree in trees.items():
+        expected = bot_id in _extract_at_ids_recursive(tree)
+        if scanner.mentions_any(tree, targets) != expected:
+            print(f"[mentions] {name}: result mismatch")
+            raise SystemExit(1)
+        if list(scanner.iter_mentions(tree)) != _extract_at_ids_recursive(tree):
+            print(f"[mentions] {name}: iter_mentions order mismatch")
+            raise SystemExit(1)
+        old_us = _time_call(lambda: bot_id in _extract_at_ids_recursive(tree), repeat)
+        new_us = _time_call(lambda: scanner.mentions_any(tree, targets), repeat)
+        print(f"[mentions] {name:<18} recursive {old_us:9.1f} us   iterative {new_us:9.1f} us   ({old_us / new_us:.1f}x)")
+
+    # 递归实现受解释器递归深度限制，迭代实现不受影响
+    very_deep = _deep_tree(5000, bot_id)
+    print(f"[mentions] deep(5000) iterative hit={scanner.mentions_any(very_deep, targets)}")
+
+    # 快速路径的预判：只要完整检查会命中，预判就不能返回 False (@ 段不出现在文本里也一样)
+    messages = {
+        "at segment, no '@' in text": types.SimpleNamespace(
+            processed_plain_text="在吗", message_segment=_Seg("seglist", [_Seg("text", "在吗"), _Seg("at", bot_id)])),
+        "mentioned_user_ids only": types.SimpleNamespace(
+            processed_plain_text="在吗", mentioned_user_ids=[int(bot_id)], message_segment=_Seg("text", "在吗")),
+        "nested at segment": types.SimpleNamespace(processed_plain_text="", message_segment=_deep_tree(50, bot_id)),
+        "no message_segment": types.SimpleNamespace(processed_plain_text="在吗"),
+        "plain text with '@'": types.SimpleNamespace(
+            processed_plain_text="邮箱 a@b.com", message_segment=_Seg("text", "邮箱 a@b.com")),
+    }
+    for name, message in messages.items():
+        may_mention = scanner.message_may_mention(message)
+        mentioned = scanner.message_mentions(message, targets)
+        print(f"[mentions] may_mention={may_mention!s:<5} mentions bot={mentioned!s:<5} {name}")
+        if mentioned and not may_mention:
+            print(f"[mentions] {name}: fast-path pre-check would skip an @Bot")
+            raise SystemExit(1)
+    if scanner.message_may_mention(messages["plain text with '@'"]):
+        print("[mentions] plain '@' in text should not force the full path")
+        raise SystemExit(1)
+
+
+# --- 场景：时长解析 ---
+
+def _parse_duration_regex(duration_str: str):
+    """旧实现：三个正则依次匹配分钟、小时、天，只取第一个命中的单位 (仅用于对比)。"""
+    match = re.search(r'(\d+)\s*(m|min|分钟)', duration_str, re.IGNORECASE)
+    if match:
+        return int(match.group(1))
+    match = re.search(r'(\d+)\s*(h|hour|小时)', duration_str, re.IGNORECASE)
+    if match:
+        return int(match.group(1)) * 60
+    match = re.search(r'(\d+)\s*(d|day|天)', duration_str, re.IGNORECASE)
+    if match:
+        return int(match.group(1)) * 1440
+    return None
+
+
+_DURATION_UNITS = (
+    (("天", "d", "day", "days"), 1440),
+    (("小时", "h", "hr", "hours"), 60),
+    (("分钟", "分", "m", "min", "minutes"), 1),
+)
+
+_CN_NUMERALS = "一二三四五六七八九"
+
+
+def _cn_numeral(n: int) -> str:
+    """1-99 的中文写法：五、十、十五、三十、三十五。"""
+    tens, ones = divmod(n, 10)
+    if not tens:
+        return _CN_NUMERALS[ones - 1]
+    return ("" if tens == 1 else _CN_NUMERALS[tens - 1]) + "十" + (_CN_NUMERALS[ones - 1] if ones else "")
+
+
+async def _duration_parse(cases: int = 5000, repeat: int = 20000) -> None:
+    parser = _load("duration_parser")
+    parse = parser.parse_duration_minutes
+    rng = random.Random(20)
+
+    # 随机组合 "数字 + 单位" 段 (阿拉伯数字或中文数字，可带单位后的“半”)，已知总时长，解析结果必须一致
+    for _ in range(cases):
+        total = 0
+        parts = []
+        for units, minutes in rng.sample(_DURATION_UNITS, rng.randint(1, len(_DURATION_UNITS))):
+            amount = rng.randint(1, 99)
+            number = _cn_numeral(amount) if rng.random() < 0.5 else str(amount)
+            half = rng.random() < 0.2
+            total += (amount + 0.5 * half) * minutes
+            parts.append(f"{number}{rng.choice(('', ' '))}{rng.choice(units)}{'半' if half else ''}")
+        text = "".join(parts)
+        if parse.__wrapped__(text) != total:
+            print(f"[duration] {text!r}: expected {total}, got {parse.__wrapped__(text)}")
+            raise SystemExit(1)
+
+    # 零时长、未知单位、格式有误的中文数字、时长以外的内容与超长时长必须被拒绝
+    for text in ("0m", "0分钟", "0.001s", "5ms", "3mo", "1h5ms", "十十分钟", "三五分钟", "分钟",
+                 ".5h", "1e3s", "10分钟吧", "123456789012345678901234567890d"):
+        if parse.__wrapped__(text) is not None:
+            print(f"[duration] {text!r}: expected None, got {parse.__wrapped__(text)}")
+            raise SystemExit(1)
+
+    # 随机字符串不能抛出异常，解析出的时长必须能换算为截止时间 (与插件中的 datetime.now() + timedelta 相同)
+    alphabet = "0123456789.半个一两三十天小时分钟秒dhmsinour :"
+    for _ in range(cases):
+        minutes = parse.__wrapped__("".join(rng.choice(alphabet) for _ in range(rng.randint(0, 32))))
+        if minutes is not None:
+            datetime.now() + timedelta(minutes=minutes)
+    print(f"[duration] {cases} random compound durations parsed correctly, {cases} random strings without error")
+
+    for text in ("10min", "1小时30分钟", "1h30m", "1.5h", "半小时", "三十分钟", "一分半", "90s"):
+        print(f"[duration] {text!r:<14} regex={_parse_duration_regex(text)!s:<5} tokenizer={parse(text)}")
+
+    samples = ["10min", "30分钟", "1小时30分钟", "1h30m", "2天"]
+    old_us = _time_call(lambda: [_parse_duration_regex(s) for s in samples], repeat)
+    uncached_us = _time_call(lambda: [parse.__wrapped__(s) for s in samples], repeat)
+    cached_us = _time_call(lambda: [parse(s) for s in samples], repeat)
+    print(f"[duration] {len(samples)} args: regex {old_us:.2f} us, tokenizer {uncached_us:.2f} us, "
+          f"cached {cached_us:.2f} us ({parse.cache_info().hits} cache hits)")
+
+
+# --- 场景：安静时段 ---
+
+async def _quiet_hours(streams: int = 500, lookups: int = 200000) -> None:
+    quiet = _load("quiet_hours")
+    registry = _load("mute_registry").MuteRegistry()
+    schedule = quiet.get_quiet_hours()
+    rng = random.Random(21)
+    rules = []
+    for i in range(streams):
+        start = rng.randrange(24 * 60)
+        rules.append(quiet.parse_quiet_rule(f"stream-{i} {start // 60}:{start % 60:02d}-{(start + 480) // 60 % 24}:{(start + 480) % 60:02d}"))
+    # 24:00 可作为结束时间，"00:00-24:00" 为全天；写法上开始与结束相同的时段无效
+    full_day = quiet.parse_quiet_rule("full 00:00-24:00")
+    if full_day is None or quiet.parse_quiet_rule("same 08:00-08:00") is not None:
+        print(f"[quiet] full-day rule parsed as {full_day}, same start/end rule not rejected")
+        raise SystemExit(1)
+    rules.append(full_day)
+    schedule.configure(rules)
+
+    # 模拟一天内的消息：时间单调前进，安静时段的状态只在切换时刻重新计算
+    day_start = time.time()
+    ids = [f"stream-{i}" for i in range(streams)]
+    start = time.perf_counter()
+    muted = 0
+    for n in range(lookups):
+        muted += registry.is_muted(ids[n % streams], day_start + n * 86400 / lookups)
+    elapsed = time.perf_counter() - start
+    if not all(registry.is_muted("full", day_start + hour * 3600) for hour in range(48)):
+        print("[quiet] full-day window is not quiet around the clock")
+        raise SystemExit(1)
+    print(f"[quiet] {lookups} is_muted over one simulated day, {streams} scheduled streams: "
+          f"{elapsed / lookups * 1e9:.0f} ns/check, {muted} muted, {schedule.refresh_count} refreshes")
+    schedule.configure(())
+
+
+# --- 场景：批量禁言/解除禁言 ---
+
+async def _bulk_mute(streams: int = 500, send_latency: float = 0.02, rate: float = 200.0) -> None:
+    registry_module = _load("mute_registry")
+    journal_module = _load("mute_journal")
+    sender = _load("notice_sender")
+    stream_ids = [f"stream-{i}" for i in range(streams)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 逐个禁言 (写入窗口为 0，每次变更立即落盘) 与一次批量禁言的落盘次数对比
+        one_by_one = registry_module.MuteRegistry()
+        one_by_one.bind_storage(_MemoryStorage(), journal_module.MuteJournal(os.path.join(tmp, "a.jsonl")), flush_window_ms=0)
+        start = time.perf_counter()
+        for stream_id in stream_ids:
+            one_by_one.mute(stream_id, time.time() + 600)
+        single_ms = (time.perf_counter() - start) * 1000
+
+        bulk = registry_module.MuteRegistry()
+        bulk.bind_storage(_MemoryStorage(), journal_module.MuteJournal(os.path.join(tmp, "b.jsonl")), flush_window_ms=0)
+        start = time.perf_counter()
+        bulk.mute_many(stream_ids, time.time() + 600)
+        bulk_ms = (time.perf_counter() - start) * 1000
+        bulk_flushes = bulk.flush_count
+        unmuted = bulk.unmute_many(stream_ids[::2] + ["not-muted"])
+        print(f"[bulk] mute {streams} streams: one by one {single_ms:.1f} ms / {one_by_one.flush_count} flushes, "
+              f"mute_many {bulk_ms:.1f} ms / {bulk_flushes} flush; unmute_many cleared {len(unmuted)}")
+        one_by_one.close()
+        bulk.close()
+
+    # 批量提示经发送队列发出：全局令牌桶限制所有聊天流合计的速率
+    sent_at = []
+
+    async def fake_send(text, stream_id):
+        sent_at.append(time.perf_counter())
+        await asyncio.sleep(send_latency)
+
+    queue = sender.NoticeQueue(max_concurrency=8, rate_per_second=rate, per_stream_rate=0)
+    queue.bind(fake_send)
+    start = time.perf_counter()
+    for stream_id in stream_ids:
+        queue.notify(stream_id, "notice")
+    enqueue_ms = (time.perf_counter() - start) * 1000
+    while queue.pending():
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    # 任意 1 秒窗口内的发送数不应超过速率 + 突发
+    peak = max(sum(1 for t in sent_at if s <= t < s + 1.0) for s in sent_at)
+    print(f"[bulk] {queue.sent} notices: sequential ~{streams * send_latency:.2f} s, enqueued in {enqueue_ms:.1f} ms, "
+          f"drained in {elapsed:.2f} s (rate {rate:.0f}/s, peak {peak} in any 1 s window)")
+    await queue.shutdown()
+    if peak > rate + 8:
+        raise SystemExit(1)
+
+
+# --- 场景：别名刷屏时的提示合并与限速 ---
+
+async def _notice_spam(streams: int = 20, repeats: int = 50, send_latency: float = 0.01) -> None:
+    sender = _load("notice_sender")
+    sent = []
+
+    async def fake_send(text, stream_id):
+        sent.append((stream_id, text, time.perf_counter()))
+        await asyncio.sleep(send_latency)
+
+    queue = sender.NoticeQueue(max_concurrency=4, rate_per_second=0, per_stream_rate=2.0, per_stream_burst=2)
+    queue.bind(fake_send)
+    start = time.perf_counter()
+    # 每个聊天流连续收到 repeats 次相同的禁言确认，中间夹一条不同的提示
+    for n in range(repeats):
+        for i in range(streams):
+            queue.notify(f"stream-{i}", "好的，我将保持安静。")
+            if n == repeats // 2:
+                queue.notify(f"stream-{i}", "好的，我恢复发言了！")
+    enqueue_us = (time.perf_counter() - start) / (repeats * streams) * 1e6
+    while queue.pending():
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    per_stream = {}
+    for stream_id, text, _ in sent:
+        per_stream.setdefault(stream_id, []).append(text)
+    # 每个聊天流：第一条确认、中间的恢复提示，以及恢复提示之后重新入队的一条确认
+    expected = ["好的，我将保持安静。", "好的，我恢复发言了！", "好的，我将保持安静。"]
+    wrong = [sid for sid, texts in per_stream.items() if texts != expected]
+    print(f"[notices] {repeats * streams} triggers over {streams} streams -> {queue.sent} sends "
+          f"({queue.coalesced} coalesced), {enqueue_us:.2f} us/notify, drained in {elapsed:.2f} s")
+    await queue.shutdown()
+    if wrong or len(per_stream) != streams:
+        print(f"[notices] unexpected send order in {len(wrong)} stream(s): {per_stream.get(wrong[0]) if wrong else None}")
+        raise SystemExit(1)
+
+
+# --- 场景：重复禁言请求的幂等处理 ---
+
+async def _mute_debounce(triggers: int = 50, spread: float = 20.0, duration: float = 600.0, cooldown: float = 30.0) -> None:
+    registry_module = _load("mute_registry")
+    journal_module = _load("mute_journal")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for name in ("mute", "mute_if_extends"):
+            registry = registry_module.MuteRegistry()
+            registry.bind_storage(_MemoryStorage(), journal_module.MuteJournal(os.path.join(tmp, f"{name}.jsonl")), flush_window_ms=0)
+            flushes = registry.flush_count
+            base = time.time()
+            start = time.perf_counter()
+            applied = 0
+            # 多名成员在 spread 秒内连续发送默认时长的禁言别名
+            for n in range(triggers):
+                now = base + n * spread / triggers
+                if name == "mute":
+                    registry.mute("stream", now + duration)
+                    applied += 1
+                else:
+                    applied += registry.mute_if_extends("stream", now + duration, cooldown, now=now)
+            elapsed_us = (time.perf_counter() - start) / triggers * 1e6
+            results[name] = (applied, registry.flush_count - flushes, elapsed_us)
+            # 明确指定更长时长的请求仍然生效
+            if name == "mute_if_extends" and not registry.mute_if_extends("stream", base + 2 * duration, cooldown, now=base + spread):
+                print("[debounce] longer mute was ignored")
+                raise SystemExit(1)
+            registry.close()
+
+    for name, (applied, flushes, elapsed_us) in results.items():
+        print(f"[debounce] {name:<16} {triggers} triggers in {spread:.0f} s -> {applied} applied, {flushes} flush(es), {elapsed_us:.2f} us/trigger")
+
+
+# --- 场景：落盘失败后的重试 ---
+
+class _FlakyStorage(_MemoryStorage):
+    """前 failures 次写入抛出异常的存储。"""
+
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+        self.attempts = []
+
+    def set(self, key, value):
+        self.attempts.append(time.perf_counter())
+        if len(self.attempts) <= self.failures:
+            raise OSError("storage unavailable")
+        super().set(key, value)
+
+
+async def _flush_retry(failures: int = 4, retry_base: float = 0.02) -> None:
+    registry_module = _load("mute_registry")
+    registry = registry_module.MuteRegistry()
+    storage = _FlakyStorage(failures)
+    registry.bind_storage(storage, flush_window_ms=5)
+    registry.flush_retry_base = retry_base
+
+    # 写入失败后没有新的变更，重试也必须自己发生
+    registry.mute("stream", time.time() + 600)
+    deadline = time.perf_counter() + retry_base * 2 ** (failures + 1)
+    while "muted_streams" not in storage.data and time.perf_counter() < deadline:
+        await asyncio.sleep(retry_base / 4)
+
+    gaps = [b - a for a, b in zip(storage.attempts, storage.attempts[1:])]
+    stats = registry.flush_stats()
+    registry.close()
+    print(f"[retry] {len(storage.attempts)} write attempt(s), {stats['failed_flushes']} failed, "
+          f"gaps: {', '.join(f'{gap * 1000:.0f} ms' for gap in gaps)}")
+    if storage.data.get("muted_streams") is None or stats["failed_flushes"] != failures:
+        print("[retry] the failed flush was not retried")
+        raise SystemExit(1)
+    # 每次重试的间隔翻倍
+    if any(later < earlier * 1.5 for earlier, later in zip(gaps, gaps[1:])):
+        print("[retry] retry interval did not back off")
+        raise SystemExit(1)
+
+
+# --- 场景：分阶段耗时直方图 ---
+
+async def _stage_metrics(samples: int = 200000) -> None:
+    metrics_module = _load("mute_metrics")
+    metrics = metrics_module.MuteMetrics()
+    rng = random.Random(25)
+    # 对数正态分布的耗时 (中位数约 20us，长尾到数十毫秒)
+    latencies = [int(rng.lognormvariate(10, 1.5)) for _ in range(samples)]
+
+    start = time.perf_counter()
+    for elapsed_ns in latencies:
+        metrics.observe(metrics_module.STAGE_TOTAL, elapsed_ns)
+    observe_ns = (time.perf_counter() - start) / samples * 1e9
+
+    start = time.perf_counter()
+    for _ in range(samples):
+        t = time.perf_counter_ns()
+        metrics.observe(metrics_module.STAGE_TEXT, time.perf_counter_ns() - t)
+    timed_ns = (time.perf_counter() - start) / samples * 1e9
+    print(f"[metrics] observe: {observe_ns:.0f} ns, perf_counter_ns pair + observe: {timed_ns:.0f} ns")
+
+    # 快速路径上每条消息的埋点：两个计数器，采样到的消息再记录文本/别名/注册表/总耗时四个阶段
+    for sample_every in (1, metrics_module.DEFAULT_STAGE_SAMPLE_EVERY):
+        fast = metrics_module.MuteMetrics()
+        fast.configure(True, "", metrics_module.DEFAULT_EXPORT_INTERVAL, sample_every)
+        start = time.perf_counter()
+        for _ in range(samples):
+            fast.incr(metrics_module.COUNTER_MESSAGES)
+            if fast.sample():
+                t = time.perf_counter_ns()
+                fast.observe(metrics_module.STAGE_TEXT, time.perf_counter_ns() - t)
+                fast.observe(metrics_module.STAGE_ALIAS, time.perf_counter_ns() - t)
+                fast.observe(metrics_module.STAGE_REGISTRY, time.perf_counter_ns() - t)
+                fast.observe(metrics_module.STAGE_TOTAL, time.perf_counter_ns() - t)
+            fast.incr(metrics_module.COUNTER_FAST_PATH)
+        per_message_ns = (time.perf_counter() - start) / samples * 1e9
+        recorded = fast.histograms[metrics_module.STAGE_TOTAL].count
+        print(f"[metrics] fast-path instrumentation, sample 1/{sample_every}: {per_message_ns:.0f} ns/message, "
+              f"{recorded} of {samples} messages timed")
+        if recorded != -(-samples // sample_every) or fast.counters[metrics_module.COUNTER_MESSAGES] != samples:
+            print("[metrics] sampling recorded the wrong number of messages")
+            raise SystemExit(1)
+
+    # 桶估算的分位数与精确分位数对比
+    histogram = metrics.histograms[metrics_module.STAGE_TOTAL]
+    ordered = sorted(latencies)
+    for q in metrics_module.QUANTILES:
+        exact = ordered[min(samples - 1, int(q * samples))]
+        estimate = histogram.quantile(q)
+        print(f"[metrics] p{q * 100:g}: exact {exact / 1e3:.1f} us, estimated {estimate / 1e3:.1f} us ({(estimate - exact) / exact:+.0%})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "metrics", "mute.prom")
+        if not metrics.write_prometheus(path):
+            raise SystemExit(1)
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    total_count = f'mute_stage_duration_seconds_count{{stage="{metrics_module.STAGE_TOTAL}"}} {samples}'
+    if total_count not in text:
+        print("[metrics] Prometheus export is missing the total count")
+        raise SystemExit(1)
+    print(f"[metrics] Prometheus export: {len(text.splitlines())} lines, {len(text)} bytes")
+
+
+SCENARIOS = {
+    "stress": _stress_registry,
+    "thinking": _thinking_pool,
+    "mentions": _mention_scan,
+    "duration": _duration_parse,
+    "quiet": _quiet_hours,
+    "bulk": _bulk_mute,
+    "notices": _notice_spam,
+    "debounce": _mute_debounce,
+    "retry": _flush_retry,
+    "metrics": _stage_metrics,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(SCENARIOS)
+    for name in names:
+        scenario = SCENARIOS.get(name)
+        if scenario is None:
+            print(f"未知场景: {name}，可选: {', '.join(SCENARIOS)}")
+            raise SystemExit(2)
+        asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    main()
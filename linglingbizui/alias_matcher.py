@@ -0,0 +1,70 @@
+"""
+静音/取消静音别名的前缀匹配器。
+
+所有别名在配置编译时构建为一棵前缀树，匹配时只需沿消息开头逐字符走一遍，
+一次返回命中的别名类型、别名本身以及别名之后的剩余文本。
+另外预先算出所有别名的首字符集合与最短长度，用于在提取/匹配之前快速排除普通聊天消息。
+"""
+from typing import Dict, Iterable, NamedTuple, Optional
+
+ALIAS_KIND_MUTE = "mute"
+ALIAS_KIND_UNMUTE = "unmute"
+
+# 前缀树中表示“到此为一个完整别名”的键；消息字符不可能是空串，因此不会与子节点冲突
+_TERMINAL = ""
+
+
+class AliasMatch(NamedTuple):
+    """一次别名匹配的结果。"""
+    kind: str # ALIAS_KIND_MUTE / ALIAS_KIND_UNMUTE
+    alias: str
+    remainder: str # 别名之后的文本 (已去除首尾空白)，可作为参数解析
+
+
+class AliasMatcher:
+    """
+    静音与取消静音别名共用的前缀树。
+    命中多个别名时沿用旧的检查顺序：先静音别名、后取消静音别名，同类别名按配置中的顺序，取排在最前面的那个。
+    """
+
+    def __init__(self, mute_aliases: Iterable[str], unmute_aliases: Iterable[str]):
+        self._root: Dict[str, dict] = {}
+        mute_aliases = [a for a in mute_aliases if a]
+        unmute_aliases = [a for a in unmute_aliases if a]
+        all_aliases = mute_aliases + unmute_aliases
+        # 快速预筛：消息首字符不在集合中或长度不足时不可能命中任何别名
+        self.first_chars = frozenset(a[0] for a in all_aliases)
+        self.min_length = min((len(a) for a in all_aliases), default=0)
+        # 终止节点记录别名在旧检查顺序中的位置：静音别名在前，同一个别名同时出现在两个列表中时以静音为准
+        kinds = [ALIAS_KIND_MUTE] * len(mute_aliases) + [ALIAS_KIND_UNMUTE] * len(unmute_aliases)
+        for order, (alias, kind) in enumerate(zip(all_aliases, kinds)):
+            self._insert(alias, kind, order)
+
+    def _insert(self, alias: str, kind: str, order: int) -> None:
+        node = self._root
+        for ch in alias:
+            node = node.setdefault(ch, {})
+        node.setdefault(_TERMINAL, (order, kind, alias))
+
+    def may_match(self, text: str) -> bool:
+        """廉价预筛：返回 False 时 text 一定不以任何别名开头。"""
+        if len(text) < self.min_length:
+            return False
+        return text.lstrip()[:1] in self.first_chars
+
+    def match(self, text: str) -> Optional[AliasMatch]:
+        """检查 text (调用方已去除首尾空白) 是否以某个别名开头。"""
+        node = self._root
+        hit = None
+        end = 0
+        for i, ch in enumerate(text):
+            node = node.get(ch)
+            if node is None:
+                break
+            terminal = node.get(_TERMINAL)
+            if terminal is not None and (hit is None or terminal[0] < hit[0]):
+                hit = terminal
+                end = i + 1
+        if hit is None:
+            return None
+        return AliasMatch(hit[1], hit[2], text[end:].strip())
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark status image rendering.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import image_generator
+from image_generator import ENCODINGS, ImageGenerator, RenderBusyError
+
+
+def mock_data(disk_count: int = 2) -> dict:
+    """
+    Builds mock status data with the given number of disks.
+    """
+    return {
+        "os_type": "Windows",
+        "os_version": "11",
+        "cpu_percent": 42.5,
+        "ram_percent": 60.2,
+        "ram_total_gb": 31.9,
+        "ram_used_gb": 19.2,
+        "disks": [
+            {"mountpoint": f"/mnt/disk{i}", "percent": 40.0 + i % 60, "total_gb": 465.2, "used_gb": 186.1}
+            for i in range(disk_count)
+        ],
+        "boot_time": "10天 2小时 15分钟",
+        "plugin_count": 25,
+        "python_version": "3.11.4",
+        "total_messages_24h": 12345,
+        "bot_messages_24h": 5432,
+    }
+
+
+def time_per_render(generator: ImageGenerator, data: dict, repeat: int) -> float:
+    """
+    Returns the average render time in milliseconds (after one warm-up render).
+    """
+    generator.generate(data)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        generator.generate(data)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def bench_template(repeat: int = 50):
+    """
+    Full redraw on every render vs. copying the cached static background.
+    """
+    data = mock_data()
+    before = time_per_render(ImageGenerator(use_template=False, cache_ttl=0), data, repeat)
+    after = time_per_render(ImageGenerator(use_template=True, cache_ttl=0), data, repeat)
+    print(f"[template] full redraw {before:.2f} ms/render, cached background {after:.2f} ms/render ({before / after:.2f}x)")
+
+    # 上面的时间包含 PNG 编码 (两者相同)；跳过编码只比较绘制本身
+    encode = image_generator.encode_image
+    image_generator.encode_image = lambda image, encoding: b""
+    try:
+        before = time_per_render(ImageGenerator(use_template=False, cache_ttl=0), data, repeat)
+        after = time_per_render(ImageGenerator(use_template=True, cache_ttl=0), data, repeat)
+    finally:
+        image_generator.encode_image = encode
+    print(f"[template] drawing only: full redraw {before:.2f} ms/render, cached background {after:.2f} ms/render ({before / after:.2f}x)")
+
+
+def bench_render_cache(requests: int = 64, workers: int = 16):
+    """
+    Many users asking for status at once: concurrent identical snapshots share one render.
+    """
+    generator = ImageGenerator()
+    snapshots = []
+    for i in range(requests):
+        data = mock_data()
+        data["cpu_percent"] = 42.4 + (i % 3) * 0.05  # 量化到同一个 0.5% 档
+        snapshots.append(data)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(generator.generate, snapshots))
+    elapsed = (time.perf_counter() - start) * 1000
+
+    cache = generator.render_cache
+    print(f"[cache] {requests} concurrent requests in {elapsed:.2f} ms: {cache.misses} render(s), "
+          f"{cache.shared} shared in-flight, {cache.hits} cache hit(s), {len(set(results))} distinct image(s)")
+
+
+def bench_encoding(repeat: int = 20):
+    """
+    Encode time and output size for every encoding mode.
+    """
+    data = mock_data()
+    generator = ImageGenerator(cache_ttl=0)
+    image = rendered_image(generator, data)
+    baseline = None
+    for encoding in ENCODINGS:
+        try:
+            size = len(generator.generate(data, encoding))
+        except (KeyError, OSError) as e:
+            # 例如 Pillow 未编译 WebP 支持
+            print(f"[encoding] {encoding:<14} unavailable: {e}")
+            continue
+        start = time.perf_counter()
+        for _ in range(repeat):
+            generator.generate(data, encoding)
+        elapsed = (time.perf_counter() - start) / repeat * 1000
+        # 只编码同一张已绘制好的图片
+        start = time.perf_counter()
+        for _ in range(repeat):
+            image_generator.encode_image(image, encoding)
+        encode_elapsed = (time.perf_counter() - start) / repeat * 1000
+        baseline = baseline or size
+        print(f"[encoding] {encoding:<14} {elapsed:7.2f} ms/render ({encode_elapsed:6.2f} ms encode) "
+              f"{size / 1024:8.1f} KiB ({size / baseline:.0%} of png)")
+
+
+def rendered_image(generator: ImageGenerator, data: dict):
+    """
+    Returns the drawn (not yet encoded) image for data.
+    """
+    captured = []
+    encode = image_generator.encode_image
+    image_generator.encode_image = lambda image, encoding: captured.append(image) or b""
+    try:
+        generator._render(data, generator.encoding)
+    finally:
+        image_generator.encode_image = encode
+    return captured[0]
+
+
+def bench_disks(repeat: int = 20):
+    """
+    Render time and output size with 1, 10 and 100 disk entries (grid layout and "+N more" cap).
+    """
+    for disk_count in (1, 10, 100):
+        data = mock_data(disk_count)
+        generator = ImageGenerator(cache_ttl=0)
+        elapsed = time_per_render(generator, data, repeat)
+        size = len(generator.generate(data))
+        print(f"[disks] {disk_count:>3} disk(s) {elapsed:7.2f} ms/render {size / 1024:8.1f} KiB")
+
+
+async def _max_loop_stall(work) -> float:
+    """
+    Runs work() while a ticker measures the longest event-loop stall in milliseconds.
+    """
+    stall = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal stall
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stall = max(stall, (now - last) * 1000)
+            last = now
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    await work()
+    done = True
+    await ticker_task
+    return stall
+
+
+async def _bench_async(renders: int):
+    data = [mock_data(10) for _ in range(renders)]
+    for i, item in enumerate(data):
+        item["plugin_count"] = i  # 每次都是不同的快照，避免命中缓存
+
+    generator = ImageGenerator(cache_ttl=0)
+
+    async def render_inline():
+        for item in data:
+            generator.generate(item)
+            await asyncio.sleep(0)
+
+    async def render_off_loop():
+        for item in data:
+            await generator.generate_async(item)
+
+    inline_stall = await _max_loop_stall(render_inline)
+    off_loop_stall = await _max_loop_stall(render_off_loop)
+    print(f"[async] max event-loop stall over {renders} renders: inline {inline_stall:.2f} ms, "
+          f"generate_async {off_loop_stall:.2f} ms")
+
+    # 一次性提交超过队列上限的请求，超出部分应立即得到 RenderBusyError
+    results = await asyncio.gather(*(generator.generate_async(item) for item in data), return_exceptions=True)
+    busy = sum(isinstance(r, RenderBusyError) for r in results)
+    print(f"[async] {renders} simultaneous requests with max_queue={generator.max_queue}: {busy} rejected as busy")
+    generator.shutdown()
+
+
+def bench_async(renders: int = 20):
+    """
+    Event-loop responsiveness with inline vs. off-loop rendering, and back-pressure when saturated.
+    """
+    asyncio.run(_bench_async(renders))
+
+
+def main():
+    bench_template()
+    bench_render_cache()
+    bench_encoding()
+    bench_disks()
+    bench_async()
+
+
+if __name__ == "__main__":
+    main()
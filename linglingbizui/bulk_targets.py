@@ -0,0 +1,58 @@
+"""
+批量禁言/解除禁言的目标选择。
+
+命令参数中可以带一个选择器 (其余参数，例如时长，原样留给命令处理)：
+- `--all`：所有群聊；
+- `--streams id1,id2,...`：指定的聊天流ID列表；
+- `--match <模式>`：群名匹配通配符模式的群聊，例如 `*测试*` (不区分大小写)。
+"""
+import fnmatch
+from typing import Any, Iterable, List, NamedTuple, Optional, Sequence
+
+BULK_ALL = "--all"
+BULK_STREAMS = "--streams"
+BULK_MATCH = "--match"
+
+
+class BulkSelection(NamedTuple):
+    """解析出的批量选择器。"""
+    flag: str
+    value: Optional[str]
+    # 去掉选择器后剩余的参数 (空格连接)
+    remainder: str
+
+
+def parse_bulk_args(args: Sequence[str]) -> Optional[BulkSelection]:
+    """
+    从命令参数中解析批量选择器，没有选择器时返回 None。
+    --streams / --match 缺少参数时抛出 ValueError。
+    """
+    args = list(args)
+    for i, arg in enumerate(args):
+        if arg == BULK_ALL:
+            return BulkSelection(arg, None, " ".join(args[:i] + args[i + 1:]))
+        if arg in (BULK_STREAMS, BULK_MATCH):
+            if i + 1 >= len(args):
+                raise ValueError(f"{arg} 需要一个参数")
+            return BulkSelection(arg, args[i + 1], " ".join(args[:i] + args[i + 2:]))
+    return None
+
+
+def _group_name(chat_stream: Any) -> str:
+    group_info = getattr(chat_stream, 'group_info', None)
+    return str(getattr(group_info, 'group_name', None) or "")
+
+
+def select_streams(selection: BulkSelection, group_streams: Iterable[Any]) -> List[str]:
+    """
+    按选择器从群聊列表 (ChatStream 等带 stream_id 与 group_info 的对象) 中选出聊天流ID，去重并保持顺序。
+    --streams 直接使用给出的ID，不查询群聊列表。
+    """
+    if selection.flag == BULK_STREAMS:
+        return list(dict.fromkeys(sid.strip() for sid in (selection.value or "").split(",") if sid.strip()))
+    if selection.flag == BULK_ALL:
+        return list(dict.fromkeys(stream.stream_id for stream in group_streams))
+    pattern = (selection.value or "").lower()
+    return list(dict.fromkeys(
+        stream.stream_id for stream in group_streams if fnmatch.fnmatchcase(_group_name(stream).lower(), pattern)
+    ))
@@ -0,0 +1,104 @@
+"""
+禁言时长解析。
+
+一个预编译的正则按“数字 + 单位”逐段扫描，相邻的段累加，因此支持复合写法：
+"10min"、"30分钟"、"1小时30分钟"、"1h30m"、"1.5h"、"半小时"、"一个半小时"、"一分半"、"三十五分钟"、"90s"、"2天"。
+数字可以是阿拉伯数字 (可带小数)、一到九十九的中文数字 (十、二十、十五、三十五) 或“半”。
+整个参数 (首尾空白除外) 必须完全由时长段组成：带其他文字的输入 (例如 "10分钟吧"、".5h"、"1e3s"、"1h5ms") 不视为时长；
+格式有误的中文数字 (例如 "十十")、总时长为零或超过 MAX_DURATION_MINUTES 的输入同样返回 None。
+同一输入的结果经 LRU 缓存，重复的命令参数不再重新扫描。
+"""
+import functools
+import re
+from typing import Optional, Union
+
+# 单位 -> 秒。同一前缀的单位按长度从长到短排列，保证 "min" 不会被当作 "m" + "in"
+# 英文单位后不能紧跟字母，"5ms"、"3mo" 不会被读成 5 分钟、3 分钟
+_UNIT_SECONDS = (
+    (r"天|(?:days?|d)(?![a-z])", 86400),
+    (r"小时|钟头|(?:hours?|hrs?|h)(?![a-z])", 3600),
+    (r"分钟|分|(?:minutes?|mins?|m)(?![a-z])", 60),
+    (r"秒钟|秒|(?:seconds?|secs?|s)(?![a-z])", 1),
+)
+
+_CN_DIGITS = {"一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+
+_ANY_UNIT = "|".join(pattern for pattern, _ in _UNIT_SECONDS)
+
+_DURATION_TOKEN = re.compile(
+    r"\s*(?:(?P<number>\d+(?:\.\d+)?|[一二两三四五六七八九十]+)\s*个?\s*(?P<and_half>半)?|(?P<half>半)\s*个?)"
+    r"\s*(?:" + "|".join(f"(?P<unit{i}>{pattern})" for i, (pattern, _) in enumerate(_UNIT_SECONDS)) + r")"
+    # 单位之后的“半”，如 "一分半"、"两小时半"；后面紧跟单位时属于下一段 ("1小时半小时" 不在此列)
+    r"(?P<trailing_half>\s*半(?!\s*个?\s*(?:" + _ANY_UNIT + r")))?"
+)
+
+_SECONDS_BY_GROUP = {f"unit{i}": seconds for i, (_, seconds) in enumerate(_UNIT_SECONDS)}
+
+# 时长上限 (一百年)。更长的时长加到 datetime.now() 上会超出 datetime 的表示范围
+MAX_DURATION_MINUTES = 100 * 365 * 24 * 60
+
+# 解析结果：整数分钟，或不足整分钟时保留两位小数
+Minutes = Union[int, float]
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_duration_minutes(duration_str: str) -> Optional[Minutes]:
+    """
+    把整个字符串解析为分钟数，含有时长以外的内容、时长格式有误、为零或超过上限时返回 None。
+    例如 "1h30m" -> 90，"1.5h" -> 90，"半小时" -> 30，"90s" -> 1.5。
+    """
+    text = duration_str.lower().strip()
+    if not text:
+        return None
+
+    total_seconds = 0.0
+    end = 0
+    while end < len(text):
+        # 每一段都必须紧接上一段，无法识别的内容 (例如 "1h5ms" 中的 "5ms") 使整个输入无效
+        match = _DURATION_TOKEN.match(text, end)
+        if match is None:
+            return None
+        seconds = _token_seconds(match)
+        if seconds is None:
+            return None
+        total_seconds += seconds
+        end = match.end()
+
+    minutes = total_seconds / 60
+    # 超长时长 (例如 "123456789012345678901234567890d") 无法换算为截止时间
+    if minutes > MAX_DURATION_MINUTES:
+        return None
+    if minutes.is_integer():
+        minutes = int(minutes)
+    else:
+        minutes = round(minutes, 2)
+    # 零时长 (例如 "0m"、"0.1s") 不是有效的禁言
+    return minutes or None
+
+
+def _token_seconds(match: "re.Match[str]") -> Optional[float]:
+    if match.group("half"):
+        amount = 0.5
+    else:
+        number = match.group("number")
+        amount = float(number) if number[0].isdigit() else _cn_number(number)
+        if amount is None:
+            return None
+        if match.group("and_half"):
+            amount += 0.5
+    if match.group("trailing_half"):
+        amount += 0.5
+    for group, seconds in _SECONDS_BY_GROUP.items():
+        if match.group(group):
+            return amount * seconds
+    return None
+
+
+def _cn_number(number: str) -> Optional[float]:
+    """解析一到九十九的中文数字："五" / "十" / "十五" / "三十" / "三十五"。格式有误 (如 "十十"、"三五") 时返回 None。"""
+    if number in _CN_DIGITS:
+        return float(_CN_DIGITS[number])
+    tens, ten, ones = number.partition("十")
+    if not ten or len(tens) > 1 or len(ones) > 1 or "十" in ones:
+        return None
+    return float((_CN_DIGITS[tens] if tens else 1) * 10 + (_CN_DIGITS[ones] if ones else 0))
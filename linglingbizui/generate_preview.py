@@ -1,15 +1,54 @@
 # -*- coding: utf-8 -*-
 """
 Generate a preview image for the Bot Status plugin.
+
+与状态卡片插件走同一条渲染路径：generate_async 在执行器中渲染，不阻塞事件循环。
+本目录中的禁言插件 (plugin.py) 不渲染状态卡片，image_generator 与 metrics_collector 对它而言只是 API。
+
+用法: python generate_preview.py [--live]。--live 时用共享采样器采集本机的实时指标，否则使用模拟数据。
 """
-from image_generator import ImageGenerator
+import asyncio
+import sys
+import time
+
+from image_generator import get_image_generator
 
 
 def main():
     """
-    Generates and saves a preview image using mock data.
+    Generates and saves a preview image using mock data (or live metrics with --live).
     """
-    mock_data = {
+    data = live_data() if "--live" in sys.argv[1:] else mock_data()
+
+    generator = get_image_generator()
+    try:
+        image_bytes = asyncio.run(generator.generate_async(data))
+    finally:
+        generator.shutdown()
+
+    with open("./preview.png", "wb") as f:
+        f.write(image_bytes)
+
+    print("✅ 预览图片 'preview.png' 已成功生成。")
+
+
+def live_data() -> dict:
+    """用共享采样器采集一次本机指标 (与状态卡片插件相同的数据来源)。"""
+    from metrics_collector import get_metrics_sampler
+
+    sampler = get_metrics_sampler()
+    snapshot = sampler.latest()
+    if snapshot is None:
+        # 第一次采样只建立 CPU 占用的基准
+        sampler.sample()
+        time.sleep(0.5)
+        snapshot = sampler.sample()
+    return dict(snapshot, plugin_count=0, total_messages_24h=0, bot_messages_24h=0)
+
+
+def mock_data() -> dict:
+    """固定的模拟数据。"""
+    return {
         "os_type": "Windows",
         "os_version": "11",
         "cpu_percent": 42.5,
@@ -27,14 +66,6 @@ def main():
         "bot_messages_24h": 5432,
     }
 
-    generator = ImageGenerator()
-    image_bytes = generator.generate(mock_data)
-
-    with open("./preview.png", "wb") as f:
-        f.write(image_bytes)
-
-    print("✅ 预览图片 'preview.png' 已成功生成。")
-
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,103 +2,587 @@
 """
 Bot Status Image Generator
 """
+import asyncio
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
 from io import BytesIO
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
 from PIL import Image, ImageDraw, ImageFont
 
+# 字体搜索路径：按顺序尝试，第一个能加载的字体生效；都不可用时退回 PIL 默认字体
+# 可通过环境变量 BOT_STATUS_FONTS (以 os.pathsep 分隔) 或 ImageGenerator(font_paths=...) 覆盖
+FONT_PATHS_ENV = "BOT_STATUS_FONTS"
+DEFAULT_FONT_PATHS: Tuple[str, ...] = (
+    "msyh.ttc",
+    "C:/Windows/Fonts/msyh.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/System/Library/Fonts/PingFang.ttc",
+)
+
+FONT_SIZE_TITLE = 32
+FONT_SIZE_MAIN = 18
+FONT_SIZE_SMALL = 15
+
+# 进度条尺寸
+BAR_WIDTH = 400
+BAR_HEIGHT = 22
+BAR_LABEL_X_OFFSET = 200
+
+# 布局
+ROW_HEIGHT = 45
+FOOTER_SPACE = 120 # 最后一行到画布底边的距离 (含页脚)
+DEFAULT_MIN_HEIGHT = 650
+# 硬盘超过该数量时按多列网格排列
+DISK_GRID_THRESHOLD = 4
+DEFAULT_DISK_COLUMNS = 2
+# 最多逐条显示的硬盘数，其余合并为一行 "+N more"，保证图片尺寸有上限
+DEFAULT_MAX_DISKS = 24
+# 网格中的进度条：标签宽度更窄，并为右侧的 "已用 / 总量" 文本留出位置
+GRID_LABEL_X_OFFSET = 110
+GRID_RIGHT_TEXT_WIDTH = 170
+GRID_MIN_BAR_WIDTH = 60
+
+# 布局中的行类型：信息行 (标签 + 文本)、进度条行与只有静态文本的提示行
+ROW_INFO = "info"
+ROW_BAR = "bar"
+ROW_NOTE = "note"
+
+
+class LayoutRow(NamedTuple):
+    """布局中的一行。"""
+    kind: str
+    label: str
+    x: int
+    y: int
+    label_offset: int = BAR_LABEL_X_OFFSET # 进度条 (或提示文本) 相对 x 的偏移
+    bar_width: int = BAR_WIDTH
+
+
+class Layout(NamedTuple):
+    """一次测量的结果：各行位置、分割线位置与画布高度。"""
+    rows: Tuple[LayoutRow, ...]
+    divider_y: int
+    height: int
+
+
+# 静态底图缓存：(布局, 主题) -> 底图，按最近使用淘汰
+TEMPLATE_CACHE_SIZE = 16
+_template_cache: "OrderedDict[tuple, Image.Image]" = OrderedDict()
+_template_lock = threading.Lock()
+
+# 加载失败过的字体路径，之后的查找直接跳过
+_missing_fonts: Set[str] = set()
+_missing_fonts_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=64)
+def load_font(path: str, size: int, index: int = 0) -> ImageFont.FreeTypeFont:
+    """加载字体，按 (path, size, index) 在进程内缓存。CJK 字体集合很大，每个组合只解析一次。"""
+    return ImageFont.truetype(path, size, index=index)
+
+
+def find_font(paths: Sequence[str], size: int, index: int = 0) -> ImageFont.ImageFont:
+    """返回搜索路径中第一个能加载的字体，都不可用时返回 PIL 默认字体。"""
+    for path in paths:
+        if path in _missing_fonts:
+            continue
+        try:
+            return load_font(path, size, index)
+        except OSError:
+            with _missing_fonts_lock:
+                _missing_fonts.add(path)
+    return ImageFont.load_default()
+
+
+def default_font_paths() -> Tuple[str, ...]:
+    """环境变量 BOT_STATUS_FONTS 中的路径优先，其后是内置的常见 CJK 字体位置。"""
+    configured = tuple(p for p in os.environ.get(FONT_PATHS_ENV, "").split(os.pathsep) if p)
+    return configured + DEFAULT_FONT_PATHS
+
+
+# 输出编码方式。状态卡片几乎全是纯色块，调色板 PNG 与 WebP 无损通常更小；上传带宽是主要瓶颈时可以换用
+ENCODING_PNG = "png" # PIL 默认 zlib 设置 (原有行为)
+ENCODING_PNG_FAST = "png_fast" # 最低压缩级别，编码最快、体积最大
+ENCODING_PNG_OPTIMIZED = "png_optimized" # 最高压缩级别并启用 optimize，编码最慢、体积较小
+ENCODING_PNG_PALETTE = "png_palette" # 先量化为 P 模式 (调色板) 再编码 PNG，编码快且体积小
+ENCODING_WEBP_LOSSLESS = "webp_lossless"
+ENCODING_JPEG = "jpeg" # 有损，文字边缘会有噪点，仅在体积优先时使用
+DEFAULT_ENCODING = ENCODING_PNG
+PALETTE_COLORS = 64
+
+# 编码方式 -> (PIL 格式, save 参数)
+ENCODINGS: Dict[str, Tuple[str, Dict[str, Any]]] = {
+    ENCODING_PNG: ("PNG", {}),
+    ENCODING_PNG_FAST: ("PNG", {"compress_level": 1}),
+    ENCODING_PNG_OPTIMIZED: ("PNG", {"compress_level": 9, "optimize": True}),
+    ENCODING_PNG_PALETTE: ("PNG", {"compress_level": 6}),
+    ENCODING_WEBP_LOSSLESS: ("WEBP", {"lossless": True, "quality": 50, "method": 2}),
+    ENCODING_JPEG: ("JPEG", {"quality": 85}),
+}
+
+# Pillow 9.1 起量化方法位于 Image.Quantize 枚举中
+_FAST_OCTREE = getattr(getattr(Image, "Quantize", Image), "FASTOCTREE", 2)
+
+
+def encode_image(image: Image.Image, encoding: str = DEFAULT_ENCODING) -> bytes:
+    """按指定编码方式把图片编码为字节。"""
+    try:
+        image_format, save_kwargs = ENCODINGS[encoding]
+    except KeyError:
+        raise ValueError(f"Unknown image encoding: {encoding}") from None
+    if encoding == ENCODING_PNG_PALETTE:
+        image = image.quantize(colors=PALETTE_COLORS, method=_FAST_OCTREE)
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, **save_kwargs)
+    return buffer.getvalue()
+
+
+# 渲染结果缓存：快照摘要中百分比按 0.5% 取整，在线时间 (秒) 按分钟分桶
+PERCENT_STEP = 0.5
+UPTIME_BUCKET_SECONDS = 60
+DEFAULT_RENDER_CACHE_TTL = 5.0
+DEFAULT_RENDER_CACHE_SIZE = 32
+# 快照中不会画到图上的字段 (采样器每次写入的采样时间)，不参与摘要，否则每份快照的键都不同
+UNRENDERED_KEYS = frozenset({"timestamp"})
+
+
+def _quantize(key: str, value: Any) -> Any:
+    if isinstance(value, dict):
+        return tuple(sorted((k, _quantize(k, v)) for k, v in value.items() if k not in UNRENDERED_KEYS))
+    if isinstance(value, (list, tuple)):
+        return tuple(_quantize(key, v) for v in value)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    if key == "percent" or key.endswith("_percent"):
+        return round(value / PERCENT_STEP) * PERCENT_STEP
+    if key.endswith("_gb"):
+        return round(value, 2) # 图中按两位小数显示
+    if key == "boot_time":
+        return int(value // UPTIME_BUCKET_SECONDS)
+    return value
+
+
+def snapshot_key(data: dict) -> str:
+    """状态数据的量化摘要：显示上几乎没有差别的两份快照得到相同的键。"""
+    normalized = _quantize("", data)
+    return hashlib.blake2b(repr(normalized).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class RenderCache:
+    """
+    按快照摘要缓存渲染结果 (LRU + TTL)。
+    同一个键的并发请求共享一次进行中的渲染 (single-flight)，其余调用方等待其结果。
+    """
+
+    def __init__(self, ttl: float = DEFAULT_RENDER_CACHE_TTL, max_entries: int = DEFAULT_RENDER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # 键 -> (过期时间, PNG 字节)
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> bytes:
+        """返回键对应的未过期结果；没有时调用 render，同一键同时只渲染一次。"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.shared += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = render()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._store(key, result)
+            self._inflight.pop(key, None)
+        future.set_result(result)
+        return result
+
+    def peek(self, key: str) -> Optional[bytes]:
+        """不等待、不渲染，只返回未过期的缓存结果 (没有时为 None)。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, result: bytes) -> None:
+        """写入在缓存之外完成的渲染结果 (例如异步渲染)。"""
+        with self._lock:
+            self._store(key, result)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key: str, result: bytes) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# --- 异步渲染 ---
+
+EXECUTOR_THREAD = "thread"
+EXECUTOR_PROCESS = "process" # 主题较重时使用，绕开 GIL；数据与结果需要跨进程传递
+DEFAULT_RENDER_WORKERS = 2
+DEFAULT_RENDER_QUEUE = 8
+
+
+class RenderBusyError(RuntimeError):
+    """排队与进行中的异步渲染已达上限。调用方应稍后重试或提示用户。"""
+
+
+# 进程池工作进程内复用的生成器：构造参数 -> ImageGenerator
+_process_generators: Dict[tuple, "ImageGenerator"] = {}
+
+
+def _render_in_process(generator_args: tuple, data: dict, encoding: str) -> bytes:
+    generator = _process_generators.get(generator_args)
+    if generator is None:
+        font_paths, use_template, disk_columns, max_disks = generator_args
+        generator = ImageGenerator(
+            font_paths, use_template, cache_ttl=0, encoding=encoding, disk_columns=disk_columns, max_disks=max_disks
+        )
+        _process_generators[generator_args] = generator
+    return generator._render(data, encoding)
+
 
 class ImageGenerator:
     """生成状态图片"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        font_paths: Optional[Sequence[str]] = None,
+        use_template: bool = True,
+        cache_ttl: float = DEFAULT_RENDER_CACHE_TTL,
+        encoding: str = DEFAULT_ENCODING,
+        disk_columns: int = DEFAULT_DISK_COLUMNS,
+        max_disks: int = DEFAULT_MAX_DISKS,
+        executor: str = EXECUTOR_THREAD,
+        max_workers: int = DEFAULT_RENDER_WORKERS,
+        max_queue: int = DEFAULT_RENDER_QUEUE,
+    ):
         self.width = 1000
-        self.height = 650  # 增加高度以容纳更多硬盘信息
+        self.min_height = DEFAULT_MIN_HEIGHT  # 实际高度由布局按内容决定，不低于该值
+        self.disk_columns = max(1, disk_columns)
+        self.max_disks = max(0, max_disks)
         self.bg_color = (255, 255, 255)
         self.title_color = (0, 0, 0)
         self.text_color = (50, 50, 50)
         self.bar_bg_color = (230, 230, 230)
         self.brand_color = (54, 123, 240)  # #367BF0
+        self.font_paths = tuple(font_paths) if font_paths else default_font_paths()
+        # 复用按布局缓存的静态底图；关闭时每次完整重绘 (用于对比基准)
+        self.use_template = use_template
+        # 相同快照在 cache_ttl 秒内直接返回上次的 PNG；0 表示不缓存
+        self.render_cache = RenderCache(cache_ttl) if cache_ttl > 0 else None
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown image encoding: {encoding}")
+        # generate 未指定 encoding 时使用的编码方式，见 ENCODINGS
+        self.encoding = encoding
+        # generate_async 使用的执行器：线程池 (默认) 或进程池，排队与进行中的渲染不超过 max_queue
+        if executor not in (EXECUTOR_THREAD, EXECUTOR_PROCESS):
+            raise ValueError(f"Unknown render executor: {executor}")
+        self.executor_kind = executor
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(1, max_queue)
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+        self._queued = 0
+        self._async_inflight: Dict[str, "asyncio.Future[bytes]"] = {}
 
-        try:
-            self.font_bold = ImageFont.truetype("msyh.ttc", 32)
-            self.font_main = ImageFont.truetype("msyh.ttc", 18)
-            self.font_small = ImageFont.truetype("msyh.ttc", 15)
-        except OSError:
-            # Fallback to default font if msyh.ttc is not found
-            self.font_bold = ImageFont.load_default()
-            self.font_main = ImageFont.load_default()
-            self.font_small = ImageFont.load_default()
-
-    def generate(self, data: dict) -> bytes:
-        """生成图片并返回字节"""
-        image = Image.new("RGB", (self.width, self.height), self.bg_color)
+    # 字体在第一次绘制时才加载，并由进程内的字体缓存在所有实例间共享
+    @functools.cached_property
+    def font_bold(self) -> ImageFont.ImageFont:
+        return find_font(self.font_paths, FONT_SIZE_TITLE)
+
+    @functools.cached_property
+    def font_main(self) -> ImageFont.ImageFont:
+        return find_font(self.font_paths, FONT_SIZE_MAIN)
+
+    @functools.cached_property
+    def font_small(self) -> ImageFont.ImageFont:
+        return find_font(self.font_paths, FONT_SIZE_SMALL)
+
+    @property
+    def theme(self) -> tuple:
+        """影响静态底图的外观参数，作为模板缓存键的一部分。"""
+        return (
+            self.width, self.min_height, self.bg_color, self.title_color, self.text_color,
+            self.bar_bg_color, self.brand_color, self.font_paths, self.disk_columns,
+        )
+
+    def generate(self, data: dict, encoding: Optional[str] = None) -> bytes:
+        """
+        生成图片并返回编码后的字节 (encoding 为 ENCODINGS 中的一种，默认使用实例的 encoding)。
+        短时间内量化后相同的快照复用同一次渲染结果。
+        """
+        encoding = encoding or self.encoding
+        if self.render_cache is None:
+            return self._render(data, encoding)
+        key = f"{snapshot_key(data)}:{encoding}"
+        return self.render_cache.get_or_render(key, lambda: self._render(data, encoding))
+
+    async def generate_async(self, data: dict, encoding: Optional[str] = None) -> bytes:
+        """
+        在执行器中生成图片，不阻塞事件循环。缓存命中时直接返回；
+        同一快照已在渲染时等待同一个结果；排队与进行中的渲染达到 max_queue 时抛出 RenderBusyError。
+        """
+        encoding = encoding or self.encoding
+        key = f"{snapshot_key(data)}:{encoding}" if self.render_cache is not None else None
+        if key is not None:
+            cached = self.render_cache.peek(key)
+            if cached is not None:
+                return cached
+            inflight = self._async_inflight.get(key)
+            if inflight is not None:
+                self.render_cache.shared += 1
+                return await asyncio.shield(inflight)
+
+        if self._queued >= self.max_queue:
+            raise RenderBusyError(f"Status image renderer is busy ({self._queued} renders queued).")
+
+        loop = asyncio.get_running_loop()
+        if self.executor_kind == EXECUTOR_PROCESS:
+            generator_args = (self.font_paths, self.use_template, self.disk_columns, self.max_disks)
+            future = loop.run_in_executor(self._get_executor(), _render_in_process, generator_args, data, encoding)
+        else:
+            future = loop.run_in_executor(self._get_executor(), self._render, data, encoding)
+        self._queued += 1
+        if key is not None:
+            self.render_cache.misses += 1
+            self._async_inflight[key] = future
+        future.add_done_callback(lambda f: self._on_async_done(key, f))
+        # 调用方被取消时不取消渲染本身，其他等待同一结果的调用方不受影响
+        return await asyncio.shield(future)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭 generate_async 使用的执行器。之后再调用 generate_async 会重新创建。"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _get_executor(self) -> Executor:
+        with self._executor_lock:
+            if self._executor is None:
+                if self.executor_kind == EXECUTOR_PROCESS:
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="status-render")
+            return self._executor
+
+    def _on_async_done(self, key: Optional[str], future: "asyncio.Future[bytes]") -> None:
+        self._queued -= 1
+        if key is None:
+            return
+        if self._async_inflight.get(key) is future:
+            del self._async_inflight[key]
+        if not future.cancelled() and future.exception() is None:
+            self.render_cache.put(key, future.result())
+
+    def _render(self, data: dict, encoding: str) -> bytes:
+        # 超出上限的硬盘不逐条绘制，只显示 "+N more"
+        disks = data["disks"]
+        shown_disks = disks[:self.max_disks]
+        hidden_disks = len(disks) - len(shown_disks)
+        disk_labels = tuple(f"硬盘 ({disk['mountpoint'].replace('/', '')})" for disk in shown_disks)
+        layout = self._layout(disk_labels, hidden_disks)
+
+        # 复制静态底图 (标题、标签、进度条底色、分割线、页脚)，只绘制随数据变化的部分
+        if self.use_template:
+            image = self._get_template(layout).copy()
+        else:
+            image = self._render_template(layout)
         draw = ImageDraw.Draw(image)
 
-        # 绘制标题
-        self._draw_text(draw, "墨狐-Bot 状态", (50, 40), self.font_bold, self.title_color)
+        value_rows = [row for row in layout.rows if row.kind != ROW_NOTE]
+        for row, value in zip(value_rows, self._row_values(data, shown_disks)):
+            if row.kind == ROW_BAR:
+                percentage, text_right = value
+                self._draw_progress_value(draw, row, percentage, text_right)
+            else:
+                self._draw_info_value(draw, row, value)
+
+        return encode_image(image, encoding)
 
-        # 绘制系统信息
+    # --- 布局与静态底图 ---
+
+    def _layout(self, disk_labels: Tuple[str, ...], hidden_disks: int = 0) -> Layout:
+        """
+        先确定每一行的位置，再按内容总高度确定画布高度 (不低于 min_height)。
+        除 ROW_NOTE 外，行的顺序与 _row_values 一致。
+        """
+        rows: List[LayoutRow] = []
+        x = 50
         y_pos = 100
-        self._draw_info_line(draw, "操作系统", f"{data['os_type']} {data['os_version']}", 50, y_pos)
-        y_pos += 45
-        self._draw_progress_bar(draw, "CPU", data["cpu_percent"], 50, y_pos)
-        y_pos += 45
-        self._draw_progress_bar(
-            draw, "内存", data["ram_percent"], 50, y_pos, f"{data['ram_used_gb']:.2f}GB / {data['ram_total_gb']:.2f}GB"
-        )
-        y_pos += 45
 
-        # 绘制硬盘信息 (支持多分区)
-        for disk in data["disks"]:
-            disk_label = f"硬盘 ({disk['mountpoint'].replace('/', '')})"
-            disk_text_right = f"{disk['used_gb']:.2f}GB / {disk['total_gb']:.2f}GB"
-            self._draw_progress_bar(draw, disk_label, disk["percent"], 50, y_pos, disk_text_right)
-            y_pos += 45
+        # 系统信息
+        rows.append(LayoutRow(ROW_INFO, "操作系统", x, y_pos))
+        y_pos += ROW_HEIGHT
+        rows.append(LayoutRow(ROW_BAR, "CPU", x, y_pos))
+        y_pos += ROW_HEIGHT
+        rows.append(LayoutRow(ROW_BAR, "内存", x, y_pos))
+        y_pos += ROW_HEIGHT
+
+        # 硬盘信息 (支持多分区)：分区较多时按多列网格排列，从左到右、从上到下
+        columns = self.disk_columns if len(disk_labels) > DISK_GRID_THRESHOLD else 1
+        if columns == 1:
+            for disk_label in disk_labels:
+                rows.append(LayoutRow(ROW_BAR, disk_label, x, y_pos))
+                y_pos += ROW_HEIGHT
+        else:
+            column_width = (self.width - 2 * x) // columns
+            bar_width = max(GRID_MIN_BAR_WIDTH, column_width - GRID_LABEL_X_OFFSET - 15 - GRID_RIGHT_TEXT_WIDTH)
+            for i, disk_label in enumerate(disk_labels):
+                row_index, column = divmod(i, columns)
+                rows.append(LayoutRow(
+                    ROW_BAR, disk_label, x + column * column_width, y_pos + row_index * ROW_HEIGHT,
+                    GRID_LABEL_X_OFFSET, bar_width,
+                ))
+            y_pos += -(-len(disk_labels) // columns) * ROW_HEIGHT
+        if hidden_disks:
+            rows.append(LayoutRow(ROW_NOTE, f"+{hidden_disks} more", x, y_pos))
+            y_pos += ROW_HEIGHT
 
-        self._draw_info_line(draw, "在线时间", data["boot_time"], 50, y_pos)
+        rows.append(LayoutRow(ROW_INFO, "在线时间", x, y_pos))
         y_pos += 15
 
-        # 绘制分割线
+        # 分割线
         y_pos += 40
-        draw.line([(50, y_pos), (self.width - 50, y_pos)], fill=self.bar_bg_color, width=2)
+        divider_y = y_pos
         y_pos += 30
 
-        # 绘制机器人信息
-        self._draw_info_line(draw, "Python 版本", data["python_version"], 50, y_pos)
-        y_pos += 40
-        self._draw_info_line(draw, "已加载插件", str(data["plugin_count"]), 50, y_pos)
-        y_pos += 40
-        self._draw_info_line(draw, "总消息数 (24h)", str(data["total_messages_24h"]), 50, y_pos)
-        y_pos += 40
-        self._draw_info_line(draw, "机器人消息 (24h)", str(data["bot_messages_24h"]), 50, y_pos)
+        # 机器人信息
+        for label in ("Python 版本", "已加载插件", "总消息数 (24h)", "机器人消息 (24h)"):
+            rows.append(LayoutRow(ROW_INFO, label, x, y_pos))
+            y_pos += 40
+
+        # 最后一行之下留出页脚的位置
+        height = max(self.min_height, y_pos - 40 + FOOTER_SPACE)
+        return Layout(tuple(rows), divider_y, height)
+
+    @staticmethod
+    def _row_values(data: dict, disks: List[dict]) -> List[Any]:
+        """按 _layout 的行顺序返回动态值：信息行为文本，进度条行为 (百分比, 右侧文本)。"""
+        values: List[Any] = [
+            f"{data['os_type']} {data['os_version']}",
+            (data["cpu_percent"], ""),
+            (data["ram_percent"], f"{data['ram_used_gb']:.2f}GB / {data['ram_total_gb']:.2f}GB"),
+        ]
+        for disk in disks:
+            values.append((disk["percent"], f"{disk['used_gb']:.2f}GB / {disk['total_gb']:.2f}GB"))
+        values.extend((
+            data["boot_time"],
+            data["python_version"],
+            str(data["plugin_count"]),
+            str(data["total_messages_24h"]),
+            str(data["bot_messages_24h"]),
+        ))
+        return values
+
+    def _get_template(self, layout: Layout) -> Image.Image:
+        """按布局 × 主题缓存的静态底图。调用方需 copy() 后再绘制。"""
+        key = (layout, self.theme)
+        with _template_lock:
+            template = _template_cache.get(key)
+            if template is not None:
+                _template_cache.move_to_end(key)
+                return template
+        template = self._render_template(layout)
+        with _template_lock:
+            _template_cache[key] = template
+            while len(_template_cache) > TEMPLATE_CACHE_SIZE:
+                _template_cache.popitem(last=False)
+        return template
+
+    def _render_template(self, layout: Layout) -> Image.Image:
+        """绘制不随数据变化的部分。"""
+        image = Image.new("RGB", (self.width, layout.height), self.bg_color)
+        draw = ImageDraw.Draw(image)
+
+        # 绘制标题
+        self._draw_text(draw, "墨狐-Bot 状态", (50, 40), self.font_bold, self.title_color)
+
+        for row in layout.rows:
+            if row.kind == ROW_BAR:
+                self._draw_progress_frame(draw, row)
+            elif row.kind == ROW_NOTE:
+                self._draw_text(draw, row.label, (row.x + row.label_offset, row.y + 2), self.font_main, self.text_color)
+            else:
+                self._draw_info_label(draw, row)
+
+        # 绘制分割线
+        draw.line([(50, layout.divider_y), (self.width - 50, layout.divider_y)], fill=self.bar_bg_color, width=2)
 
         # 绘制页脚
-        self._draw_text(draw, "由 墨狐工作室 提供支持", (50, self.height - 40), self.font_small, self.text_color)
+        self._draw_text(draw, "由 墨狐工作室 提供支持", (50, layout.height - 40), self.font_small, self.text_color)
+        return image
 
-        buffer = BytesIO()
-        image.save(buffer, format="PNG")
-        return buffer.getvalue()
+    # --- 绘制 ---
 
     def _draw_text(self, draw, text, position, font, color):
         draw.text(position, text, font=font, fill=color)
 
-    def _draw_info_line(self, draw, label, value, x, y):
-        self._draw_text(draw, f"{label}:", (x, y), self.font_main, self.text_color)
-        self._draw_text(draw, value, (x + 200, y), self.font_main, self.title_color)
+    def _draw_info_label(self, draw, row):
+        self._draw_text(draw, f"{row.label}:", (row.x, row.y), self.font_main, self.text_color)
 
-    def _draw_progress_bar(self, draw, label, percentage, x, y, text_right=""):
-        bar_width = 400
-        bar_height = 22
-        label_x_offset = 200
+    def _draw_info_value(self, draw, row, value):
+        self._draw_text(draw, value, (row.x + 200, row.y), self.font_main, self.title_color)
 
-        # 绘制背景条
-        draw.rectangle([x + label_x_offset, y, x + label_x_offset + bar_width, y + bar_height], fill=self.bar_bg_color)
+    def _draw_progress_frame(self, draw, row):
+        """进度条的静态部分：背景条与标签。"""
+        x, y, bar_x = row.x, row.y, row.x + row.label_offset
 
-        # 绘制前景条
-        fill_width = bar_width * (percentage / 100)
-        draw.rectangle([x + label_x_offset, y, x + label_x_offset + fill_width, y + bar_height], fill=self.brand_color)
+        # 绘制背景条
+        draw.rectangle([bar_x, y, bar_x + row.bar_width, y + BAR_HEIGHT], fill=self.bar_bg_color)
 
         # 绘制标签
-        self._draw_text(draw, f"{label}:", (x, y + 2), self.font_main, self.text_color)
+        self._draw_text(draw, f"{row.label}:", (x, y + 2), self.font_main, self.text_color)
+
+    def _draw_progress_value(self, draw, row, percentage, text_right=""):
+        """进度条的动态部分：前景条、百分比与右侧文本。"""
+        y, bar_x = row.y, row.x + row.label_offset
+
+        # 绘制前景条
+        fill_width = row.bar_width * (percentage / 100)
+        draw.rectangle([bar_x, y, bar_x + fill_width, y + BAR_HEIGHT], fill=self.brand_color)
 
         # 绘制百分比 (垂直居中)
         percentage_text = f"{percentage:.1f}%"
@@ -106,8 +590,8 @@ class ImageGenerator:
         text_width = text_bbox[2] - text_bbox[0]
         text_height = text_bbox[3] - text_bbox[1]
 
-        text_x = x + label_x_offset + (fill_width - text_width) / 2
-        text_y = y + (bar_height - text_height) / 2 - 2  # 微调
+        text_x = bar_x + (fill_width - text_width) / 2
+        text_y = y + (BAR_HEIGHT - text_height) / 2 - 2  # 微调
 
         # 确保文本在蓝色条内部
         if text_width < fill_width - 10:
@@ -116,4 +600,14 @@ class ImageGenerator:
             )
 
         if text_right:
-            self._draw_text(draw, text_right, (x + label_x_offset + bar_width + 15, y + 2), self.font_main, self.text_color)
\ No newline at end of file
+            self._draw_text(draw, text_right, (bar_x + row.bar_width + 15, y + 2), self.font_main, self.text_color)
+
+_shared_generator: Optional[ImageGenerator] = None
+
+
+def get_image_generator() -> ImageGenerator:
+    """获取进程内共享的 ImageGenerator 实例 (使用默认字体搜索路径)。"""
+    global _shared_generator
+    if _shared_generator is None:
+        _shared_generator = ImageGenerator()
+    return _shared_generator
@@ -0,0 +1,113 @@
+"""
+消息中 @ 提及的扫描。
+
+MoFox 的 @ 信息位于 message_segment 中：type 为 "at" 的段，data 为 "昵称:QQ号"、"QQ号" 或 {"qq": "QQ号"}；
+type 为 "seglist" 的段的 data 是子段列表，可以任意嵌套 (例如合并转发)。
+这里用显式栈迭代遍历，不递归、不为每一层构建中间列表；只关心某些 ID 是否被 @ 时，遇到第一个命中即停止，
+"昵称:QQ号" 也直接按位置比较，不做 split。
+"""
+from typing import Any, Collection, Iterator, Optional
+
+
+def _at_data_matches(at_data: Any, target_ids: Collection[str]) -> bool:
+    if isinstance(at_data, str):
+        # 与按第一个冒号 split 后取后半部分等价：QQ 号从第一个冒号之后开始 (没有冒号时为整个字符串)
+        start = at_data.find(":") + 1
+        for target_id in target_ids:
+            if len(at_data) - start == len(target_id) and at_data.endswith(target_id):
+                return True
+        return False
+    if isinstance(at_data, dict) and 'qq' in at_data:
+        return str(at_data['qq']) in target_ids
+    return False
+
+
+def _at_data_id(at_data: Any) -> Optional[str]:
+    if isinstance(at_data, str):
+        return at_data[at_data.find(":") + 1:]
+    if isinstance(at_data, dict) and 'qq' in at_data:
+        return str(at_data['qq'])
+    return None
+
+
+def _walk_at_data(segment: Any) -> Iterator[Any]:
+    """按消息中的顺序产出所有 at 段的 data。"""
+    if segment is None:
+        return
+    stack = [segment]
+    while stack:
+        seg = stack.pop()
+        seg_type = getattr(seg, 'type', None)
+        if seg_type == "at":
+            yield seg.data
+        elif seg_type == "seglist" and isinstance(seg.data, list):
+            # 逆序入栈，出栈顺序即为消息中的顺序
+            stack.extend(reversed(seg.data))
+
+
+def iter_mentions(segment: Any) -> Iterator[str]:
+    """按顺序产出消息段中被 @ 的用户ID。"""
+    for at_data in _walk_at_data(segment):
+        user_id = _at_data_id(at_data)
+        if user_id is not None:
+            yield user_id
+
+
+def mentions_any(segment: Any, target_ids: Collection[str]) -> bool:
+    """消息段中是否 @ 了 target_ids 中的任一用户。遇到第一个命中即返回。"""
+    if segment is None:
+        return False
+    # 与 _walk_at_data 相同的遍历，但内联在一个循环里；只判断是否命中，不关心顺序，子段无需逆序
+    stack = [segment]
+    pop = stack.pop
+    extend = stack.extend
+    while stack:
+        seg = pop()
+        seg_type = getattr(seg, 'type', None)
+        if seg_type == "at":
+            if _at_data_matches(seg.data, target_ids):
+                return True
+        elif seg_type == "seglist":
+            data = seg.data
+            if isinstance(data, list):
+                extend(data)
+    return False
+
+
+def message_mentions(message: Any, target_ids: Collection[str]) -> bool:
+    """
+    消息是否 @ 了 target_ids 中的任一用户。
+    优先使用框架已解析好的 mentioned_user_ids，没有命中时再扫描 message_segment。
+    """
+    mentioned_user_ids = getattr(message, 'mentioned_user_ids', None)
+    if mentioned_user_ids:
+        for user_id in mentioned_user_ids:
+            if str(user_id) in target_ids:
+                return True
+    return mentions_any(getattr(message, 'message_segment', None), target_ids)
+
+
+def has_mentions(segment: Any) -> bool:
+    """消息段中是否有任何 at 段 (不关心 @ 的是谁)。"""
+    for _ in _walk_at_data(segment):
+        return True
+    return False
+
+
+_MISSING = object()
+
+
+def message_may_mention(message: Any) -> bool:
+    """
+    廉价预判消息是否可能 @ 了某人：返回 False 时 message_mentions 对任何 ID 都一定返回 False。
+    只看框架的 @ 标记 (is_mentioned / is_at / mentioned_user_ids) 与 message_segment 中的 at 段，不看文本：
+    @ 段不一定出现在纯文本里，文本中的 "@" 也不一定是 @ 段。消息没有 message_segment 属性时无法判断，返回 True。
+    """
+    if getattr(message, 'is_mentioned', False) or getattr(message, 'is_at', False):
+        return True
+    if getattr(message, 'mentioned_user_ids', None):
+        return True
+    segment = getattr(message, 'message_segment', _MISSING)
+    if segment is _MISSING:
+        return True
+    return has_mentions(segment)
@@ -0,0 +1,82 @@
+"""
+消息文本的统一提取。
+
+不同来源的消息对象把文本放在不同的属性里 (processed_plain_text / plain_text / text / content / raw_content)，
+有的只有消息段列表。这里按消息类型记住上一次取到文本的属性，之后同类型的消息直接读取该属性；
+去除首尾空白后的文本缓存在消息对象上，别名、@ 和禁言检查共用，同一条消息只提取、strip 一次。
+"""
+from typing import Any, Dict, Optional
+
+# 按优先级尝试的文本属性
+TEXT_ATTRIBUTES = ("processed_plain_text", "plain_text", "text", "content", "raw_content")
+
+# 缓存在消息对象上的属性名
+_CACHE_ATTR = "_mute_plugin_text"
+
+# 消息类型 -> 上次取到文本的属性名
+_text_attr_by_type: Dict[type, str] = {}
+
+
+def get_message_text(message: Any) -> str:
+    """返回消息去除首尾空白后的文本 (没有文本时为空串)。结果缓存在消息对象上。"""
+    try:
+        return message.__dict__[_CACHE_ATTR]
+    except (AttributeError, KeyError):
+        pass
+
+    text = _extract_text(message).strip()
+    try:
+        setattr(message, _CACHE_ATTR, text)
+    except (AttributeError, TypeError, ValueError):
+        # __slots__ 或禁止新增属性的模型对象：不缓存，下次重新提取 (属性解析仍按类型记忆)
+        pass
+    return text
+
+
+def get_sender_id(message: Any) -> Optional[str]:
+    """
+    返回消息发送者的用户ID (字符串)，取不到时返回 None。
+    user_info 可能直接在消息上，也可能在 message_info 中，且可能是对象或字典。
+    """
+    if message is None:
+        return None
+    user_info = getattr(message, 'user_info', None)
+    if user_info is None:
+        user_info = getattr(getattr(message, 'message_info', None), 'user_info', None)
+    if isinstance(user_info, dict):
+        user_id = user_info.get('user_id')
+    else:
+        user_id = getattr(user_info, 'user_id', None)
+    if user_id is None:
+        user_id = getattr(message, 'user_id', None)
+    return None if user_id is None else str(user_id)
+
+
+def _extract_text(message: Any) -> str:
+    message_type = type(message)
+    remembered = _text_attr_by_type.get(message_type)
+    if remembered is not None:
+        value = getattr(message, remembered, None)
+        if value and isinstance(value, str):
+            return value
+
+    attr = _resolve_text_attr(message)
+    if attr is not None:
+        _text_attr_by_type[message_type] = attr
+        return getattr(message, attr)
+
+    # 以上属性都没有文本时，尝试把消息段列表中的 text 段拼接起来
+    segments = getattr(message, 'segments', None) or []
+    text_parts = []
+    for seg in segments:
+        if isinstance(seg, dict) and seg.get('type') == 'text':
+            text_parts.append((seg.get('data') or {}).get('text', ''))
+    return ''.join(text_parts)
+
+
+def _resolve_text_attr(message: Any) -> Optional[str]:
+    for attr in TEXT_ATTRIBUTES:
+        value = getattr(message, attr, None)
+        if value and isinstance(value, str):
+            return attr
+    return None
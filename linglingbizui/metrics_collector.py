@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Background system metrics sampler for the status card.
+"""
+import logging
+import platform
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+
+DEFAULT_SAMPLE_INTERVAL = 5.0
+DEFAULT_HISTORY_SIZE = 60
+# 单个挂载点 disk_usage 的超时；网络挂载 (NFS/SMB) 卡住时跳过它，沿用上一次的数据
+DEFAULT_MOUNT_TIMEOUT = 1.0
+# 分区列表的刷新间隔 (挂载点很少变化，不必每次采样都枚举)
+DEFAULT_PARTITION_REFRESH = 60.0
+# 不计入状态卡片的文件系统类型
+EXCLUDED_FSTYPES = frozenset({"squashfs", "tmpfs", "devtmpfs", "overlay", "iso9660"})
+
+
+def format_uptime(seconds: float) -> str:
+    """把秒数格式化为 "10天 2小时 15分钟"。"""
+    minutes = int(seconds // 60)
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{days}天 {hours}小时 {minutes}分钟"
+
+
+class MetricsSampler:
+    """
+    在后台线程中按固定间隔采样系统指标，结果保存在环形缓冲区中。
+    状态请求通过 latest() 直接读取最近一次快照，不会等待 psutil。
+    """
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_SAMPLE_INTERVAL,
+        history: int = DEFAULT_HISTORY_SIZE,
+        mount_timeout: float = DEFAULT_MOUNT_TIMEOUT,
+        partition_refresh: float = DEFAULT_PARTITION_REFRESH,
+    ):
+        self.interval = interval
+        self.mount_timeout = mount_timeout
+        self.partition_refresh = partition_refresh
+        self._snapshots: Deque[dict] = deque(maxlen=max(1, history))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # 挂载点状态
+        self._partitions: List[Any] = []
+        self._partitions_at = 0.0
+        self._last_disk: Dict[str, dict] = {}
+        # 上一次 disk_usage 仍未返回的挂载点：不再重复查询，避免卡住的调用不断堆积线程
+        self._pending_mounts: Set[str] = set()
+
+        self.os_type = platform.system()
+        self.os_version = platform.release()
+        self.python_version = platform.python_version()
+
+    # --- 读取 ---
+
+    def latest(self) -> Optional[dict]:
+        """最近一次快照 (副本)。后台线程尚未完成第一次采样时返回 None。"""
+        with self._lock:
+            if not self._snapshots:
+                return None
+            return _copy_snapshot(self._snapshots[-1])
+
+    def history(self) -> List[dict]:
+        """环形缓冲区中的全部快照 (从旧到新)。"""
+        with self._lock:
+            return [_copy_snapshot(s) for s in self._snapshots]
+
+    # --- 后台采样 ---
+
+    def start(self) -> None:
+        """启动后台采样线程 (已启动时不做任何事)。"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        # 第一次调用只建立基准，之后每次返回的是两次调用之间的平均占用，不需要 sleep
+        psutil.cpu_percent(interval=None)
+        self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """停止后台采样线程。卡住的 disk_usage 调用在守护线程中，不会被等待。"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def sample(self) -> dict:
+        """立即采样一次并写入环形缓冲区。CPU 为距上一次采样的平均占用。"""
+        memory = psutil.virtual_memory()
+        snapshot = {
+            "timestamp": time.time(),
+            "os_type": self.os_type,
+            "os_version": self.os_version,
+            "python_version": self.python_version,
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "ram_percent": memory.percent,
+            "ram_total_gb": memory.total / GB,
+            "ram_used_gb": memory.used / GB,
+            "disks": self._sample_disks(),
+            "boot_time": format_uptime(time.time() - psutil.boot_time()),
+        }
+        with self._lock:
+            self._snapshots.append(snapshot)
+        return snapshot
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning("Failed to sample system metrics: %s", e)
+            self._stop.wait(self.interval)
+
+    def _sample_disks(self) -> List[dict]:
+        now = time.monotonic()
+        if not self._partitions or now - self._partitions_at >= self.partition_refresh:
+            self._partitions = [
+                p for p in psutil.disk_partitions(all=False) if p.fstype and p.fstype not in EXCLUDED_FSTYPES
+            ]
+            self._partitions_at = now
+
+        # 所有挂载点并行查询，整体等待时间不超过 mount_timeout
+        probes = {}
+        for partition in self._partitions:
+            mountpoint = partition.mountpoint
+            if mountpoint not in self._pending_mounts:
+                probes[mountpoint] = self._probe(mountpoint)
+
+        deadline = time.monotonic() + self.mount_timeout
+        disks = []
+        for partition in self._partitions:
+            mountpoint = partition.mountpoint
+            probe = probes.get(mountpoint)
+            if probe is not None:
+                thread, result = probe
+                thread.join(max(0.0, deadline - time.monotonic()))
+                if thread.is_alive():
+                    logger.warning("disk_usage(%s) timed out after %ss, using last known value.", mountpoint, self.mount_timeout)
+                elif "usage" in result:
+                    usage = result["usage"]
+                    self._last_disk[mountpoint] = {
+                        "mountpoint": mountpoint,
+                        "percent": usage.percent,
+                        "total_gb": usage.total / GB,
+                        "used_gb": usage.used / GB,
+                    }
+                else:
+                    logger.debug("disk_usage(%s) failed: %s", mountpoint, result.get("error"))
+                    self._last_disk.pop(mountpoint, None)
+            disk = self._last_disk.get(mountpoint)
+            if disk is not None:
+                disks.append(disk)
+        return disks
+
+    def _probe(self, mountpoint: str) -> Tuple[threading.Thread, Dict[str, Any]]:
+        """在守护线程中调用 disk_usage：卡住的网络挂载只会占住这一个线程，也不会阻止进程退出。"""
+        result: Dict[str, Any] = {}
+
+        def run():
+            try:
+                result["usage"] = psutil.disk_usage(mountpoint)
+            except OSError as e:
+                result["error"] = e
+            finally:
+                self._pending_mounts.discard(mountpoint)
+
+        self._pending_mounts.add(mountpoint)
+        thread = threading.Thread(target=run, name=f"metrics-disk-{mountpoint}", daemon=True)
+        thread.start()
+        return thread, result
+
+
+def _copy_snapshot(snapshot: dict) -> dict:
+    copied = dict(snapshot)
+    copied["disks"] = [dict(d) for d in snapshot["disks"]]
+    return copied
+
+
+_shared_sampler: Optional[MetricsSampler] = None
+
+
+def get_metrics_sampler() -> MetricsSampler:
+    """获取进程内共享的采样器实例 (需调用 start() 启动后台采样)。"""
+    global _shared_sampler
+    if _shared_sampler is None:
+        _shared_sampler = MetricsSampler()
+    return _shared_sampler
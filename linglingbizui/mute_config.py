@@ -0,0 +1,236 @@
+"""
+插件配置的编译快照。
+
+配置在插件加载（以及 config.toml 变化）时编译为一个不可变对象，
+各组件通过 `config_state.current` 一次属性访问读取，消息处理路径上不再逐项 get_config。
+别名前缀树也随快照一起构建，配置变化时自动重建；安静时段规则同样在编译时解析。
+"""
+import asyncio
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from .alias_matcher import AliasMatcher
+from .mute_metrics import DEFAULT_EXPORT_INTERVAL, DEFAULT_STAGE_SAMPLE_EVERY, get_mute_metrics
+from .mute_logging import get_logger, setup_logging
+from .notice_sender import get_notice_queue
+from .quiet_hours import QuietRule, get_quiet_hours, parse_quiet_rule
+from .thinking_pool import get_thinking_pool
+
+try:
+    import tomllib
+except ImportError: # Python < 3.11
+    tomllib = None
+
+logger = get_logger("MuteAndUnmutePlugin")
+
+DEFAULT_MUTE_START = "好的，我将在当前聊天中保持安静，直到 {unmute_time_str}。"
+DEFAULT_UNMUTE_START = "好的，我恢复发言了！"
+DEFAULT_AT_UNMUTE = "我被 @ 了，所以恢复发言啦！"
+DEFAULT_JOURNAL_PATH = os.path.join("data", "mute_and_unmute_plugin", "mute_journal.jsonl")
+
+
+@dataclass(frozen=True)
+class MuteConfig:
+    """编译后的插件配置（只读）。"""
+    plugin_enabled: bool = True
+    mute_enabled: bool = True
+    at_unmute_enabled: bool = True
+    expire_notify_enabled: bool = False
+    default_mute_minutes: int = 10
+    mute_cooldown_seconds: float = 30.0
+    master_users: FrozenSet[str] = frozenset()
+    mute_aliases: Tuple[str, ...] = ("绫绫闭嘴",)
+    unmute_aliases: Tuple[str, ...] = ("绫绫张嘴",)
+    mute_start: str = DEFAULT_MUTE_START
+    unmute_start: str = DEFAULT_UNMUTE_START
+    muted_reply: str = ""
+    at_unmute: str = DEFAULT_AT_UNMUTE
+    log_level: str = "INFO"
+    log_queue_enabled: bool = True
+    journal_enabled: bool = True
+    journal_path: str = DEFAULT_JOURNAL_PATH
+    journal_compact_threshold: int = 1000
+    flush_window_ms: int = 200
+    thinking_max_concurrency: int = 2
+    thinking_timeout_seconds: float = 30.0
+    thinking_max_pending: int = 100
+    quiet_hours: Tuple[QuietRule, ...] = ()
+    sender_max_concurrency: int = 4
+    sender_rate_per_second: float = 5.0
+    sender_per_stream_rate: float = 0.5
+    sender_per_stream_burst: int = 2
+    sender_max_pending_per_stream: int = 10
+    metrics_enabled: bool = True
+    metrics_prometheus_path: str = ""
+    metrics_export_interval: float = DEFAULT_EXPORT_INTERVAL
+    metrics_stage_sample_every: int = DEFAULT_STAGE_SAMPLE_EVERY
+    # 编译时的原始配置，仅供调试
+    raw: Dict[str, Any] = field(default_factory=dict, compare=False, repr=False)
+    # 由别名列表构建的前缀树，见 __post_init__
+    alias_matcher: AliasMatcher = field(init=False, compare=False, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "alias_matcher", AliasMatcher(self.mute_aliases, self.unmute_aliases))
+
+    @property
+    def active(self) -> bool:
+        """插件与静音功能是否同时启用。"""
+        return self.plugin_enabled and self.mute_enabled
+
+    def is_master(self, user_id: Optional[str]) -> bool:
+        """用户是否在 [permissions] master_users 中 (批量操作等影响其他聊天流的功能仅限这些用户)。"""
+        return user_id is not None and user_id in self.master_users
+
+
+def _aliases(value: Any, default: Tuple[str, ...]) -> Tuple[str, ...]:
+    if not isinstance(value, (list, tuple)):
+        return default
+    # 去掉空白与重复项，保持配置中的顺序
+    return tuple(dict.fromkeys(str(a).strip() for a in value if str(a).strip()))
+
+
+def _user_ids(value: Any) -> FrozenSet[str]:
+    if not isinstance(value, (list, tuple)):
+        return frozenset()
+    return frozenset(str(u).strip() for u in value if str(u).strip())
+
+
+def _quiet_rules(value: Any) -> Tuple[QuietRule, ...]:
+    if not isinstance(value, (list, tuple)):
+        return ()
+    rules = []
+    for rule in value:
+        parsed = parse_quiet_rule(str(rule))
+        if parsed is None:
+            logger.warning("Ignoring invalid quiet hours rule %r (expected '<stream_id> HH:MM-HH:MM').", rule)
+            continue
+        rules.append(parsed)
+    return tuple(rules)
+
+
+def compile_config(config: Optional[Dict[str, Any]]) -> MuteConfig:
+    """把插件的原始配置字典编译为 MuteConfig。缺失的项使用默认值。"""
+    config = config or {}
+    plugin = config.get("plugin", {}) or {}
+    features = config.get("features", {}) or {}
+    defaults = config.get("defaults", {}) or {}
+    aliases = config.get("aliases", {}) or {}
+    messages = config.get("messages", {}) or {}
+    logging_config = config.get("logging", {}) or {}
+    persistence = config.get("persistence", {}) or {}
+    thinking = config.get("thinking", {}) or {}
+    quiet_hours = config.get("quiet_hours", {}) or {}
+    sender = config.get("sender", {}) or {}
+    permissions = config.get("permissions", {}) or {}
+    metrics = config.get("metrics", {}) or {}
+    base = MuteConfig()
+    return MuteConfig(
+        plugin_enabled=bool(plugin.get("enabled", base.plugin_enabled)),
+        mute_enabled=bool(features.get("mute_enabled", base.mute_enabled)),
+        at_unmute_enabled=bool(features.get("at_unmute_enabled", base.at_unmute_enabled)),
+        expire_notify_enabled=bool(features.get("expire_notify_enabled", base.expire_notify_enabled)),
+        default_mute_minutes=int(defaults.get("default_mute_minutes", base.default_mute_minutes)),
+        mute_cooldown_seconds=float(defaults.get("mute_cooldown_seconds", base.mute_cooldown_seconds)),
+        master_users=_user_ids(permissions.get("master_users")),
+        mute_aliases=_aliases(aliases.get("mute"), base.mute_aliases),
+        unmute_aliases=_aliases(aliases.get("unmute"), base.unmute_aliases),
+        mute_start=str(messages.get("mute_start", base.mute_start)),
+        unmute_start=str(messages.get("unmute_start", base.unmute_start)),
+        muted_reply=str(messages.get("muted_reply", base.muted_reply)),
+        at_unmute=str(messages.get("at_unmute", base.at_unmute)),
+        log_level=str(logging_config.get("level", base.log_level)).upper(),
+        log_queue_enabled=bool(logging_config.get("queue_enabled", base.log_queue_enabled)),
+        journal_enabled=bool(persistence.get("journal_enabled", base.journal_enabled)),
+        journal_path=str(persistence.get("journal_path", base.journal_path)),
+        journal_compact_threshold=int(persistence.get("compact_threshold", base.journal_compact_threshold)),
+        flush_window_ms=int(persistence.get("flush_window_ms", base.flush_window_ms)),
+        thinking_max_concurrency=int(thinking.get("max_concurrency", base.thinking_max_concurrency)),
+        thinking_timeout_seconds=float(thinking.get("timeout_seconds", base.thinking_timeout_seconds)),
+        thinking_max_pending=int(thinking.get("max_pending", base.thinking_max_pending)),
+        quiet_hours=_quiet_rules(quiet_hours.get("rules")),
+        sender_max_concurrency=int(sender.get("max_concurrency", base.sender_max_concurrency)),
+        sender_rate_per_second=float(sender.get("rate_per_second", base.sender_rate_per_second)),
+        sender_per_stream_rate=float(sender.get("per_stream_rate_per_second", base.sender_per_stream_rate)),
+        sender_per_stream_burst=int(sender.get("per_stream_burst", base.sender_per_stream_burst)),
+        sender_max_pending_per_stream=int(sender.get("max_pending_per_stream", base.sender_max_pending_per_stream)),
+        metrics_enabled=bool(metrics.get("enabled", base.metrics_enabled)),
+        metrics_prometheus_path=str(metrics.get("prometheus_path", base.metrics_prometheus_path)),
+        metrics_export_interval=float(metrics.get("export_interval_seconds", base.metrics_export_interval)),
+        metrics_stage_sample_every=int(metrics.get("stage_sample_every", base.metrics_stage_sample_every)),
+        raw=config,
+    )
+
+
+class ConfigState:
+    """持有当前生效的配置快照，并可监视 config.toml 的变化自动重新编译。"""
+
+    def __init__(self):
+        self.current: MuteConfig = MuteConfig()
+        self._watch_task: Optional[asyncio.Task] = None
+
+    def update(self, config: Optional[Dict[str, Any]]) -> MuteConfig:
+        """用新的原始配置重新编译快照，并按其中的配置重新设置插件日志、主动思考任务池、安静时段、提示发送队列与指标导出。"""
+        self.current = compile_config(config)
+        setup_logging(self.current.log_level, self.current.log_queue_enabled)
+        get_thinking_pool().configure(
+            self.current.thinking_max_concurrency,
+            self.current.thinking_timeout_seconds,
+            self.current.thinking_max_pending,
+        )
+        get_quiet_hours().configure(self.current.quiet_hours)
+        get_notice_queue().configure(
+            self.current.sender_max_concurrency,
+            self.current.sender_rate_per_second,
+            self.current.sender_per_stream_rate,
+            self.current.sender_per_stream_burst,
+            self.current.sender_max_pending_per_stream,
+        )
+        get_mute_metrics().configure(
+            self.current.metrics_enabled,
+            self.current.metrics_prometheus_path,
+            self.current.metrics_export_interval,
+            self.current.metrics_stage_sample_every,
+        )
+        return self.current
+
+    def watch_file(self, path: str, interval: float = 5.0) -> None:
+        """按 mtime 轮询 config.toml，文件变化时重新编译快照。"""
+        if tomllib is None or (self._watch_task is not None and not self._watch_task.done()):
+            return
+        self._watch_task = asyncio.get_running_loop().create_task(self._watch_loop(path, interval))
+
+    async def stop_watching(self) -> None:
+        task, self._watch_task = self._watch_task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _watch_loop(self, path: str, interval: float) -> None:
+        last_mtime = _mtime(path)
+        while True:
+            await asyncio.sleep(interval)
+            mtime = _mtime(path)
+            if mtime is None or mtime == last_mtime:
+                continue
+            last_mtime = mtime
+            try:
+                with open(path, "rb") as f:
+                    self.update(tomllib.load(f))
+                logger.info("Reloaded config from %s.", path)
+            except Exception as e:
+                logger.warning("Failed to reload config from %s: %s", path, e)
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+config_state = ConfigState()
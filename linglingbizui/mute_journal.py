@@ -0,0 +1,77 @@
+"""
+禁言状态的追加式日志 (journal)。
+
+每次禁言/解除只向日志文件追加一行 JSON (同一写入窗口内的多行合并为一次写入)，写入代价与禁言表大小无关；
+日志累积到一定条数后，由注册表把当前状态作为快照写入 storage 并截断日志 (compaction)。
+启动时先读取快照，再按顺序重放日志，即可恢复重启前的禁言状态。
+"""
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
+from .mute_logging import get_logger
+
+logger = get_logger("MuteJournal")
+
+OP_MUTE = "m"
+OP_UNMUTE = "u"
+
+
+class MuteJournal:
+    """一个按行追加的 JSON 日志文件。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries_since_compaction = 0
+        self._file: Optional[TextIO] = None
+
+    def replay(self) -> Iterator[Tuple[str, str, Optional[float]]]:
+        """按写入顺序产出 (op, stream_id, unmute_timestamp)。损坏的行 (例如写到一半时进程退出) 会被跳过。"""
+        try:
+            f = open(self.path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record: Dict[str, Any] = json.loads(line)
+                    yield record["op"], str(record["s"]), record.get("t")
+                except (ValueError, KeyError, TypeError):
+                    logger.warning("Skipping corrupt journal line %s in %s.", line_no, self.path)
+
+    def append(self, ops: Iterable[Tuple[str, str, Optional[float]]]) -> None:
+        """把一批 (op, stream_id, unmute_timestamp) 以一次写入追加到日志。"""
+        self._write(tuple(_encode(op, stream_id, unmute_timestamp) for op, stream_id, unmute_timestamp in ops))
+
+    def truncate(self) -> None:
+        """清空日志 (快照已写入 storage 之后调用)。"""
+        self.close()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8"):
+            pass
+        self.entries_since_compaction = 0
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, lines: Tuple[str, ...]) -> None:
+        if not lines:
+            return
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("".join(lines))
+        self._file.flush()
+        self.entries_since_compaction += len(lines)
+
+
+def _encode(op: str, stream_id: str, unmute_timestamp: Optional[float] = None) -> str:
+    record: Dict[str, Any] = {"op": op, "s": stream_id}
+    if unmute_timestamp is not None:
+        record["t"] = unmute_timestamp
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
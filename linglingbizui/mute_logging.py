@@ -0,0 +1,66 @@
+"""
+插件日志。
+
+统一使用标准库 logging：日志参数采用 %-风格延迟格式化，低于当前级别的日志不会做任何字符串格式化；
+可选通过 QueueHandler 把日志 I/O 交给后台线程，避免同步写 stdout 阻塞事件循环。
+"""
+import logging
+import logging.handlers
+import queue
+import sys
+from typing import Optional, Union
+
+ROOT_LOGGER_NAME = "mute_and_unmute"
+LOG_FORMAT = "%(asctime)s [%(levelname)s] [%(name)s] %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_installed_handler: Optional[logging.Handler] = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """获取插件下的子 logger，例如 get_logger("MuteControlChatter")。"""
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+
+def setup_logging(level: Union[int, str] = logging.INFO, use_queue: bool = True) -> None:
+    """
+    设置插件日志级别与输出方式，可重复调用（例如配置重载后）。
+    use_queue 为 True 时，日志记录只在调用方线程入队，由后台 QueueListener 线程负责写出。
+    """
+    global _listener, _installed_handler
+
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+        if not isinstance(level, int):
+            level = logging.INFO
+    root.setLevel(level)
+
+    shutdown_logging()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    if use_queue:
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        _installed_handler = logging.handlers.QueueHandler(log_queue)
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=False)
+        _listener.start()
+    else:
+        _installed_handler = stream_handler
+    root.addHandler(_installed_handler)
+    # 插件自己负责输出，避免与框架的根 logger 重复打印
+    root.propagate = False
+
+
+def shutdown_logging() -> None:
+    """移除插件安装的处理器，并等待后台线程把队列中的日志写完。之后的日志交回框架的根 logger 输出。"""
+    global _listener, _installed_handler
+
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    if _installed_handler is not None:
+        root.removeHandler(_installed_handler)
+        _installed_handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    root.propagate = True
@@ -0,0 +1,312 @@
+"""
+禁言处理路径的分阶段耗时直方图与事件计数器。
+
+各阶段用 time.perf_counter_ns() 计时，耗时写入固定分桶的直方图：每次记录只有一次二分查找和几次整数自增，不分配内存。
+分位数 (p50/p95/p99) 由桶计数估算，在所在桶的上下界之间线性插值，误差不超过一个桶宽。
+每条消息路径上的阶段耗时按 sample() 采样 (每 N 条记录一条)，事件计数逐条记录。
+计数器记录处理的消息、拦截、别名命中、@ 解除、禁言到期等事件；注册表、发送队列与主动思考任务池已有的统计在导出时一并读取。
+全部统计可渲染为 Prometheus 文本格式，定期写入本地文件 (例如供 node_exporter 的 textfile collector 采集)。
+"""
+import asyncio
+import bisect
+import functools
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .mute_logging import get_logger
+from .mute_registry import get_mute_registry
+from .notice_sender import get_notice_queue
+from .thinking_pool import get_thinking_pool
+
+logger = get_logger("MuteMetrics")
+
+# --- 阶段与计数器 ---
+
+STAGE_TEXT = "text"              # 提取消息文本
+STAGE_ALIAS = "alias"            # 别名预筛与前缀树匹配
+STAGE_MENTION = "mention"        # @ 扫描
+STAGE_REGISTRY = "registry"      # 禁言注册表的查询与修改 (含安静时段)
+STAGE_NOTIFY = "notify"          # 提示放入发送队列
+STAGE_SEND = "send"              # 发送队列中一次实际的网络发送
+STAGE_GENERATOR = "generator"    # 主动思考中的一次生成调用
+STAGE_TOTAL = "total"            # Chatter 处理一条消息的总耗时
+
+STAGES = (
+    STAGE_TEXT, STAGE_ALIAS, STAGE_MENTION, STAGE_REGISTRY,
+    STAGE_NOTIFY, STAGE_SEND, STAGE_GENERATOR, STAGE_TOTAL,
+)
+
+COUNTER_MESSAGES = "messages"          # 处理的消息
+COUNTER_FAST_PATH = "fast_path"        # 由快速路径直接判定的消息
+COUNTER_INTERCEPTED = "intercepted"    # 因禁言被拦截的消息
+COUNTER_ALIAS_MUTE = "alias_mute"      # 禁言别名命中
+COUNTER_ALIAS_UNMUTE = "alias_unmute"  # 取消禁言别名命中
+COUNTER_AT_UNMUTE = "at_unmute"        # 因 @Bot 解除的禁言
+COUNTER_EXPIRED = "expired"            # 到期自动解除的禁言
+
+COUNTERS = (
+    COUNTER_MESSAGES, COUNTER_FAST_PATH, COUNTER_INTERCEPTED, COUNTER_ALIAS_MUTE,
+    COUNTER_ALIAS_UNMUTE, COUNTER_AT_UNMUTE, COUNTER_EXPIRED,
+)
+
+# 桶上界 (微秒)：1us 到 30s，大致按 1-2.5-5 递增。超过最后一个上界的记录落入 +Inf 桶
+BUCKET_BOUNDS_US = (
+    1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+    1_000, 2_500, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000, 500_000,
+    1_000_000, 2_500_000, 5_000_000, 10_000_000, 30_000_000,
+)
+
+DEFAULT_EXPORT_INTERVAL = 60.0
+# 每条消息路径上的阶段耗时每 N 条记录一条 (计数器不采样)
+DEFAULT_STAGE_SAMPLE_EVERY = 16
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """固定分桶的耗时直方图 (纳秒)。桶 i 统计 bounds[i-1] < 耗时 <= bounds[i] 的记录，与 Prometheus 的 le 语义一致。"""
+
+    __slots__ = ("bounds", "counts", "count", "total_ns", "max_ns")
+
+    def __init__(self, bounds_us: Tuple[float, ...] = BUCKET_BOUNDS_US):
+        self.bounds = tuple(int(b * 1000) for b in bounds_us)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def observe(self, elapsed_ns: int) -> None:
+        self.counts[bisect.bisect_left(self.bounds, elapsed_ns)] += 1
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+
+    def quantile(self, q: float) -> float:
+        """估算分位数 (纳秒)，没有记录时返回 0。落在 +Inf 桶时以记录到的最大值为上界。"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if not bucket_count or cumulative + bucket_count < target:
+                cumulative += bucket_count
+                continue
+            lower = self.bounds[i - 1] if i else 0
+            upper = self.bounds[i] if i < len(self.bounds) else max(self.max_ns, lower)
+            return lower + (upper - lower) * (target - cumulative) / bucket_count
+        return float(self.max_ns)
+
+    def reset(self) -> None:
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+
+class MuteMetrics:
+    """各阶段的耗时直方图与事件计数器。记录在事件循环线程中进行，不加锁。"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.histograms: Dict[str, Histogram] = {stage: Histogram() for stage in STAGES}
+        self.counters: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self.export_path = ""
+        self.export_interval = DEFAULT_EXPORT_INTERVAL
+        self.sample_every = DEFAULT_STAGE_SAMPLE_EVERY
+        self._sample_countdown = 1
+        self._export_task: Optional[asyncio.Task] = None
+
+    def configure(self, enabled: bool, export_path: str, export_interval: float,
+                  sample_every: int = DEFAULT_STAGE_SAMPLE_EVERY) -> None:
+        """更新开关、采样间隔与导出设置；正在运行的导出任务在下一轮按新的设置写出。"""
+        self.enabled = bool(enabled)
+        self.export_path = export_path
+        self.export_interval = max(1.0, float(export_interval))
+        self.sample_every = max(1, int(sample_every))
+        self._sample_countdown = min(self._sample_countdown, self.sample_every)
+
+    # --- 记录 ---
+
+    def observe(self, stage: str, elapsed_ns: int) -> None:
+        """记录一次阶段耗时 (纳秒)，通常为两次 time.perf_counter_ns() 之差。"""
+        if self.enabled:
+            self.histograms[stage].observe(elapsed_ns)
+
+    def incr(self, counter: str, amount: int = 1) -> None:
+        if self.enabled:
+            self.counters[counter] += amount
+
+    def sample(self) -> bool:
+        """
+        每条消息调用一次，决定这条消息是否记录阶段耗时：每 sample_every 条返回一次 True。
+        消息路径上每次 observe 连同两次计时约需 0.5us，逐条记录时比快速路径本身还慢；
+        采样后直方图的次数约为消息数的 1/N，分位数不受影响。
+        """
+        if not self.enabled:
+            return False
+        self._sample_countdown -= 1
+        if self._sample_countdown:
+            return False
+        self._sample_countdown = self.sample_every
+        return True
+
+    def timed(self, stage: str, func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        """包装一个异步函数，每次调用 (无论成功与否) 的耗时记入 stage。"""
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.observe(stage, time.perf_counter_ns() - start)
+        return wrapper
+
+    def reset(self) -> None:
+        """清空全部直方图与计数器。"""
+        for histogram in self.histograms.values():
+            histogram.reset()
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    # --- 汇总与导出 ---
+
+    def summary(self) -> str:
+        """各阶段的次数与 p50/p95/p99，以及事件计数，供命令直接回复。"""
+        lines = ["阶段 次数 p50/p95/p99"]
+        for stage, histogram in self.histograms.items():
+            if not histogram.count:
+                continue
+            quantiles = "/".join(_format_duration(histogram.quantile(q)) for q in QUANTILES)
+            lines.append(f"{stage} {histogram.count} {quantiles}")
+        if len(lines) == 1:
+            lines.append("(暂无记录)")
+        lines.append("计数: " + ", ".join(f"{name}={value}" for name, value in self.counters.items()))
+        runtime = collect_runtime_counters()
+        lines.append("运行状态: " + ", ".join(f"{name}={_format_value(value)}" for name, _, _, value in runtime))
+        return "\n".join(lines)
+
+    def render_prometheus(self) -> str:
+        """渲染为 Prometheus 文本格式 (耗时单位为秒)。"""
+        lines = [
+            "# HELP mute_stage_duration_seconds Latency of each stage of the mute pipeline.",
+            "# TYPE mute_stage_duration_seconds histogram",
+        ]
+        for stage, histogram in self.histograms.items():
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.bounds, histogram.counts):
+                cumulative += bucket_count
+                lines.append(f'mute_stage_duration_seconds_bucket{{stage="{stage}",le="{bound / 1e9:g}"}} {cumulative}')
+            lines.append(f'mute_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'mute_stage_duration_seconds_sum{{stage="{stage}"}} {histogram.total_ns / 1e9:.9f}')
+            lines.append(f'mute_stage_duration_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        lines.append("# HELP mute_events_total Events seen by the mute pipeline.")
+        lines.append("# TYPE mute_events_total counter")
+        for name, value in self.counters.items():
+            lines.append(f'mute_events_total{{event="{name}"}} {value}')
+
+        for name, metric_type, help_text, value in collect_runtime_counters():
+            lines.append(f"# HELP mute_{name} {help_text}")
+            lines.append(f"# TYPE mute_{name} {metric_type}")
+            lines.append(f"mute_{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Optional[str] = None) -> bool:
+        """把 Prometheus 文本写入 path (默认为配置的导出路径)。先写临时文件再替换，采集方不会读到半个文件。"""
+        path = path or self.export_path
+        if not path:
+            return False
+        try:
+            _write_atomic(path, self.render_prometheus())
+            return True
+        except OSError as e:
+            logger.warning("Failed to write metrics to %s: %s", path, e)
+            return False
+
+    def start_export(self) -> None:
+        """启动后台导出任务 (已启动时不做任何事)。未配置导出路径时任务只等待，配置重载后自动开始写出。"""
+        if self._export_task is not None and not self._export_task.done():
+            return
+        self._export_task = asyncio.get_running_loop().create_task(self._export_loop())
+
+    async def stop_export(self) -> None:
+        """停止后台导出任务，并在配置了导出路径时最后写出一次。"""
+        task, self._export_task = self._export_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.write_prometheus()
+
+    async def _export_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.export_interval)
+            path = self.export_path
+            if not path:
+                continue
+            # 在事件循环线程中渲染 (读取统计时不会有并发修改)，文件写入交给线程池
+            text = self.render_prometheus()
+            try:
+                await loop.run_in_executor(None, _write_atomic, path, text)
+            except OSError as e:
+                logger.warning("Failed to write metrics to %s: %s", path, e)
+
+
+def collect_runtime_counters() -> List[Tuple[str, str, str, float]]:
+    """读取注册表、发送队列与主动思考任务池已有的统计：(指标名, 类型, 说明, 值)。"""
+    registry = get_mute_registry()
+    notice_queue = get_notice_queue()
+    thinking_pool = get_thinking_pool()
+    flush_stats = registry.flush_stats()
+    return [
+        ("active_mutes", "gauge", "Streams currently muted manually.", len(registry)),
+        ("redundant_mutes_total", "counter", "Repeated mute requests ignored within the cooldown.", registry.redundant_mutes),
+        ("storage_flushes_total", "counter", "Batched writes of mute changes to storage.", flush_stats["flush_count"]),
+        ("storage_flush_max_seconds", "gauge", "Slowest storage flush so far.", flush_stats["max_flush_ms"] / 1000),
+        ("notices_pending", "gauge", "Notices waiting in the send queue.", notice_queue.pending()),
+        ("notices_sent_total", "counter", "Notices sent.", notice_queue.sent),
+        ("notices_coalesced_total", "counter", "Notices merged into an identical pending notice.", notice_queue.coalesced),
+        ("notices_dropped_total", "counter", "Notices dropped because the queue was full.", notice_queue.dropped),
+        ("notices_failed_total", "counter", "Notices that failed to send.", notice_queue.failed),
+        ("thinking_submitted_total", "counter", "Proactive thinking jobs submitted.", thinking_pool.submitted),
+        ("thinking_timed_out_total", "counter", "Proactive thinking jobs that timed out.", thinking_pool.timed_out),
+        ("thinking_failed_total", "counter", "Proactive thinking jobs that failed.", thinking_pool.failed),
+    ]
+
+
+def _format_duration(ns: float) -> str:
+    """按量级选择单位：热路径上的阶段是微秒级，生成调用可能是秒级。"""
+    if ns < 1e6:
+        return f"{ns / 1e3:.1f}us"
+    if ns < 1e9:
+        return f"{ns / 1e6:.2f}ms"
+    return f"{ns / 1e9:.2f}s"
+
+
+def _format_value(value: float) -> str:
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+def _write_atomic(path: str, text: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+_mute_metrics: Optional[MuteMetrics] = None
+
+
+def get_mute_metrics() -> MuteMetrics:
+    """获取进程内唯一的指标实例。"""
+    global _mute_metrics
+    if _mute_metrics is None:
+        _mute_metrics = MuteMetrics()
+    return _mute_metrics
@@ -0,0 +1,405 @@
+"""
+进程内的禁言注册表。
+
+所有组件（命令、Chatter、Handler）共享同一份内存中的禁言表，
+每条消息的禁言检查只做一次字典查找；只有禁言状态发生变化时才写入持久化层。
+持久化优先使用追加式日志 (见 mute_journal)，storage 中只保存定期压缩出的快照；
+未配置日志时退回到整表写入 storage。
+写入采用 write-behind：一个时间窗口 (默认 200ms) 内的所有变更合并为一次落盘。
+过期的禁言由一个后台任务按解除时间（最小堆）批量清理，不再在消息处理路径上顺带删除。
+配置的每日安静时段 (见 quiet_hours) 与手动禁言叠加：禁言检查同时考虑两者，解除禁言也会提前结束当前的安静时段。
+
+注册表自身的读写都是同步的，在事件循环中天然原子；各处理器在修改状态与把提示放入发送队列之间
+不 await (检查并修改用 mute_if_extends / unmute_if_muted 一步完成)，因此不需要聊天流锁。
+"""
+import asyncio
+import atexit
+import heapq
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .mute_journal import OP_MUTE, OP_UNMUTE, MuteJournal
+from .mute_logging import get_logger
+from .quiet_hours import get_quiet_hours
+
+STORAGE_KEY_MUTED_STREAMS = "muted_streams" # 用于存储被禁言的聊天流ID及其解除时间
+
+# 过期回调：参数为本批次过期的聊天流ID列表
+ExpiredCallback = Callable[[List[str]], Awaitable[None]]
+# 待落盘的变更：(op, stream_id, unmute_timestamp)
+PendingOp = Tuple[str, str, Optional[float]]
+
+logger = get_logger("MuteRegistry")
+
+# 落盘失败后的重试间隔 (秒)：从 FLUSH_RETRY_BASE 开始每次失败翻倍，最长 FLUSH_RETRY_MAX
+FLUSH_RETRY_BASE = 1.0
+FLUSH_RETRY_MAX = 60.0
+
+
+class MuteRegistry:
+    """禁言注册表：内存字典负责查询，变更在写入窗口结束时合并落盘。"""
+
+    def __init__(self):
+        # stream_id -> 解除禁言的时间戳
+        self.muted_streams: Dict[str, float] = {}
+        self._storage: Optional[Any] = None
+        self._journal: Optional[MuteJournal] = None
+        self._compact_threshold = 1000
+        # write-behind 缓冲
+        self._pending_ops: List[PendingOp] = []
+        self._flush_window = 0.2
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._atexit_registered = False
+        # 连续落盘失败的次数 (决定下次重试的间隔)，成功一次后清零
+        self._flush_failures = 0
+        self.flush_retry_base = FLUSH_RETRY_BASE
+        self.flush_retry_max = FLUSH_RETRY_MAX
+        # 落盘统计 (秒)
+        self.flush_count = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.total_flush_latency = 0.0
+        self.failed_flushes = 0
+        # (解除时间戳, stream_id) 最小堆；被覆盖或提前解除的条目在出堆时按值校验后丢弃
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._sweeper_task: Optional[asyncio.Task] = None
+        self._sweeper_wakeup: Optional[asyncio.Event] = None
+        self._on_expired: Optional[ExpiredCallback] = None
+        self._quiet_hours = get_quiet_hours()
+        # 被判定为重复、未产生任何变更的禁言请求次数
+        self.redundant_mutes = 0
+
+    def bind_storage(
+        self,
+        storage: Any,
+        journal: Optional[MuteJournal] = None,
+        compact_threshold: int = 1000,
+        flush_window_ms: int = 200,
+    ) -> int:
+        """
+        绑定插件的 storage (以及可选的追加式日志)，并恢复重启前的禁言状态：
+        storage 可以是 storage_api.get_local_storage() 返回的带 get/set 的对象，也可以是 storage_api.get() 返回的字典式对象。
+        先读取 storage 中的快照，再重放日志，最后丢弃已过期的记录并立即压缩一次。
+        flush_window_ms 为写入合并窗口，0 表示每次变更立即落盘。
+        返回恢复出的有效禁言条数。
+        """
+        self._storage = storage
+        self._journal = journal
+        self._compact_threshold = max(1, compact_threshold)
+        self._flush_window = max(0, flush_window_ms) / 1000
+        self._pending_ops = []
+        if not self._atexit_registered:
+            # 框架未调用卸载钩子时，进程退出前也要把缓冲中的变更写出
+            atexit.register(self.close)
+            self._atexit_registered = True
+
+        stored = storage.get(STORAGE_KEY_MUTED_STREAMS, {}) or {}
+        muted_streams = {str(k): float(v) for k, v in stored.items()}
+        if journal is not None:
+            for op, stream_id, unmute_timestamp in journal.replay():
+                if op == OP_MUTE and unmute_timestamp is not None:
+                    muted_streams[stream_id] = float(unmute_timestamp)
+                elif op == OP_UNMUTE:
+                    muted_streams.pop(stream_id, None)
+
+        now = time.time()
+        self.muted_streams = {sid: ts for sid, ts in muted_streams.items() if ts > now}
+        self._rebuild_heap()
+        if journal is not None or len(self.muted_streams) != len(muted_streams):
+            self.compact()
+        return len(self.muted_streams)
+
+    def compact(self) -> None:
+        """把当前禁言表作为快照写入 storage，并截断追加式日志。快照已包含所有待落盘的变更。"""
+        self._cancel_flush()
+        self._pending_ops = []
+        if self._storage is not None:
+            self._save_snapshot()
+        if self._journal is not None:
+            self._journal.truncate()
+
+    def close(self) -> None:
+        """插件卸载/进程退出前调用：写出缓冲中的变更 (压缩一次) 并关闭日志文件。"""
+        if self._storage is None and self._journal is None:
+            return
+        self.compact()
+        if self._journal is not None:
+            self._journal.close()
+
+    def muted_until(self, stream_id: str, now: Optional[float] = None) -> Optional[float]:
+        """
+        生效的禁言截止时间：手动禁言与当前安静时段中较晚的一个，两者都没有时返回 None。
+        已过期但尚未被清理的手动禁言仍会返回，由调用方与当前时间比较。
+        """
+        unmute_timestamp = self.muted_streams.get(stream_id)
+        quiet_until = self._quiet_hours.quiet_until(stream_id, now)
+        if quiet_until is None:
+            return unmute_timestamp
+        if unmute_timestamp is None or unmute_timestamp < quiet_until:
+            return quiet_until
+        return unmute_timestamp
+
+    def is_muted(self, stream_id: str, now: Optional[float] = None) -> bool:
+        """聊天流当前是否处于禁言中 (手动禁言或安静时段)。已过期但尚未被清理的记录视为未禁言。"""
+        if now is None:
+            now = time.time()
+        unmute_timestamp = self.muted_streams.get(stream_id)
+        if unmute_timestamp is not None and now < unmute_timestamp:
+            return True
+        return self._quiet_hours.quiet_until(stream_id, now) is not None
+
+    def mute(self, stream_id: str, unmute_timestamp: float) -> Optional[float]:
+        """设置（或覆盖）聊天流的禁言截止时间，返回之前的截止时间 (没有则为 None)。"""
+        previous = self.muted_streams.get(stream_id)
+        self.muted_streams[stream_id] = unmute_timestamp
+        self._schedule_expiry(stream_id, unmute_timestamp)
+        self._record([(OP_MUTE, stream_id, unmute_timestamp)])
+        return previous
+
+    def unmute(self, stream_id: str) -> bool:
+        """
+        移除聊天流的禁言记录并提前结束当前的安静时段，
+        返回该聊天流之前是否处于禁言表中或安静时段中。
+        """
+        in_quiet_hours = self._quiet_hours.suppress(stream_id)
+        if self.muted_streams.pop(stream_id, None) is None:
+            return in_quiet_hours
+        self._record([(OP_UNMUTE, stream_id, None)])
+        return True
+
+    def mute_if_extends(
+        self,
+        stream_id: str,
+        unmute_timestamp: float,
+        tolerance: float = 0.0,
+        now: Optional[float] = None,
+    ) -> bool:
+        """
+        幂等禁言：聊天流当前已禁言 (手动禁言或安静时段)，且新的截止时间不比当前截止时间晚 tolerance 秒以上时，
+        视为重复请求，不修改状态也不落盘，返回 False；否则设置禁言并返回 True。
+        默认时长的别名被连续触发时，每次只把截止时间推后几秒，tolerance 即为这类重复触发的冷却窗口；
+        明确指定更长时长的请求仍会生效。
+        """
+        if now is None:
+            now = time.time()
+        current = self.muted_until(stream_id, now)
+        if current is not None and current > now and unmute_timestamp <= current + tolerance:
+            self.redundant_mutes += 1
+            return False
+        self.mute(stream_id, unmute_timestamp)
+        return True
+
+    def mute_many(self, stream_ids: Iterable[str], unmute_timestamp: float) -> List[str]:
+        """
+        批量设置禁言截止时间。所有变更作为一批写入缓冲并立即落盘一次，不等待写入窗口。
+        返回被设置的聊天流ID (去重，保持顺序)。
+        """
+        stream_ids = list(dict.fromkeys(stream_ids))
+        for stream_id in stream_ids:
+            self.muted_streams[stream_id] = unmute_timestamp
+            self._schedule_expiry(stream_id, unmute_timestamp)
+        if stream_ids:
+            self._record([(OP_MUTE, stream_id, unmute_timestamp) for stream_id in stream_ids])
+            self.flush()
+        return stream_ids
+
+    def unmute_many(self, stream_ids: Iterable[str]) -> List[str]:
+        """
+        批量解除禁言 (同时提前结束各聊天流当前的安静时段)。所有变更作为一批写入缓冲并立即落盘一次。
+        返回之前确实处于禁言中的聊天流ID。
+        """
+        unmuted: List[str] = []
+        ops: List[PendingOp] = []
+        for stream_id in dict.fromkeys(stream_ids):
+            in_quiet_hours = self._quiet_hours.suppress(stream_id)
+            if self.muted_streams.pop(stream_id, None) is not None:
+                ops.append((OP_UNMUTE, stream_id, None))
+                unmuted.append(stream_id)
+            elif in_quiet_hours:
+                unmuted.append(stream_id)
+        if ops:
+            self._record(ops)
+            self.flush()
+        return unmuted
+
+    def unmute_if_muted(self, stream_id: str, now: Optional[float] = None) -> bool:
+        """仅当聊天流当前仍处于禁言中时解除禁言 (检查与修改之间没有 await，不会被并发操作打断)。"""
+        if not self.is_muted(stream_id, now):
+            return False
+        return self.unmute(stream_id)
+
+    def pop_expired(self, now: Optional[float] = None) -> List[str]:
+        """
+        移除所有已到期的禁言记录，返回被移除的聊天流ID。
+        同一批次的移除作为一次变更进入写入缓冲。
+        """
+        now = time.time() if now is None else now
+        heap = self._expiry_heap
+        expired: List[str] = []
+        while heap and heap[0][0] <= now:
+            unmute_timestamp, stream_id = heapq.heappop(heap)
+            # 只有堆中条目与当前记录一致时才算真正过期（否则已被覆盖或提前解除）
+            if self.muted_streams.get(stream_id) == unmute_timestamp:
+                del self.muted_streams[stream_id]
+                expired.append(stream_id)
+        if expired:
+            self._record([(OP_UNMUTE, stream_id, None) for stream_id in expired])
+        return expired
+
+    # --- 后台过期清理 ---
+
+    def start_sweeper(self, on_expired: Optional[ExpiredCallback] = None) -> None:
+        """在当前事件循环中启动过期清理任务（重复调用只会更新回调）。"""
+        self._on_expired = on_expired
+        if self._sweeper_task is not None and not self._sweeper_task.done():
+            return
+        self._sweeper_wakeup = asyncio.Event()
+        self._sweeper_task = asyncio.get_running_loop().create_task(self._sweep_loop())
+
+    async def stop_sweeper(self) -> None:
+        """停止过期清理任务。"""
+        task, self._sweeper_task = self._sweeper_task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            wakeup = self._sweeper_wakeup
+            wakeup.clear()
+            timeout = None
+            if self._expiry_heap:
+                timeout = max(0.0, self._expiry_heap[0][0] - time.time())
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+            expired = self.pop_expired()
+            if expired and self._on_expired is not None:
+                try:
+                    await self._on_expired(expired)
+                except Exception as e:
+                    logger.error("Error in expiry callback for %s streams: %s", len(expired), e)
+
+    def _schedule_expiry(self, stream_id: str, unmute_timestamp: float) -> None:
+        heap = self._expiry_heap
+        is_new_head = not heap or unmute_timestamp < heap[0][0]
+        heapq.heappush(heap, (unmute_timestamp, stream_id))
+        # 反复覆盖同一聊天流会留下失效条目，堆明显大于禁言表时重建一次
+        if len(heap) > 2 * len(self.muted_streams) + 64:
+            self._rebuild_heap()
+        if is_new_head and self._sweeper_wakeup is not None:
+            self._sweeper_wakeup.set()
+
+    def _rebuild_heap(self) -> None:
+        self._expiry_heap = [(ts, sid) for sid, ts in self.muted_streams.items()]
+        heapq.heapify(self._expiry_heap)
+        if self._sweeper_wakeup is not None:
+            self._sweeper_wakeup.set()
+
+    def __len__(self) -> int:
+        return len(self.muted_streams)
+
+    # --- write-behind 落盘 ---
+
+    def flush(self) -> None:
+        """立即把缓冲中的变更写出：追加到日志 (必要时压缩)，或在没有日志时整表写入 storage。"""
+        self._cancel_flush()
+        if not self._pending_ops:
+            return
+        ops, self._pending_ops = self._pending_ops, []
+        start = time.perf_counter()
+        try:
+            if self._journal is not None:
+                self._journal.append(ops)
+            elif self._storage is not None:
+                self._save_snapshot()
+        except Exception as e:
+            # 写入失败时把变更放回缓冲，按退避间隔安排重试 (期间新的变更并入同一次重试)
+            self._pending_ops = ops + self._pending_ops
+            self._flush_failures += 1
+            self.failed_flushes += 1
+            delay = self._schedule_retry()
+            if delay is None:
+                logger.error("Failed to flush %s mute change(s) (attempt %s), retrying on the next change: %s",
+                             len(ops), self._flush_failures, e)
+            else:
+                logger.error("Failed to flush %s mute change(s) (attempt %s), retrying in %.2fs: %s",
+                             len(ops), self._flush_failures, delay, e)
+            return
+        self._flush_failures = 0
+        if self._journal is not None and self._journal.entries_since_compaction >= self._compact_threshold:
+            # 变更已追加到日志，压缩失败不影响这次落盘；日志保持原样，下次落盘时再压缩
+            try:
+                self.compact()
+            except Exception as e:
+                logger.warning("Failed to compact the mute journal: %s", e)
+        latency = time.perf_counter() - start
+        self.flush_count += 1
+        self.last_flush_latency = latency
+        self.total_flush_latency += latency
+        if latency > self.max_flush_latency:
+            self.max_flush_latency = latency
+        logger.debug("Flushed %s mute change(s) in %.3fms.", len(ops), latency * 1000)
+
+    def flush_stats(self) -> Dict[str, float]:
+        """落盘统计：次数与延迟 (毫秒)。"""
+        return {
+            "flush_count": self.flush_count,
+            "pending_ops": len(self._pending_ops),
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": self.last_flush_latency * 1000,
+            "max_flush_ms": self.max_flush_latency * 1000,
+            "avg_flush_ms": self.total_flush_latency * 1000 / self.flush_count if self.flush_count else 0.0,
+        }
+
+    def _record(self, ops: List[PendingOp]) -> None:
+        if self._storage is None and self._journal is None:
+            return
+        self._pending_ops.extend(ops)
+        if self._flush_handle is not None:
+            return
+        if self._flush_window <= 0:
+            self.flush()
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 不在事件循环中 (例如脚本或测试中直接调用)，立即落盘
+            self.flush()
+            return
+        self._flush_handle = loop.call_later(self._flush_window, self.flush)
+
+    def _schedule_retry(self) -> Optional[float]:
+        """落盘失败后重新安排一次落盘，返回重试间隔 (秒)。不在事件循环中时返回 None，由下一次变更触发重试。"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        delay = min(self.flush_retry_max, max(self._flush_window, self.flush_retry_base) * 2 ** (self._flush_failures - 1))
+        self._flush_handle = loop.call_later(delay, self.flush)
+        return delay
+
+    def _save_snapshot(self) -> None:
+        snapshot = dict(self.muted_streams)
+        if hasattr(self._storage, "set"):
+            self._storage.set(STORAGE_KEY_MUTED_STREAMS, snapshot)
+        else:
+            self._storage[STORAGE_KEY_MUTED_STREAMS] = snapshot
+
+    def _cancel_flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+_mute_registry = MuteRegistry()
+
+
+def get_mute_registry() -> MuteRegistry:
+    """获取进程内唯一的禁言注册表实例。"""
+    return _mute_registry
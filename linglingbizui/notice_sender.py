@@ -0,0 +1,186 @@
+"""
+禁言相关提示消息的限速发送队列。
+
+命令、Chatter 和 Handler 不再直接 await 发送，而是把提示放入按聊天流划分的队列后立即返回，
+由后台任务按以下规则发出：
+- 每个聊天流一个令牌桶，同一聊天流的提示按入队顺序、以不超过配置的速率发出；
+- 全局再有一个令牌桶和并发上限，批量操作时所有聊天流合计也不会触发平台的限流；
+- 与同一聊天流中最后一条待发提示相同的提示直接合并 (例如有人连续刷 50 次禁言别名，只会回复一次)；
+  只与最后一条比较，"禁言 -> 解除 -> 禁言" 这样的状态变化不会被合并掉；
+- 每个聊天流的排队条数有上限，超出时丢弃新的提示并记录警告；
+- 单条发送失败只记录日志，不影响后续提示。
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from .mute_logging import get_logger
+
+logger = get_logger("NoticeSender")
+
+# 发送函数，签名与 send_api.text_to_stream(text, stream_id) 一致
+SendFunc = Callable[[str, str], Awaitable[Any]]
+
+
+class TokenBucket:
+    """令牌桶：每秒补充 rate 个令牌，最多积累 burst 个。rate 为 0 表示不限速。"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = max(0.0, float(rate))
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def try_acquire(self, now: Optional[float] = None) -> float:
+        """尝试取走一个令牌：成功时返回 0，否则返回还需等待的秒数。"""
+        if not self.rate:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return 0.0
+        return (1.0 - self._tokens) / self.rate
+
+    async def acquire(self) -> None:
+        """等待直到取得一个令牌。"""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+class NoticeQueue:
+    """按聊天流划分、带限速与合并的提示消息队列。每个有待发提示的聊天流由一个后台任务负责发送。"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        rate_per_second: float = 5.0,
+        per_stream_rate: float = 0.5,
+        per_stream_burst: int = 2,
+        max_pending_per_stream: int = 10,
+    ):
+        self._send: Optional[SendFunc] = None
+        self._queues: Dict[str, Deque[str]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stream_buckets: Dict[str, TokenBucket] = {}
+        self.configure(max_concurrency, rate_per_second, per_stream_rate, per_stream_burst, max_pending_per_stream)
+        # 统计
+        self.enqueued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+
+    def bind(self, send: SendFunc) -> None:
+        """设置实际的发送函数 (插件加载时传入 send_api.text_to_stream)。"""
+        self._send = send
+
+    def configure(
+        self,
+        max_concurrency: int,
+        rate_per_second: float,
+        per_stream_rate: float,
+        per_stream_burst: int,
+        max_pending_per_stream: int,
+    ) -> None:
+        """更新限制。已有聊天流的令牌桶会按新的速率重建。"""
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._global_bucket = TokenBucket(rate_per_second, burst=self.max_concurrency)
+        self.per_stream_rate = max(0.0, float(per_stream_rate))
+        self.per_stream_burst = max(1, int(per_stream_burst))
+        self.max_pending_per_stream = max(1, int(max_pending_per_stream))
+        self._stream_buckets = {}
+
+    def notify(self, stream_id: str, text: str) -> bool:
+        """
+        把提示放入聊天流的队列后立即返回，不等待发送。
+        返回是否新入队 (与最后一条待发提示相同而被合并、或超出排队上限时返回 False)。
+        """
+        if not text:
+            return False
+        if self._send is None:
+            logger.warning("Notice sender is not bound, dropping notice for stream %s.", stream_id)
+            self.dropped += 1
+            return False
+        queue = self._queues.get(stream_id)
+        if queue is None:
+            queue = self._queues[stream_id] = deque()
+        elif queue and queue[-1] == text:
+            self.coalesced += 1
+            logger.debug("Identical notice already pending for stream %s, coalesced.", stream_id)
+            return False
+        elif len(queue) >= self.max_pending_per_stream:
+            self.dropped += 1
+            logger.warning("Notice queue for stream %s is full (%s pending), dropping notice.", stream_id, len(queue))
+            return False
+        queue.append(text)
+        self.enqueued += 1
+
+        task = self._tasks.get(stream_id)
+        if task is None or task.done():
+            task = asyncio.get_running_loop().create_task(self._drain(stream_id, queue))
+            self._tasks[stream_id] = task
+            task.add_done_callback(lambda t, sid=stream_id: self._discard(sid, t))
+        return True
+
+    def pending(self) -> int:
+        """所有聊天流中尚未发出的提示条数。"""
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def shutdown(self) -> None:
+        """取消所有发送任务，丢弃尚未发出的提示。"""
+        pending = self.pending()
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._queues.clear()
+        if pending:
+            logger.info("Notice sender stopped, %s pending notice(s) discarded.", pending)
+
+    async def _drain(self, stream_id: str, queue: Deque[str]) -> None:
+        bucket = self._stream_buckets.get(stream_id)
+        if bucket is None:
+            bucket = self._stream_buckets[stream_id] = TokenBucket(self.per_stream_rate, self.per_stream_burst)
+        try:
+            while queue:
+                await bucket.acquire()
+                await self._global_bucket.acquire()
+                # 发送完成后才出队：发送期间到达的相同提示同样会被合并
+                text = queue[0]
+                async with self._semaphore:
+                    try:
+                        await self._send(text, stream_id)
+                        self.sent += 1
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        self.failed += 1
+                        logger.error("Error sending notice to %s: %s", stream_id, e)
+                queue.popleft()
+        finally:
+            if not queue and self._queues.get(stream_id) is queue:
+                del self._queues[stream_id]
+
+    def _discard(self, stream_id: str, task: asyncio.Task) -> None:
+        if self._tasks.get(stream_id) is task:
+            del self._tasks[stream_id]
+
+
+_notice_queue: Optional[NoticeQueue] = None
+
+
+def get_notice_queue() -> NoticeQueue:
+    """获取进程内唯一的提示消息队列实例。"""
+    global _notice_queue
+    if _notice_queue is None:
+        _notice_queue = NoticeQueue()
+    return _notice_queue
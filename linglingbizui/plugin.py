@@ -1,6 +1,6 @@
 import asyncio
+import os
 import time
-import re
 from datetime import datetime, timedelta
 from typing import List, Tuple, Type, Optional, Dict, Any
 
@@ -19,17 +19,98 @@ from src.plugin_system import (
     ChatStream,
     ConfigField # 导入 ConfigField 用于定义配置
 )
+from src.plugin_system.apis import chat_api
+
+try:
+    from src.config.config import global_config
+except ImportError:
+    global_config = None
+
+from .alias_matcher import ALIAS_KIND_MUTE
+from .bulk_targets import BULK_STREAMS, BulkSelection, parse_bulk_args, select_streams
+from .duration_parser import parse_duration_minutes
+from .mention_scanner import message_mentions
+from .message_text import get_message_text, get_sender_id
+from .mute_config import config_state
+from .mute_journal import MuteJournal
+from .mute_logging import get_logger, shutdown_logging
+from .mute_metrics import (
+    COUNTER_ALIAS_MUTE, COUNTER_ALIAS_UNMUTE, COUNTER_AT_UNMUTE, COUNTER_EXPIRED, COUNTER_FAST_PATH,
+    COUNTER_INTERCEPTED, COUNTER_MESSAGES, STAGE_ALIAS, STAGE_GENERATOR, STAGE_MENTION,
+    STAGE_NOTIFY, STAGE_REGISTRY, STAGE_SEND, STAGE_TEXT, get_mute_metrics,
+)
+from .mute_registry import get_mute_registry
+from .notice_sender import get_notice_queue
+from .thinking_pool import get_thinking_pool
 
 # --- 常量定义 ---
 PLUGIN_NAME = "mute_and_unmute_plugin"
-STORAGE_KEY_MUTED_STREAMS = "muted_streams" # 用于存储被禁言的聊天流ID及其解除时间
 COMMAND_MUTE_NAME = "mute_mai"
 COMMAND_UNMUTE_NAME = "unmute_mai"
+COMMAND_STATS_NAME = "mute_stats"
+
+# 非 Master 使用批量选择器时的回复
+BULK_DENIED_MESSAGE = "❌ 只有 [permissions] master_users 中的用户可以使用批量操作 (--all / --streams / --match)。"
+STATS_RESET_DENIED_MESSAGE = "❌ 只有 [permissions] master_users 中的用户可以清空统计。"
+
+logger = get_logger("MuteAndUnmutePlugin")
+
+
+# --- 解除禁言后的主动思考 ---
+
+async def _trigger_thinking(chat_stream: ChatStream, stream_id: str, action_data: Dict[str, Any]) -> None:
+    """在聊天流中触发一次主动思考。由后台任务池调用，超时与异常由任务池统一处理。"""
+    replyer = await generator_api.get_replyer(chat_stream=chat_stream)
+    if not replyer:
+        logger.warning("Could not get replyer for stream %s to trigger thinking.", stream_id)
+        return
+    start = time.perf_counter_ns()
+    try:
+        success, reply_set, prompt = await generator_api.generate_reply(
+            chat_stream=chat_stream,
+            action_data=action_data,
+            reply_to="", # 不回复特定消息
+            available_actions=[], # 不提供具体动作，让模型决定
+            enable_tool=False, # 暂时禁用工具调用
+            return_prompt=False
+        )
+    finally:
+        get_mute_metrics().observe(STAGE_GENERATOR, time.perf_counter_ns() - start)
+    if success:
+        logger.debug("Attempted to trigger thinking (%s) in %s.", action_data.get("type"), stream_id)
+    else:
+        logger.warning("Failed to generate reply/trigger thinking (%s) in %s.", action_data.get("type"), stream_id)
+
+
+# --- 批量禁言/解除禁言 ---
+
+def _bulk_target_streams(selection: BulkSelection) -> List[str]:
+    """按选择器解析批量操作的目标聊天流 (--all / --match 从 ChatManager 的群聊列表中选择)。"""
+    group_streams = [] if selection.flag == BULK_STREAMS else chat_api.get_group_streams()
+    return select_streams(selection, group_streams)
+
+
+def _queue_bulk_notices(stream_ids: List[str], text: str) -> int:
+    """把同一条提示放入多个聊天流的发送队列，返回入队的条数 (限速与发送由后台任务完成)。"""
+    notice_queue = get_notice_queue()
+    return sum(notice_queue.notify(stream_id, text) for stream_id in stream_ids)
+
+
+def _parse_bulk(context: Dict[str, Any]) -> Optional[BulkSelection]:
+    """
+    解析命令参数中的批量选择器，选择器缺少参数时抛出 ValueError。
+    通过别名触发的命令不支持批量操作 (任何人都可以发送别名)。
+    """
+    args = context.get('args')
+    if context.get('from_alias') or not args or args.is_empty():
+        return None
+    return parse_bulk_args(args.get_args())
+
 
 class MuteMaiCommand(PlusCommand):
     """Master 用来让 Bot 在当前聊天流静音的命令。"""
     command_name = COMMAND_MUTE_NAME
-    command_description = "让Bot在当前聊天流静音，可指定时长（默认从配置读取）"
+    command_description = "让Bot在当前聊天流静音，可指定时长（默认从配置读取）；--all / --streams / --match 批量禁言"
     # command_aliases = [] # 不再使用 PlusCommand 的 aliases，由 Handler 处理
     chat_type_allow = ChatType.ALL # 允许在群聊和私聊中使用
 
@@ -41,83 +122,106 @@ class MuteMaiCommand(PlusCommand):
 
         stream_id = chat_stream.stream_id
 
-        # 获取存储实例
-        plugin_storage = storage_api.get(PLUGIN_NAME)
-
-        # 获取插件配置
+        # 获取插件配置 (编译后的快照)
+        config = config_state.current
         # 检查插件主功能是否启用
-        plugin_enabled = self.get_config("plugin.enabled", True)
-        if not plugin_enabled:
-            await send_api.text_to_stream("❌ 插件已被禁用。", stream_id)
+        if not config.plugin_enabled:
+            get_notice_queue().notify(stream_id, "❌ 插件已被禁用。")
             return {"success": False, "message": "插件已禁用"}
 
         # 检查静音功能是否启用
-        mute_enabled = self.get_config("features.mute_enabled", True)
-        if not mute_enabled:
-            await send_api.text_to_stream("❌ 静音功能已被禁用。", stream_id)
+        if not config.mute_enabled:
+            get_notice_queue().notify(stream_id, "❌ 静音功能已被禁用。")
             return {"success": False, "message": "静音功能已禁用"}
 
+        # 批量禁言 (--all / --streams / --match)
+        try:
+            bulk = _parse_bulk(context)
+        except ValueError as e:
+            get_notice_queue().notify(stream_id, f"❌ {e}")
+            return {"success": False, "message": str(e)}
+        if bulk is not None:
+            # 批量操作影响其他聊天流，仅限 Master
+            if not config.is_master(get_sender_id(context.get('message'))):
+                get_notice_queue().notify(stream_id, BULK_DENIED_MESSAGE)
+                return {"success": False, "message": "批量操作仅限 Master"}
+            return self._execute_bulk(bulk, config, stream_id)
+
         # 从 context 中获取参数 (通过 CommandArgs)
         args = context.get('args') # 假设 context 中包含 CommandArgs
         if args and not args.is_empty():
             duration_str = args.get_raw().strip()
-            duration_minutes = self._parse_duration(duration_str)
+            # 支持复合时长，如 "1小时30分钟"、"1h30m"、"1.5h"、"半小时"、"90s"
+            duration_minutes = parse_duration_minutes(duration_str)
             if duration_minutes is None:
-                await send_api.text_to_stream("❌ 无法解析指定的时长，请使用如 '10min', '30分钟', '1小时' 等格式。", stream_id)
+                get_notice_queue().notify(stream_id, "❌ 无法解析指定的时长，请使用如 '10min', '30分钟', '1小时30分钟', '1.5h' 等格式。")
                 return {"success": False, "message": "无法解析时长"}
         else:
             # 如果没有参数，从配置中获取默认时长
-            duration_minutes = self.get_config("defaults.default_mute_minutes", 10)
+            duration_minutes = config.default_mute_minutes
 
         # 计算解除禁言的时间
         unmute_time = datetime.now() + timedelta(minutes=duration_minutes)
 
-        # 更新存储中的禁言列表
-        current_muted_streams: Dict[str, float] = plugin_storage.get(STORAGE_KEY_MUTED_STREAMS, {})
-        current_muted_streams[stream_id] = unmute_time.timestamp() # 存储时间戳
-        plugin_storage[STORAGE_KEY_MUTED_STREAMS] = current_muted_streams
+        # 更新禁言注册表并把确认放入发送队列；两步之间没有 await，同一聊天流的提示按入队顺序发出
+        mute_registry = get_mute_registry()
+        # 更新禁言注册表 (内存中修改，并写回 storage)
+        # 幂等：多人连续刷别名时，已禁言且截止时间没有比当前晚出冷却窗口的请求不写存储也不回复
+        metrics = get_mute_metrics()
+        start = time.perf_counter_ns()
+        extended = mute_registry.mute_if_extends(stream_id, unmute_time.timestamp(), config.mute_cooldown_seconds)
+        metrics.observe(STAGE_REGISTRY, time.perf_counter_ns() - start)
+        if not extended:
+            logger.debug("Stream %s is already muted past %s, ignoring repeated mute.", stream_id, unmute_time)
+            return {"success": True, "message": f"{stream_id} 已处于禁言中，忽略重复的禁言请求"}
 
         # 从配置中获取提示词
-        mute_message_template = self.get_config("messages.mute_start", "好的，我将在当前聊天中保持安静，直到 {unmute_time_str}。")
+        mute_message_template = config.mute_start
         unmute_time_str = unmute_time.strftime('%H:%M')
         mute_message = mute_message_template.format(unmute_time_str=unmute_time_str)
 
-        # 发送确认消息
-        await send_api.text_to_stream(mute_message, stream_id)
+        # 确认消息由发送队列限速发出 (相同的待发提示会被合并)，命令不等待网络发送
+        start = time.perf_counter_ns()
+        get_notice_queue().notify(stream_id, mute_message)
+        metrics.observe(STAGE_NOTIFY, time.perf_counter_ns() - start)
 
-        print(f"[MuteAndUnmutePlugin] Muted stream {stream_id} for {duration_minutes} minutes until {unmute_time}")
+        logger.info("Muted stream %s for %s minutes until %s", stream_id, duration_minutes, unmute_time)
         return {"success": True, "message": f"已设置在 {stream_id} 禁言 {duration_minutes} 分钟至 {unmute_time}"}
 
-    def _parse_duration(self, duration_str: str) -> Optional[int]:
+    def _execute_bulk(self, selection: BulkSelection, config: Any, stream_id: str) -> Dict[str, Any]:
         """
-        尝试从字符串中解析出分钟数。
-        支持格式如: "10min", "30分钟", "1小时", "2h", "45m" 等。
+        批量禁言：所有目标聊天流的禁言作为一次批量更新写入注册表 (只落盘一次)，
+        各聊天流的提示消息放入限速的发送队列，并在当前聊天流汇报结果。
         """
-        duration_str = duration_str.lower()
-        # 使用正则表达式匹配数字和单位
-        # 匹配分钟: x分钟, xmin, xm
-        min_match = re.search(r'(\d+)\s*(?:分钟|min|m)', duration_str)
-        if min_match:
-            return int(min_match.group(1))
-
-        # 匹配小时: x小时, xh
-        hour_match = re.search(r'(\d+)\s*(?:小时|h)', duration_str)
-        if hour_match:
-            return int(hour_match.group(1)) * 60 # 转换为分钟
-
-        # 匹配天: x天
-        day_match = re.search(r'(\d+)\s*天', duration_str)
-        if day_match:
-            return int(day_match.group(1)) * 24 * 60 # 转换为分钟
-
-        # 如果没有匹配到任何单位，返回 None
-        return None
+        stream_ids = _bulk_target_streams(selection)
+        if not stream_ids:
+            get_notice_queue().notify(stream_id, "❌ 没有匹配的聊天流。")
+            return {"success": False, "message": "批量禁言没有匹配的聊天流"}
+
+        # 选择器之后的参数作为时长，没有时使用配置中的默认时长
+        duration_minutes = config.default_mute_minutes
+        if selection.remainder:
+            duration_minutes = parse_duration_minutes(selection.remainder)
+            if duration_minutes is None:
+                get_notice_queue().notify(stream_id, "❌ 无法解析指定的时长，请使用如 '10min', '30分钟', '1小时30分钟', '1.5h' 等格式。")
+                return {"success": False, "message": "无法解析时长"}
+        unmute_time = datetime.now() + timedelta(minutes=duration_minutes)
+
+        # 注册表的批量更新中间没有 await，在事件循环中原子完成
+        get_mute_registry().mute_many(stream_ids, unmute_time.timestamp())
+        mute_message = config.mute_start.format(unmute_time_str=unmute_time.strftime('%H:%M'))
+        queued = _queue_bulk_notices(stream_ids, mute_message)
+
+        logger.info("Bulk muted %s stream(s) (%s %s) for %s minutes until %s, %s notice(s) queued.",
+                    len(stream_ids), selection.flag, selection.value or "", duration_minutes, unmute_time, queued)
+        get_notice_queue().notify(stream_id, f"已在 {len(stream_ids)} 个聊天流禁言 {duration_minutes} 分钟至 {unmute_time.strftime('%H:%M')}。")
+        return {"success": True, "message": f"已批量禁言 {len(stream_ids)} 个聊天流"}
 
 
 class UnmuteMaiCommand(PlusCommand):
     """Master 用来让 Bot 在当前聊天流取消静音的命令。"""
     command_name = COMMAND_UNMUTE_NAME
-    command_description = "让Bot在当前聊天流取消静音并开始思考"
+    command_description = "让Bot在当前聊天流取消静音并开始思考；--all / --streams / --match 批量解除"
     # command_aliases = [] # 不再使用 PlusCommand 的 aliases，由 Handler 处理
     chat_type_allow = ChatType.ALL # 允许在群聊和私聊中使用
 
@@ -129,30 +233,42 @@ class UnmuteMaiCommand(PlusCommand):
 
         stream_id = chat_stream.stream_id
 
-        # 获取插件配置
+        # 获取插件配置 (编译后的快照)
+        config = config_state.current
         # 检查插件主功能是否启用
-        plugin_enabled = self.get_config("plugin.enabled", True)
-        if not plugin_enabled:
-            await send_api.text_to_stream("❌ 插件已被禁用。", stream_id)
+        if not config.plugin_enabled:
+            get_notice_queue().notify(stream_id, "❌ 插件已被禁用。")
             return {"success": False, "message": "插件已禁用"}
 
         # 检查静音功能是否启用
-        mute_enabled = self.get_config("features.mute_enabled", True)
-        if not mute_enabled:
-            await send_api.text_to_stream("❌ 静音功能已被禁用。", stream_id)
+        if not config.mute_enabled:
+            get_notice_queue().notify(stream_id, "❌ 静音功能已被禁用。")
             return {"success": False, "message": "静音功能已禁用"}
 
-        # 获取存储实例
-        plugin_storage = storage_api.get(PLUGIN_NAME)
-
-        # 从存储中移除该聊天流的禁言记录
-        current_muted_streams: Dict[str, float] = plugin_storage.get(STORAGE_KEY_MUTED_STREAMS, {})
-        if stream_id in current_muted_streams:
-            del current_muted_streams[stream_id]
-            plugin_storage[STORAGE_KEY_MUTED_STREAMS] = current_muted_streams
-            print(f"[MuteAndUnmutePlugin] Unmuted stream {stream_id} via command.")
+        # 批量解除禁言 (--all / --streams / --match)
+        try:
+            bulk = _parse_bulk(context)
+        except ValueError as e:
+            get_notice_queue().notify(stream_id, f"❌ {e}")
+            return {"success": False, "message": str(e)}
+        if bulk is not None:
+            # 批量操作影响其他聊天流，仅限 Master
+            if not config.is_master(get_sender_id(context.get('message'))):
+                get_notice_queue().notify(stream_id, BULK_DENIED_MESSAGE)
+                return {"success": False, "message": "批量操作仅限 Master"}
+            return self._execute_bulk(bulk, config, stream_id)
+
+        # 解除禁言并把确认放入发送队列；两步之间没有 await，同一聊天流的提示按入队顺序发出
+        mute_registry = get_mute_registry()
+        # 从禁言注册表中移除该聊天流的禁言记录
+        metrics = get_mute_metrics()
+        start = time.perf_counter_ns()
+        unmuted = mute_registry.unmute(stream_id)
+        metrics.observe(STAGE_REGISTRY, time.perf_counter_ns() - start)
+        if unmuted:
+            logger.info("Unmuted stream %s via command.", stream_id)
         else:
-            print(f"[MuteAndUnmutePlugin] Attempted to unmute stream {stream_id} via command, but it was not muted.")
+            logger.debug("Attempted to unmute stream %s via command, but it was not muted.", stream_id)
             # 即使未被禁言，也可能需要发送消息，但这里我们只在解除时发送
             # 可以选择发送一个提示，说明当前并未禁言
             # await send_api.text_to_stream("我当前并未被禁言哦。", stream_id)
@@ -160,34 +276,115 @@ class UnmuteMaiCommand(PlusCommand):
             return {"success": True, "message": f"尝试取消 {stream_id} 的禁言，但该聊天流未被禁言。"}
 
         # 从配置中获取提示词
-        unmute_message = self.get_config("messages.unmute_start", "好的，我恢复发言了！")
+        unmute_message = config.unmute_start
 
-        # 发送确认消息
-        await send_api.text_to_stream(unmute_message, stream_id)
+        # 确认消息由发送队列限速发出，命令不等待网络发送
+        start = time.perf_counter_ns()
+        get_notice_queue().notify(stream_id, unmute_message)
+        metrics.observe(STAGE_NOTIFY, time.perf_counter_ns() - start)
 
-        # 尝试触发一次主动思考
-        try:
-            replyer = await generator_api.get_replyer(chat_stream=chat_stream)
-            if replyer:
-                success, reply_set, prompt = await generator_api.generate_reply(
-                    chat_stream=chat_stream,
-                    action_data={"type": "unmute_trigger", "message": "Master has unmuted me."}, # 模拟动作数据
-                    reply_to="", # 不回复特定消息
-                    available_actions=[], # 不提供具体动作，让模型决定
-                    enable_tool=False, # 暂时禁用工具调用
-                    return_prompt=False
-                )
-                if success:
-                    print(f"[MuteAndUnmutePlugin] Attempted to trigger thinking after unmute in {stream_id}.")
-                else:
-                    print(f"[MuteAndUnmutePlugin] Failed to generate reply/trigger thinking after unmute in {stream_id}.")
-            else:
-                print(f"[MuteAndUnmutePlugin] Could not get replyer for stream {stream_id} to trigger thinking.")
-        except Exception as e:
-            print(f"[MuteAndUnmutePlugin] Error trying to trigger thinking after unmute: {e}")
+        # 尝试触发一次主动思考 (在后台任务池中执行，命令不等待 LLM 往返)
+        get_thinking_pool().submit(stream_id, lambda: _trigger_thinking(
+            chat_stream, stream_id, {"type": "unmute_trigger", "message": "Master has unmuted me."} # 模拟动作数据
+        ))
 
         return {"success": True, "message": f"已取消 {stream_id} 的禁言，并尝试触发思考。"}
 
+    def _execute_bulk(self, selection: BulkSelection, config: Any, stream_id: str) -> Dict[str, Any]:
+        """
+        批量解除禁言：一次批量更新注册表 (只落盘一次)，只向确实被解除的聊天流发送提示 (经限速的发送队列)。
+        批量解除时不触发主动思考，避免同时唤起大量生成。
+        """
+        stream_ids = _bulk_target_streams(selection)
+        if not stream_ids:
+            get_notice_queue().notify(stream_id, "❌ 没有匹配的聊天流。")
+            return {"success": False, "message": "批量解除禁言没有匹配的聊天流"}
+
+        unmuted = get_mute_registry().unmute_many(stream_ids)
+        queued = _queue_bulk_notices(unmuted, config.unmute_start)
+
+        logger.info("Bulk unmuted %s of %s selected stream(s) (%s %s), %s notice(s) queued.",
+                    len(unmuted), len(stream_ids), selection.flag, selection.value or "", queued)
+        get_notice_queue().notify(stream_id, f"已在 {len(unmuted)} 个聊天流解除禁言 (共选中 {len(stream_ids)} 个)。")
+        return {"success": True, "message": f"已批量解除 {len(unmuted)} 个聊天流的禁言"}
+
+
+class MuteStatsCommand(PlusCommand):
+    """查看禁言处理各阶段耗时的分位数与事件计数。"""
+    command_name = COMMAND_STATS_NAME
+    command_description = "查看禁言处理各阶段的耗时 (p50/p95/p99) 与事件计数；export 导出 Prometheus 文本，reset 清空统计"
+    chat_type_allow = ChatType.ALL # 允许在群聊和私聊中使用
+
+    async def execute(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        chat_stream: ChatStream = context.get('chat_stream')
+        if not chat_stream:
+            return {"success": False, "message": "无法获取当前聊天流信息。"}
+
+        stream_id = chat_stream.stream_id
+        metrics = get_mute_metrics()
+        args = context.get('args')
+        action = "" if not args or args.is_empty() else args.get_args()[0].lower()
+
+        if action == "reset":
+            # 清空统计会影响所有聊天流的观测数据，仅限 Master
+            if not config_state.current.is_master(get_sender_id(context.get('message'))):
+                get_notice_queue().notify(stream_id, STATS_RESET_DENIED_MESSAGE)
+                return {"success": False, "message": "清空统计仅限 Master"}
+            metrics.reset()
+            get_notice_queue().notify(stream_id, "已清空禁言处理的耗时统计与计数。")
+            return {"success": True, "message": "已清空统计"}
+
+        if action == "export":
+            if not metrics.export_path:
+                get_notice_queue().notify(stream_id, "❌ 未配置 [metrics] prometheus_path，无法导出。")
+                return {"success": False, "message": "未配置导出路径"}
+            if not metrics.write_prometheus():
+                get_notice_queue().notify(stream_id, f"❌ 写入 {metrics.export_path} 失败，详见日志。")
+                return {"success": False, "message": "导出失败"}
+            get_notice_queue().notify(stream_id, f"已导出到 {metrics.export_path}。")
+            return {"success": True, "message": f"已导出到 {metrics.export_path}"}
+
+        get_notice_queue().notify(stream_id, metrics.summary())
+        return {"success": True, "message": "已发送禁言处理统计"}
+
+
+class SimpleCommandArgs:
+    """别名触发时，用别名之后的文本模拟 CommandArgs。"""
+    def __init__(self, raw_str: str):
+        self.raw_str = raw_str
+        self.args_list = raw_str.split() if raw_str else []
+
+    def is_empty(self):
+        return not self.raw_str.strip()
+
+    def get_raw(self):
+        return self.raw_str
+
+    def get_args(self):
+        return self.args_list
+
+    def count(self):
+        return len(self.args_list)
+
+    def get_first(self):
+        return self.args_list[0] if self.args_list else None
+
+    def get_remaining(self):
+        return " ".join(self.args_list[1:]) if len(self.args_list) > 1 else ""
+
+    def has_flag(self, flag: str):
+        return flag in self.args_list
+
+    def get_flag_value(self, flag: str, default=None):
+        try:
+            idx = self.args_list.index(flag)
+            if idx + 1 < len(self.args_list):
+                return self.args_list[idx + 1]
+            else:
+                return default
+        except ValueError:
+            return default
+
 
 class AliasHandler(Handler):
     """
@@ -202,128 +399,58 @@ class AliasHandler(Handler):
         if not message:
             return HandlerReturn(intercepted=False)
 
-        # 获取插件配置
-        # 检查插件主功能是否启用
-        plugin_enabled = self.get_config("plugin.enabled", True)
-        if not plugin_enabled:
+        # 获取插件配置 (编译后的快照)
+        metrics = get_mute_metrics()
+        sampled = metrics.sample()
+        config = config_state.current
+        # 检查插件主功能与静音功能是否启用
+        if not config.active:
             return HandlerReturn(intercepted=False)
 
-        # 检查静音功能是否启用
-        mute_enabled = self.get_config("features.mute_enabled", True)
-        if not mute_enabled:
+        # 去除首尾空白后的文本缓存在消息上，后续处理器不再重复提取
+        # 阶段耗时只对采样到的消息记录，未采样时不调用计时器
+        if sampled:
+            start = time.perf_counter_ns()
+        message_content = get_message_text(message)
+        if sampled:
+            text_done = time.perf_counter_ns()
+            metrics.observe(STAGE_TEXT, text_done - start)
+
+        # 快速预筛：首字符或长度不可能命中任何别名时，直接跳过
+        if not config.alias_matcher.may_match(message_content):
+            if sampled:
+                metrics.observe(STAGE_ALIAS, time.perf_counter_ns() - text_done)
+            metrics.incr(COUNTER_FAST_PATH)
             return HandlerReturn(intercepted=False)
 
-        mute_aliases = self.get_config("aliases.mute", ["绫绫闭嘴"]) # 默认值
-        # unmute_aliases = self.get_config("aliases.unmute", ["绫绫张嘴"]) # unmute 别名也可以有参数，但当前 unmute 逻辑不需要
-
-        message_content = message.content.strip()
-
-        # 检查是否匹配 mute 别名
-        for alias in mute_aliases:
-            if message_content.startswith(alias):
-                # 提取别名后的部分作为参数
-                param_str = message_content[len(alias):].strip()
-                # 构造 context，包含原始 message 和参数
-                class SimpleCommandArgs:
-                    def __init__(self, raw_str: str):
-                        self.raw_str = raw_str
-                        self.args_list = raw_str.split() if raw_str else []
-
-                    def is_empty(self):
-                        return not self.raw_str.strip()
-
-                    def get_raw(self):
-                        return self.raw_str
-
-                    def get_args(self):
-                        return self.args_list
-
-                    def count(self):
-                        return len(self.args_list)
-
-                    def get_first(self):
-                        return self.args_list[0] if self.args_list else None
-
-                    def get_remaining(self):
-                        return " ".join(self.args_list[1:]) if len(self.args_list) > 1 else ""
-
-                    def has_flag(self, flag: str):
-                        return flag in self.args_list
-
-                    def get_flag_value(self, flag: str, default=None):
-                        try:
-                            idx = self.args_list.index(flag)
-                            if idx + 1 < len(self.args_list):
-                                return self.args_list[idx + 1]
-                            else:
-                                return default
-                        except ValueError:
-                            return default
-
-                command_args = SimpleCommandArgs(param_str) if param_str else None
-                context_with_args = {
-                    'chat_stream': message.chat_stream,
-                    'message': message,
-                    'args': command_args
-                }
-
-                result = await MuteMaiCommand().execute(context_with_args)
-                print(f"[MuteAndUnmutePlugin] Executed mute command via alias '{alias}' with param '{param_str}' in {message.stream_id}. Result: {result}")
-                return HandlerReturn(intercepted=False) # 不拦截
-
-        # 检查是否匹配 unmute 别名 (同样处理参数，虽然当前 unmute 不需要)
-        unmute_aliases = self.get_config("aliases.unmute", ["绫绫张嘴"])
-        for alias in unmute_aliases:
-            if message_content.startswith(alias):
-                param_str = message_content[len(alias):].strip()
-                class SimpleCommandArgs:
-                    def __init__(self, raw_str: str):
-                        self.raw_str = raw_str
-                        self.args_list = raw_str.split() if raw_str else []
-
-                    def is_empty(self):
-                        return not self.raw_str.strip()
-
-                    def get_raw(self):
-                        return self.raw_str
-
-                    def get_args(self):
-                        return self.args_list
-
-                    def count(self):
-                        return len(self.args_list)
-
-                    def get_first(self):
-                        return self.args_list[0] if self.args_list else None
-
-                    def get_remaining(self):
-                        return " ".join(self.args_list[1:]) if len(self.args_list) > 1 else ""
-
-                    def has_flag(self, flag: str):
-                        return flag in self.args_list
-
-                    def get_flag_value(self, flag: str, default=None):
-                        try:
-                            idx = self.args_list.index(flag)
-                            if idx + 1 < len(self.args_list):
-                                return self.args_list[idx + 1]
-                            else:
-                                return default
-                        except ValueError:
-                            return default
-
-                command_args = SimpleCommandArgs(param_str) if param_str else None
-                context_with_args = {
-                    'chat_stream': message.chat_stream,
-                    'message': message,
-                    'args': command_args
-                }
-                result = await UnmuteMaiCommand().execute(context_with_args)
-                print(f"[MuteAndUnmutePlugin] Executed unmute command via alias '{alias}' with param '{param_str}' in {message.stream_id}. Result: {result}")
-                return HandlerReturn(intercepted=False) # 不拦截
-
-        # 如果不匹配任何别名，则不处理，继续后续流程
-        return HandlerReturn(intercepted=False)
+        # 静音与取消静音别名共用一棵前缀树，一次扫描得到别名类型和参数部分
+        alias_match = config.alias_matcher.match(message_content)
+        if sampled:
+            metrics.observe(STAGE_ALIAS, time.perf_counter_ns() - text_done)
+        if alias_match is None:
+            # 如果不匹配任何别名，则不处理，继续后续流程
+            return HandlerReturn(intercepted=False)
+
+        # 提取别名后的部分作为参数 (unmute 当前不需要参数，但同样传入)
+        alias, param_str = alias_match.alias, alias_match.remainder
+        command_args = SimpleCommandArgs(param_str) if param_str else None
+        # 构造 context，包含原始 message 和参数
+        context_with_args = {
+            'chat_stream': message.chat_stream,
+            'message': message,
+            'args': command_args,
+            'from_alias': True
+        }
+
+        if alias_match.kind == ALIAS_KIND_MUTE:
+            metrics.incr(COUNTER_ALIAS_MUTE)
+            result = await MuteMaiCommand().execute(context_with_args)
+            logger.debug("Executed mute command via alias '%s' with param '%s' in %s. Result: %s", alias, param_str, message.stream_id, result)
+        else:
+            metrics.incr(COUNTER_ALIAS_UNMUTE)
+            result = await UnmuteMaiCommand().execute(context_with_args)
+            logger.debug("Executed unmute command via alias '%s' with param '%s' in %s. Result: %s", alias, param_str, message.stream_id, result)
+        return HandlerReturn(intercepted=False) # 不拦截
 
 
 class AtUnmuteHandler(Handler):
@@ -339,78 +466,72 @@ class AtUnmuteHandler(Handler):
         if not message:
             return HandlerReturn(intercepted=False)
 
-        # 获取插件配置
-        # 检查插件主功能是否启用
-        plugin_enabled = self.get_config("plugin.enabled", True)
-        if not plugin_enabled:
-            return HandlerReturn(intercepted=False)
-
-        # 检查静音功能是否启用
-        mute_enabled = self.get_config("features.mute_enabled", True)
-        if not mute_enabled:
+        # 获取插件配置 (编译后的快照)
+        metrics = get_mute_metrics()
+        sampled = metrics.sample()
+        config = config_state.current
+        # 检查插件主功能与静音功能是否启用
+        if not config.active:
             return HandlerReturn(intercepted=False)
 
         # 检查 @ 唤醒功能是否启用
-        at_unmute_enabled = self.get_config("features.at_unmute_enabled", True)
-        if not at_unmute_enabled:
+        if not config.at_unmute_enabled:
             return HandlerReturn(intercepted=False)
 
         stream_id = message.stream_id
-        plugin_storage = storage_api.get(PLUGIN_NAME)
-
-        current_muted_streams: Dict[str, float] = plugin_storage.get(STORAGE_KEY_MUTED_STREAMS, {})
-
-        # 检查当前聊天流是否被禁言
-        if stream_id in current_muted_streams:
-            mute_until_timestamp = current_muted_streams[stream_id]
-            current_time = time.time()
-
+        mute_registry = get_mute_registry()
+
+        # 检查当前聊天流是否被禁言：手动禁言与安静时段取较晚的截止时间
+        # (安静时段的状态已预先算好，只在切换时刻重新计算)
+        start = time.perf_counter_ns()
+        current_time = time.time()
+        mute_until_timestamp = mute_registry.muted_until(stream_id, current_time)
+        if sampled:
+            metrics.observe(STAGE_REGISTRY, time.perf_counter_ns() - start)
+        if mute_until_timestamp is not None:
             if current_time < mute_until_timestamp:
                 # Bot 确实处于禁言状态
                 # 检查消息是否 @ 了 Bot
-                try:
-                    from src.config.config import global_config
-                    bot_id = str(global_config.bot.qq_account)
-                except ImportError:
-                    print("[MuteAndUnmutePlugin] Error: Could not import global_config to get bot_id for @ check.")
+                if global_config is None:
+                    logger.error("Could not import global_config to get bot_id for @ check.")
                     return HandlerReturn(intercepted=False)
-
-                # 检查消息是否 @ 了 Bot
-                if hasattr(message, 'mentioned_user_ids') and bot_id in message.mentioned_user_ids:
+                bot_id = str(global_config.bot.qq_account)
+
+                # 检查消息是否 @ 了 Bot (mentioned_user_ids 或嵌套的 message_segment，遇到第一个命中即停止)
+                start = time.perf_counter_ns()
+                bot_mentioned = message_mentions(message, (bot_id,))
+                if sampled:
+                    metrics.observe(STAGE_MENTION, time.perf_counter_ns() - start)
+                if bot_mentioned:
                     # Bot 被 @ 了，且正处于禁言状态，自动解除禁言
-                    del current_muted_streams[stream_id]
-                    plugin_storage[STORAGE_KEY_MUTED_STREAMS] = current_muted_streams
-                    print(f"[MuteAndUnmutePlugin] Unmuted stream {stream_id} because Bot was mentioned (@).")
+                    # 检查与解除在同一步完成 (中间没有 await)；若在此之前已被并发的命令解除，则不再重复发送提示
+                    start = time.perf_counter_ns()
+                    unmuted = mute_registry.unmute_if_muted(stream_id)
+                    if sampled:
+                        metrics.observe(STAGE_REGISTRY, time.perf_counter_ns() - start)
+                    if not unmuted:
+                        return HandlerReturn(intercepted=False)
+                    metrics.incr(COUNTER_AT_UNMUTE)
+                    logger.info("Unmuted stream %s because Bot was mentioned (@).", stream_id)
 
                     # 从配置中获取提示词
-                    at_unmute_message = self.get_config("messages.at_unmute", "我被 @ 了，所以恢复发言啦！")
-
-                    # 发送解除禁言的消息
-                    await send_api.text_to_stream(at_unmute_message, stream_id)
-
-                    # 尝试触发一次主动思考
-                    try:
-                        replyer = await generator_api.get_replyer(chat_stream=message.chat_stream)
-                        if replyer:
-                            success, reply_set, prompt = await generator_api.generate_reply(
-                                chat_stream=message.chat_stream,
-                                action_data={"type": "at_unmute_trigger", "message": f"Bot was mentioned (@) by {message.user_info.user_nickname}."}, # 模拟动作数据
-                                reply_to="", # 不回复特定消息
-                                available_actions=[], # 不提供具体动作，让模型决定
-                                enable_tool=False, # 暂时禁用工具调用
-                                return_prompt=False
-                            )
-                            if success:
-                                print(f"[MuteAndUnmutePlugin] Attempted to trigger thinking after @ unmute in {stream_id}.")
-                            else:
-                                print(f"[MuteAndUnmutePlugin] Failed to generate reply/trigger thinking after @ unmute in {stream_id}.")
-                        else:
-                            print(f"[MuteAndUnmutePlugin] Could not get replyer for stream {stream_id} to trigger thinking after @ unmute.")
-                    except Exception as e:
-                        print(f"[MuteAndUnmutePlugin] Error trying to trigger thinking after @ unmute: {e}")
+                    at_unmute_message = config.at_unmute
+
+                    # 解除禁言的提示放入发送队列，由后台任务限速发出
+                    start = time.perf_counter_ns()
+                    get_notice_queue().notify(stream_id, at_unmute_message)
+                    if sampled:
+                        metrics.observe(STAGE_NOTIFY, time.perf_counter_ns() - start)
+
+                    # 尝试触发一次主动思考 (在后台任务池中执行)
+                    get_thinking_pool().submit(stream_id, lambda: _trigger_thinking(
+                        message.chat_stream,
+                        stream_id,
+                        {"type": "at_unmute_trigger", "message": f"Bot was mentioned (@) by {message.user_info.user_nickname}."}, # 模拟动作数据
+                    ))
 
                     return HandlerReturn(intercepted=False)
-            # 如果禁言已过期，也直接返回不拦截，让 MuteHandler 去清理过期记录
+            # 如果禁言已过期，也直接返回不拦截，过期记录由注册表的后台清理任务移除
 
         # 如果当前聊天流未被禁言，或 Bot 未被 @，或 @ 唤醒功能被禁用，则不处理
         return HandlerReturn(intercepted=False)
@@ -430,43 +551,41 @@ class MuteHandler(Handler):
         if not message:
             return HandlerReturn(intercepted=False)
 
-        # 获取插件配置
-        # 检查插件主功能是否启用
-        plugin_enabled = self.get_config("plugin.enabled", True)
-        if not plugin_enabled:
-            return HandlerReturn(intercepted=False)
+        # 每条消息都会经过该处理器，消息数在这里统计
+        metrics = get_mute_metrics()
+        metrics.incr(COUNTER_MESSAGES)
 
-        # 检查静音功能是否启用
-        mute_enabled = self.get_config("features.mute_enabled", True)
-        if not mute_enabled:
+        # 获取插件配置 (编译后的快照)
+        sampled = metrics.sample()
+        config = config_state.current
+        # 检查插件主功能与静音功能是否启用
+        if not config.active:
             return HandlerReturn(intercepted=False)
 
         stream_id = message.stream_id
-        plugin_storage = storage_api.get(PLUGIN_NAME)
-
-        current_muted_streams: Dict[str, float] = plugin_storage.get(STORAGE_KEY_MUTED_STREAMS, {})
-
-        if stream_id in current_muted_streams:
-            mute_until_timestamp = current_muted_streams[stream_id]
-            current_time = time.time()
-
+        mute_registry = get_mute_registry()
+
+        # 手动禁言与安静时段取较晚的截止时间 (安静时段的状态已预先算好，只在切换时刻重新计算)
+        start = time.perf_counter_ns()
+        current_time = time.time()
+        mute_until_timestamp = mute_registry.muted_until(stream_id, current_time)
+        if sampled:
+            metrics.observe(STAGE_REGISTRY, time.perf_counter_ns() - start)
+        if mute_until_timestamp is not None:
             if current_time < mute_until_timestamp:
                 # 当前时间仍在禁言时间内
-                print(f"[MuteAndUnmutePlugin] Message intercepted in muted stream {stream_id}. Time remaining: {timedelta(seconds=int(mute_until_timestamp - current_time))}")
+                logger.debug("Message intercepted in muted stream %s. Time remaining: %.0fs", stream_id, mute_until_timestamp - current_time)
                 # 从配置中获取禁言期间的提示词（如果有的话）
-                mute_reply_message = self.get_config("messages.muted_reply", "") # 默认为空，不回复
+                mute_reply_message = config.muted_reply # 默认为空，不回复
                 if mute_reply_message:
                     # 可以选择是否回复一条消息告知用户处于禁言状态
                     # 但通常禁言就是不回复，所以这里可以选择不发送
                     # await send_api.text_to_stream(mute_reply_message, stream_id)
                     pass
                 # 返回 HandlerReturn 表示拦截此消息，不进行后续处理
+                metrics.incr(COUNTER_INTERCEPTED)
                 return HandlerReturn(intercepted=True, message="Message intercepted due to mute.")
-            else:
-                # 禁言时间已过，移除记录
-                del current_muted_streams[stream_id]
-                plugin_storage[STORAGE_KEY_MUTED_STREAMS] = current_muted_streams
-                print(f"[MuteAndUnmutePlugin] Mute expired for stream {stream_id}. Removed from muted list.")
+            # 禁言时间已过的记录由注册表的后台清理任务统一移除，这里不再处理
 
         # 如果未被禁言或禁言已过期，则不拦截，继续处理
         return HandlerReturn(intercepted=False) # 表示不拦截
@@ -504,6 +623,12 @@ class MuteAndUnmutePlugin(BasePlugin):
                 default=True,
                 description="是否启用 @Bot 唤醒功能。如果为 false，@Bot 将不会解除禁言。",
                 example=True
+            ),
+            "expire_notify_enabled": ConfigField(
+                type=bool,
+                default=False,
+                description="禁言到期自动解除时，是否在对应聊天流发送 unmute_start 提示消息。",
+                example=False
             )
         },
         "defaults": {
@@ -512,6 +637,20 @@ class MuteAndUnmutePlugin(BasePlugin):
                 default=10,
                 description="当指令中未指定时长时，静音的默认时长（单位：分钟）。",
                 example=30
+            ),
+            "mute_cooldown_seconds": ConfigField(
+                type=float,
+                default=30.0,
+                description="重复禁言的冷却窗口（单位：秒）。已禁言时，新的截止时间不比当前截止时间晚这么多的禁言请求被忽略，不写入存储也不回复。0 表示只忽略不会延长禁言的请求。",
+                example=30.0
+            )
+        },
+        "permissions": {
+            "master_users": ConfigField(
+                type=list,
+                default=[],
+                description="可以使用批量操作 (--all / --streams / --match) 与 /mute_stats reset 的用户ID列表。留空则任何人都不能使用这些操作。",
+                example=["123456789"]
             )
         },
         "aliases": {
@@ -553,6 +692,132 @@ class MuteAndUnmutePlugin(BasePlugin):
                 description="Bot 被 @ 时自动解除禁言后发送的提示消息。",
                 example="我被 @ 了，所以恢复发言啦！"
             )
+        },
+        "logging": {
+            "level": ConfigField(
+                type=str,
+                default="INFO",
+                description="插件日志级别 (DEBUG / INFO / WARNING / ERROR)。生产环境建议关闭 DEBUG。",
+                example="INFO"
+            ),
+            "queue_enabled": ConfigField(
+                type=bool,
+                default=True,
+                description="是否通过后台线程写出日志，避免日志 I/O 阻塞事件循环。",
+                example=True
+            )
+        },
+        "persistence": {
+            "journal_enabled": ConfigField(
+                type=bool,
+                default=True,
+                description="是否用追加式日志持久化禁言状态。启用后禁言在 Bot 重启后依然有效；关闭则每次变更整表写入 storage。",
+                example=True
+            ),
+            "journal_path": ConfigField(
+                type=str,
+                default="data/mute_and_unmute_plugin/mute_journal.jsonl",
+                description="追加式日志文件路径 (相对于 MoFox-Core 运行目录)。",
+                example="data/mute_and_unmute_plugin/mute_journal.jsonl"
+            ),
+            "compact_threshold": ConfigField(
+                type=int,
+                default=1000,
+                description="日志追加多少条后压缩一次 (把当前状态写为 storage 快照并清空日志)。",
+                example=1000
+            ),
+            "flush_window_ms": ConfigField(
+                type=int,
+                default=200,
+                description="写入合并窗口 (毫秒)。窗口内的所有禁言变更合并为一次落盘；0 表示每次变更立即落盘。",
+                example=200
+            )
+        },
+        "thinking": {
+            "max_concurrency": ConfigField(
+                type=int,
+                default=2,
+                description="解除禁言后“主动思考”最多同时进行几次生成。批量解除禁言时超出的部分排队等待。",
+                example=2
+            ),
+            "timeout_seconds": ConfigField(
+                type=float,
+                default=30.0,
+                description="单次主动思考的超时时间 (秒)，超时后放弃本次生成。0 表示不限制。",
+                example=30.0
+            ),
+            "max_pending": ConfigField(
+                type=int,
+                default=100,
+                description="排队与进行中的主动思考任务上限，超出时新的触发被丢弃。",
+                example=100
+            )
+        },
+        "quiet_hours": {
+            "rules": ConfigField(
+                type=list,
+                default=[],
+                description="每日安静时段，格式为 \"<stream_id> HH:MM-HH:MM\" (本地时间，可跨零点，\"00:00-24:00\" 表示全天)。时段内 Bot 保持静音，@Bot 或取消静音命令可提前结束当前时段。",
+                example=["<stream_id> 23:00-08:00"]
+            )
+        },
+        "sender": {
+            "max_concurrency": ConfigField(
+                type=int,
+                default=4,
+                description="同时发送提示消息的最大数量 (所有聊天流合计)。",
+                example=4
+            ),
+            "rate_per_second": ConfigField(
+                type=float,
+                default=5.0,
+                description="所有聊天流合计每秒最多发送的提示消息条数，避免批量操作时触发平台限流。0 表示不限速。",
+                example=5.0
+            ),
+            "per_stream_rate_per_second": ConfigField(
+                type=float,
+                default=0.5,
+                description="单个聊天流每秒最多发送的提示消息条数。0 表示不限速。",
+                example=0.5
+            ),
+            "per_stream_burst": ConfigField(
+                type=int,
+                default=2,
+                description="单个聊天流允许连续发出的提示条数 (令牌桶容量)，超出后按 per_stream_rate_per_second 限速。",
+                example=2
+            ),
+            "max_pending_per_stream": ConfigField(
+                type=int,
+                default=10,
+                description="单个聊天流排队中的提示上限，超出时丢弃新的提示。相同的待发提示总会合并为一条。",
+                example=10
+            )
+        },
+        "metrics": {
+            "enabled": ConfigField(
+                type=bool,
+                default=True,
+                description="是否记录禁言处理各阶段的耗时直方图与事件计数 (/mute_stats 查看)。",
+                example=True
+            ),
+            "prometheus_path": ConfigField(
+                type=str,
+                default="",
+                description="定期以 Prometheus 文本格式写出统计的文件路径 (相对于 MoFox-Core 运行目录)。留空则不导出。",
+                example="data/mute_and_unmute_plugin/metrics.prom"
+            ),
+            "export_interval_seconds": ConfigField(
+                type=float,
+                default=60.0,
+                description="写出统计文件的间隔 (秒)。",
+                example=60.0
+            ),
+            "stage_sample_every": ConfigField(
+                type=int,
+                default=16,
+                description="每条消息路径上的阶段耗时每 N 条消息记录一条 (1 表示逐条记录)。事件计数不采样。",
+                example=16
+            )
         }
     }
 
@@ -562,6 +827,8 @@ class MuteAndUnmutePlugin(BasePlugin):
         # 注册主命令 (用于 /mute_mai 和 /unmute_mai)
         components.append((MuteMaiCommand.get_plus_command_info(), MuteMaiCommand))
         components.append((UnmuteMaiCommand.get_plus_command_info(), UnmuteMaiCommand))
+        # 注册统计命令 (/mute_stats)
+        components.append((MuteStatsCommand.get_plus_command_info(), MuteStatsCommand))
 
         # 注册别名处理器 (处理配置文件中的别名及其参数)
         components.append((AliasHandler.get_handler_info(), AliasHandler))
@@ -577,20 +844,65 @@ class MuteAndUnmutePlugin(BasePlugin):
     async def on_plugin_loaded(self):
         """
         插件加载时的钩子函数。
-        清空存储中所有已保存的禁言列表，确保插件状态与程序状态一致。
+        将禁言注册表绑定到插件 storage，并从快照与追加式日志恢复重启前仍未过期的禁言。
+        并将插件配置编译为只读快照供各组件使用，config.toml 变化时自动重新编译。
         """
-        # 获取存储实例
+        # 获取存储实例 (storage_api.get 返回字典式对象，注册表通过下标写入快照)
         plugin_storage = storage_api.get(PLUGIN_NAME)
 
-        # 获取当前存储的禁言列表
-        current_muted_streams: Dict[str, float] = plugin_storage.get(STORAGE_KEY_MUTED_STREAMS, {})
+        # 将 self.config (加载后的配置) 编译为快照 (同时设置插件日志)，并监视 config.toml 的变化
+        config_state.update(self.config)
+        config_state.watch_file(self._config_file_path())
 
-        if current_muted_streams:
-            # 如果列表不为空，则清空它
-            plugin_storage[STORAGE_KEY_MUTED_STREAMS] = {}
-            print(f"[MuteAndUnmutePlugin] 在插件加载时清空了 {len(current_muted_streams)} 条旧的禁言记录。")
-        else:
-            print(f"[MuteAndUnmutePlugin] 插件加载时，禁言列表为空，无需清空。")
+        # 禁言注册表由插件持有，所有组件共享同一份内存禁言表
+        # 从 storage 快照和追加式日志恢复重启前的禁言状态 (已过期的记录会被丢弃)
+        config = config_state.current
+        journal = MuteJournal(config.journal_path) if config.journal_enabled else None
+        self.mute_registry = get_mute_registry()
+        restored_count = self.mute_registry.bind_storage(
+            plugin_storage, journal, config.journal_compact_threshold, config.flush_window_ms
+        )
+        logger.info("插件加载时恢复了 %s 条未过期的禁言记录。", restored_count)
+
+        # 启动后台过期清理任务，到期的禁言按批移除
+        self.mute_registry.start_sweeper(self._on_mutes_expired)
+
+        # 所有提示消息经限速的发送队列发出 (限速参数随配置快照更新)，每次实际发送的耗时记入 send 阶段
+        get_notice_queue().bind(get_mute_metrics().timed(STAGE_SEND, send_api.text_to_stream))
+
+        # 按配置定期把统计写为 Prometheus 文本 (导出路径随配置快照更新)
+        get_mute_metrics().start_export()
 
         # 可选：如果需要，可以在此处发送一条系统日志或通知给 Master
-        # 例如：await send_api.text_to_master("MuteAndUnmutePlugin 已加载，并清空了旧的禁言记录。")
\ No newline at end of file
+        # 例如：await send_api.text_to_master("MuteAndUnmutePlugin 已加载，并恢复了未过期的禁言记录。")
+
+    async def on_plugin_unloaded(self):
+        """
+        插件卸载时的钩子函数。
+        停止后台任务 (包括尚未完成的主动思考与尚未发出的提示)，并把写入缓冲中尚未落盘的禁言变更写出；
+        最后停止日志的后台线程 (写完队列中的日志) 并移除插件安装的处理器。
+        """
+        await self.mute_registry.stop_sweeper()
+        await config_state.stop_watching()
+        await get_thinking_pool().shutdown()
+        await get_notice_queue().shutdown()
+        await get_mute_metrics().stop_export()
+        self.mute_registry.close()
+        stats = self.mute_registry.flush_stats()
+        logger.info("插件卸载，禁言状态已落盘 (共 %s 次写入，平均 %.3fms，最大 %.3fms)。",
+                    stats["flush_count"], stats["avg_flush_ms"], stats["max_flush_ms"])
+        shutdown_logging()
+
+    def _config_file_path(self) -> str:
+        """插件 config.toml 的路径 (MoFox-Core/config/plugins/<plugin_name>/config.toml)。"""
+        return os.path.join("config", "plugins", PLUGIN_NAME, self.config_file_name)
+
+    async def _on_mutes_expired(self, stream_ids: List[str]):
+        """禁言到期回调：按配置在对应聊天流发送恢复发言的提示。"""
+        logger.info("%s mute(s) expired and were removed.", len(stream_ids))
+        get_mute_metrics().incr(COUNTER_EXPIRED, len(stream_ids))
+        config = config_state.current
+        if not config.expire_notify_enabled:
+            return
+        # 提示经限速的发送队列发出，大批禁言同时到期时不会一次性触发平台限流
+        _queue_bulk_notices(stream_ids, config.unmute_start)
@@ -0,0 +1,126 @@
+"""
+按聊天流配置的每日安静时段 (例如 "每天 23:00-08:00 保持安静")。
+
+规则在配置编译时解析为当天的分钟区间，每个聊天流再预先算出“当前是否处于安静时段”和“下一次状态切换的时间戳”。
+消息处理路径上只需一次字典查找和一次与切换时间的比较；只有切换时间已过时才重新计算 (每个时段每天最多两次)。
+时段按本地时间解释，跨零点的时段 (开始晚于结束) 延续到次日；"00:00-24:00" 表示全天。
+"""
+import math
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 一天内的时段：(开始分钟, 结束分钟)，结束早于开始表示跨零点，开始与结束相同表示全天
+Window = Tuple[int, int]
+# 编译后的规则：(stream_id, 时段)
+QuietRule = Tuple[str, Window]
+# 缓存条目：(安静时段的结束时间戳，不在安静时段时为 None, 下一次状态切换的时间戳)
+_Entry = Tuple[Optional[float], float]
+
+_NO_TRANSITION: _Entry = (None, math.inf)
+
+_RULE_PATTERN = re.compile(r"^\s*(\S+)\s+(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*$")
+
+
+def parse_quiet_rule(rule: str) -> Optional[QuietRule]:
+    """解析 "<stream_id> HH:MM-HH:MM" 格式的规则，格式无效时返回 None。"""
+    match = _RULE_PATTERN.match(rule)
+    if match is None:
+        return None
+    stream_id, start_hour, start_minute, end_hour, end_minute = match.groups()
+    if int(start_minute) >= 60 or int(end_minute) >= 60:
+        return None
+    start = int(start_hour) * 60 + int(start_minute)
+    end = int(end_hour) * 60 + int(end_minute)
+    # 24:00 可作为结束时间，"00:00-24:00" 为全天；写法上开始与结束相同的时段 (如 "08:00-08:00") 没有意义
+    if start >= 24 * 60 or end > 24 * 60 or start == end:
+        return None
+    return stream_id, (start, end % (24 * 60))
+
+
+class QuietHours:
+    """安静时段表：stream_id -> 每日时段，并缓存每个聊天流的当前状态与下一次切换时间。"""
+
+    def __init__(self):
+        self._windows: Dict[str, Tuple[Window, ...]] = {}
+        self._entries: Dict[str, _Entry] = {}
+        # 本次重新计算的次数 (用于统计，消息处理路径上应远小于查询次数)
+        self.refresh_count = 0
+
+    def configure(self, rules: Iterable[QuietRule], now: Optional[float] = None) -> None:
+        """用新的规则替换全部时段，并为每个聊天流预先计算状态。手动解除的时段 (suppress) 随之失效。"""
+        windows: Dict[str, List[Window]] = {}
+        for stream_id, window in rules:
+            windows.setdefault(stream_id, []).append(window)
+        self._windows = {sid: tuple(sorted(set(w))) for sid, w in windows.items()}
+        now = time.time() if now is None else now
+        self._entries = {sid: _compute_entry(w, now) for sid, w in self._windows.items()}
+
+    def quiet_until(self, stream_id: str, now: Optional[float] = None) -> Optional[float]:
+        """聊天流当前所处安静时段的结束时间戳，不在安静时段中时返回 None。"""
+        entry = self._entries.get(stream_id)
+        if entry is None:
+            return None
+        if now is None:
+            now = time.time()
+        if now >= entry[1]:
+            entry = self._refresh(stream_id, now)
+        return entry[0]
+
+    def suppress(self, stream_id: str, now: Optional[float] = None) -> bool:
+        """
+        提前结束聊天流当前的安静时段 (例如被 @ 或收到解除命令)，下一个时段照常生效。
+        只保存在内存中，重启后当前时段会重新生效。返回当前是否处于安静时段。
+        """
+        now = time.time() if now is None else now
+        until = self.quiet_until(stream_id, now)
+        if until is None:
+            return False
+        self._entries[stream_id] = (None, until)
+        return True
+
+    def _refresh(self, stream_id: str, now: float) -> _Entry:
+        self.refresh_count += 1
+        entry = _compute_entry(self._windows[stream_id], now)
+        self._entries[stream_id] = entry
+        return entry
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+
+def _compute_entry(windows: Tuple[Window, ...], now: float) -> _Entry:
+    """把每日时段展开为昨天、今天、明天的绝对区间，合并相邻区间后找出 now 所处的状态和下一次切换。"""
+    if not windows:
+        return _NO_TRANSITION
+    midnight = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    intervals = []
+    for day in (-1, 0, 1):
+        for start, end in windows:
+            begin = midnight + timedelta(days=day, minutes=start)
+            length = (end - start) % (24 * 60) or 24 * 60
+            intervals.append((begin.timestamp(), (begin + timedelta(minutes=length)).timestamp()))
+    intervals.sort()
+
+    merged: List[List[float]] = []
+    for begin, end in intervals:
+        if merged and begin <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([begin, end])
+
+    for begin, end in merged:
+        if now < begin:
+            return None, begin
+        if now < end:
+            return end, end
+    return _NO_TRANSITION
+
+
+_quiet_hours = QuietHours()
+
+
+def get_quiet_hours() -> QuietHours:
+    """获取进程内唯一的安静时段表实例。"""
+    return _quiet_hours
@@ -0,0 +1,103 @@
+"""
+解除禁言后“触发一次主动思考”的后台任务池。
+
+解除禁言的命令/Chatter/Handler 只负责提交任务，确认消息发出后立即返回，不再等待整个 LLM 往返：
+- 全局信号量限制同时进行的生成数量，批量解除禁言时不会一下子压垮模型后端；
+- 每次生成有独立的超时；
+- 同一聊天流已有排队或进行中的任务时，新的触发直接合并 (丢弃)；
+- 排队任务总数有上限，超出时丢弃并记录警告。
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional
+
+from .mute_logging import get_logger
+
+logger = get_logger("ThinkingPool")
+
+# 一次主动思考：无参数的协程工厂，提交时不立即创建协程，被合并的触发不会留下未 await 的协程
+ThinkingJob = Callable[[], Awaitable[None]]
+
+
+class ThinkingPool:
+    """按聊天流去重、有并发上限与超时的后台任务池。"""
+
+    def __init__(self, max_concurrency: int = 2, timeout: float = 30.0, max_pending: int = 100):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.configure(max_concurrency, timeout, max_pending)
+        # 统计
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.failed = 0
+
+    def configure(self, max_concurrency: int, timeout: float, max_pending: int) -> None:
+        """更新限制。新的并发上限只对之后提交的任务生效。"""
+        max_concurrency = max(1, int(max_concurrency))
+        if self._semaphore is None or max_concurrency != getattr(self, "max_concurrency", None):
+            self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.timeout = max(0.0, float(timeout))
+        self.max_pending = max(1, int(max_pending))
+
+    def submit(self, stream_id: str, job: ThinkingJob) -> bool:
+        """提交一次主动思考，返回是否被接受 (被合并或超出排队上限时返回 False)。"""
+        task = self._tasks.get(stream_id)
+        if task is not None and not task.done():
+            self.deduplicated += 1
+            logger.debug("Thinking already pending for stream %s, trigger merged.", stream_id)
+            return False
+        if len(self._tasks) >= self.max_pending:
+            self.rejected += 1
+            logger.warning("Thinking pool is full (%s pending), dropping trigger for stream %s.", len(self._tasks), stream_id)
+            return False
+        self.submitted += 1
+        task = asyncio.get_running_loop().create_task(self._run(stream_id, job, self._semaphore))
+        self._tasks[stream_id] = task
+        task.add_done_callback(lambda t, sid=stream_id: self._discard(sid, t))
+        return True
+
+    def pending(self) -> int:
+        """排队与进行中的任务数。"""
+        return len(self._tasks)
+
+    async def shutdown(self) -> None:
+        """取消所有排队与进行中的任务并等待它们结束。"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _run(self, stream_id: str, job: ThinkingJob, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            try:
+                if self.timeout:
+                    await asyncio.wait_for(job(), self.timeout)
+                else:
+                    await job()
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                logger.warning("Triggering thinking for stream %s timed out after %ss.", stream_id, self.timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error("Error trying to trigger thinking for stream %s: %s", stream_id, e)
+
+    def _discard(self, stream_id: str, task: asyncio.Task) -> None:
+        if self._tasks.get(stream_id) is task:
+            del self._tasks[stream_id]
+
+
+_thinking_pool: Optional[ThinkingPool] = None
+
+
+def get_thinking_pool() -> ThinkingPool:
+    """获取进程内唯一的任务池实例。"""
+    global _thinking_pool
+    if _thinking_pool is None:
+        _thinking_pool = ThinkingPool()
+    return _thinking_pool
@@ -1,4 +1,6 @@
 import asyncio
+import logging
+import os
 import time
 from datetime import datetime, timedelta
 from typing import List, Tuple, Type, Optional, Dict, Any # 导入 Any 用于类型注解
@@ -24,16 +26,108 @@ from src.plugin_system.base.component_types import ChatType as ChatterChatType #
 from src.chat.planner_actions.action_manager import ChatterActionManager # TYPE_CHECKING 模拟
 from src.plugin_system.apis import send_api, generator_api, storage_api
 
+try:
+    from src.config.config import global_config
+except ImportError:
+    global_config = None
+
+# 与框架无关的禁言模块放在 linglingbizui 包内，使其可以单独部署；本插件随整个目录部署，从子包导入
+from .linglingbizui.alias_matcher import ALIAS_KIND_MUTE, ALIAS_KIND_UNMUTE
+from .linglingbizui.bulk_targets import BULK_STREAMS, BulkSelection, parse_bulk_args, select_streams
+from .linglingbizui.duration_parser import parse_duration_minutes
+from .linglingbizui.mention_scanner import iter_mentions, message_may_mention, message_mentions
+from .linglingbizui.message_text import get_message_text, get_sender_id
+from .linglingbizui.mute_config import config_state
+from .linglingbizui.mute_journal import MuteJournal
+from .linglingbizui.mute_logging import get_logger, shutdown_logging
+from .linglingbizui.mute_metrics import (
+    COUNTER_ALIAS_MUTE, COUNTER_ALIAS_UNMUTE, COUNTER_AT_UNMUTE, COUNTER_EXPIRED, COUNTER_FAST_PATH,
+    COUNTER_INTERCEPTED, COUNTER_MESSAGES, STAGE_ALIAS, STAGE_GENERATOR, STAGE_MENTION,
+    STAGE_NOTIFY, STAGE_REGISTRY, STAGE_SEND, STAGE_TEXT, STAGE_TOTAL, MuteMetrics, get_mute_metrics,
+)
+from .linglingbizui.mute_registry import get_mute_registry
+from .linglingbizui.notice_sender import get_notice_queue
+from .linglingbizui.thinking_pool import get_thinking_pool
+
 # --- 常量定义 ---
 PLUGIN_NAME = "mute_and_unmute_plugin"
-STORAGE_KEY_MUTED_STREAMS = "muted_streams" # 用于存储被禁言的聊天流ID及其解除时间
 COMMAND_MUTE_NAME = "mute_mai"
 COMMAND_UNMUTE_NAME = "unmute_mai"
+COMMAND_STATS_NAME = "mute_stats"
+
+# 非 Master 使用批量选择器时的回复
+BULK_DENIED_MESSAGE = "❌ 只有 [permissions] master_users 中的用户可以使用批量操作 (--all / --streams / --match)。"
+STATS_RESET_DENIED_MESSAGE = "❌ 只有 [permissions] master_users 中的用户可以清空统计。"
+
+logger = get_logger("MuteAndUnmutePlugin")
+chatter_logger = get_logger("MuteControlChatter")
+
+
+# --- 解除禁言后的主动思考 ---
+
+async def _trigger_thinking(
+    stream_id: str,
+    action_data: Dict[str, Any],
+    chat_stream: Optional[ChatStream] = None,
+    log: logging.Logger = logger,
+) -> None:
+    """
+    在聊天流中触发一次主动思考。由后台任务池调用，超时与异常由任务池统一处理。
+    未传入 chat_stream 时通过 ChatManager 获取。
+    """
+    if chat_stream is None:
+        from src.chat.message_receive.chat_stream import get_chat_manager # 获取 ChatManager 单例
+        chat_stream = await get_chat_manager().get_stream(stream_id)
+        if not chat_stream:
+            log.warning("Could not get ChatStream object from ChatManager for %s to trigger thinking.", stream_id)
+            return
+    replyer = await generator_api.get_replyer(chat_stream=chat_stream)
+    if not replyer:
+        log.warning("Could not get replyer for stream %s to trigger thinking.", stream_id)
+        return
+    start = time.perf_counter_ns()
+    try:
+        success, reply_set, prompt = await generator_api.generate_reply(
+            chat_stream=chat_stream,
+            action_data=action_data,
+            reply_to="", # 不回复特定消息
+            available_actions=[], # 不提供具体动作，让模型决定
+            enable_tool=False, # 暂时禁用工具调用
+            return_prompt=False
+        )
+    finally:
+        get_mute_metrics().observe(STAGE_GENERATOR, time.perf_counter_ns() - start)
+    if success:
+        log.debug("Attempted to trigger thinking (%s) in %s.", action_data.get("type"), stream_id)
+    else:
+        log.warning("Failed to generate reply/trigger thinking (%s) in %s.", action_data.get("type"), stream_id)
+
+
+# --- 批量禁言/解除禁言 ---
+
+def _bulk_target_streams(selection: BulkSelection) -> List[str]:
+    """按选择器解析批量操作的目标聊天流 (--all / --match 从 ChatManager 的群聊列表中选择)。"""
+    group_streams = [] if selection.flag == BULK_STREAMS else chat_api.get_group_streams()
+    return select_streams(selection, group_streams)
+
+
+def _queue_bulk_notices(stream_ids: List[str], text: str) -> int:
+    """把同一条提示放入多个聊天流的发送队列，返回入队的条数 (限速与发送由后台任务完成)。"""
+    notice_queue = get_notice_queue()
+    return sum(notice_queue.notify(stream_id, text) for stream_id in stream_ids)
+
+
+def _parse_bulk(args: Optional[CommandArgs]) -> Optional[BulkSelection]:
+    """解析命令参数中的批量选择器，选择器缺少参数时抛出 ValueError。"""
+    if args is None or args.is_empty():
+        return None
+    return parse_bulk_args(args.get_args())
+
 
 class MuteMaiCommand(PlusCommand):
     """Master 用来让 Bot 在当前聊天流静音的命令。"""
     command_name = COMMAND_MUTE_NAME
-    command_description = "让Bot在当前聊天流静音，使用配置中的默认时长"
+    command_description = "让Bot在当前聊天流静音，可指定时长（默认从配置读取）；--all / --streams / --match 批量禁言"
     # command_aliases = [] # 不再使用 PlusCommand 的 aliases，由 Handler 处理
     chat_type_allow = ChatType.ALL # 允许在群聊和私聊中使用
 
@@ -47,51 +141,97 @@ class MuteMaiCommand(PlusCommand):
 
         stream_id = chat_stream.stream_id
 
-        # 获取存储实例
-        plugin_storage = storage_api.get_local_storage(PLUGIN_NAME) # --- 修改：使用 get_local_storage ---
-
-        # 获取插件配置
+        # 获取插件配置 (编译后的快照)
+        config = config_state.current
         # 检查插件主功能是否启用
-        plugin_enabled = self.get_config("plugin.enabled", True)
-        if not plugin_enabled:
-            await send_api.text_to_stream("❌ 插件已被禁用。", stream_id)
+        if not config.plugin_enabled:
+            get_notice_queue().notify(stream_id, "❌ 插件已被禁用。")
             return (False, "插件已禁用", False) # --- 修改：返回元组 ---
 
         # 检查静音功能是否启用
-        mute_enabled = self.get_config("features.mute_enabled", True)
-        if not mute_enabled:
-            await send_api.text_to_stream("❌ 静音功能已被禁用。", stream_id)
+        if not config.mute_enabled:
+            get_notice_queue().notify(stream_id, "❌ 静音功能已被禁用。")
             return (False, "静音功能已禁用", False) # --- 修改：返回元组 ---
 
-        # 使用配置中的默认时长
-        duration_minutes = self.get_config("defaults.default_mute_minutes", 10)
+        # 批量禁言 (--all / --streams / --match)
+        try:
+            bulk = _parse_bulk(args)
+        except ValueError as e:
+            get_notice_queue().notify(stream_id, f"❌ {e}")
+            return (False, str(e), False)
+        if bulk is not None:
+            # 批量操作影响其他聊天流，仅限 Master
+            if not config.is_master(get_sender_id(getattr(self, 'message', None))):
+                get_notice_queue().notify(stream_id, BULK_DENIED_MESSAGE)
+                return (False, "批量操作仅限 Master", False)
+            return self._execute_bulk(bulk, config, stream_id)
+
+        # 参数作为时长 (支持复合写法，如 "1小时30分钟"、"1h30m"、"1.5h"、"半小时")，没有参数时使用配置中的默认时长
+        if args is not None and not args.is_empty():
+            duration_minutes = parse_duration_minutes(args.get_raw().strip())
+            if duration_minutes is None:
+                get_notice_queue().notify(stream_id, "❌ 无法解析指定的时长，请使用如 '10min', '30分钟', '1小时30分钟', '1.5h' 等格式。")
+                return (False, "无法解析指定的时长", False)
+        else:
+            duration_minutes = config.default_mute_minutes
 
         # 计算解除禁言的时间
         unmute_time = datetime.now() + timedelta(minutes=duration_minutes)
 
-        # 更新存储中的禁言列表
-        current_muted_streams: Dict[str, float] = plugin_storage.get(STORAGE_KEY_MUTED_STREAMS, {})
-        current_muted_streams[stream_id] = unmute_time.timestamp() # 存储时间戳
-        plugin_storage.set(STORAGE_KEY_MUTED_STREAMS, current_muted_streams) # --- 修改：使用 plugin_storage.set ---
-        print(f"[MuteMaiCommand] DEBUG: Set mute for stream {stream_id} until {unmute_time} in storage. Current muted streams: {current_muted_streams}") # 添加调试日志
+        # 更新禁言注册表并把确认放入发送队列；两步之间没有 await，同一聊天流的提示按入队顺序发出
+        mute_registry = get_mute_registry()
+        # 更新禁言注册表 (内存中修改，并写回 storage)
+        # 幂等：已禁言且新的截止时间没有比当前晚出冷却窗口时，视为重复请求，不写存储也不回复
+        if not mute_registry.mute_if_extends(stream_id, unmute_time.timestamp(), config.mute_cooldown_seconds):
+            logger.debug("Stream %s is already muted past %s, ignoring repeated mute.", stream_id, unmute_time)
+            return (True, f"{stream_id} 已处于禁言中，忽略重复的禁言请求", False)
+        logger.debug("Set mute for stream %s until %s.", stream_id, unmute_time) # 添加调试日志
 
         # 从配置中获取提示词
-        mute_message_template = self.get_config("messages.mute_start", "好的，我将在当前聊天中保持安静，直到 {unmute_time_str}。")
+        mute_message_template = config.mute_start
         unmute_time_str = unmute_time.strftime('%H:%M')
         mute_message = mute_message_template.format(unmute_time_str=unmute_time_str)
 
-        # 发送确认消息 (使用 self.send_text 或 send_api)
-        # self.send_text 是 PlusCommand 内置方法，应该更可靠
-        await self.send_text(mute_message) # --- 修改：使用 self.send_text ---
+        # 确认消息由发送队列限速发出 (相同的待发提示会被合并)，命令不等待网络发送
+        get_notice_queue().notify(stream_id, mute_message)
 
-        print(f"[MuteAndUnmutePlugin] Muted stream {stream_id} for {duration_minutes} minutes until {unmute_time}")
+        logger.info("Muted stream %s for %s minutes until %s", stream_id, duration_minutes, unmute_time)
         return (True, f"已设置在 {stream_id} 禁言 {duration_minutes} 分钟至 {unmute_time}", True) # --- 修改：返回元组 ---
 
+    def _execute_bulk(self, selection: BulkSelection, config: Any, stream_id: str) -> Tuple[bool, Optional[str], bool]:
+        """
+        批量禁言：所有目标聊天流的禁言作为一次批量更新写入注册表 (只落盘一次)，
+        各聊天流的提示消息放入限速的发送队列，并在当前聊天流汇报结果。
+        """
+        stream_ids = _bulk_target_streams(selection)
+        if not stream_ids:
+            get_notice_queue().notify(stream_id, "❌ 没有匹配的聊天流。")
+            return (False, "批量禁言没有匹配的聊天流", False)
+
+        # 选择器之后的参数作为时长，没有时使用配置中的默认时长
+        duration_minutes = config.default_mute_minutes
+        if selection.remainder:
+            duration_minutes = parse_duration_minutes(selection.remainder)
+            if duration_minutes is None:
+                get_notice_queue().notify(stream_id, "❌ 无法解析指定的时长，请使用如 '10min', '30分钟', '1小时30分钟', '1.5h' 等格式。")
+                return (False, "无法解析指定的时长", False)
+        unmute_time = datetime.now() + timedelta(minutes=duration_minutes)
+
+        # 注册表的批量更新中间没有 await，在事件循环中原子完成
+        get_mute_registry().mute_many(stream_ids, unmute_time.timestamp())
+        mute_message = config.mute_start.format(unmute_time_str=unmute_time.strftime('%H:%M'))
+        queued = _queue_bulk_notices(stream_ids, mute_message)
+
+        logger.info("Bulk muted %s stream(s) (%s %s) for %s minutes until %s, %s notice(s) queued.",
+                    len(stream_ids), selection.flag, selection.value or "", duration_minutes, unmute_time, queued)
+        get_notice_queue().notify(stream_id, f"已在 {len(stream_ids)} 个聊天流禁言 {duration_minutes} 分钟至 {unmute_time.strftime('%H:%M')}。")
+        return (True, f"已批量禁言 {len(stream_ids)} 个聊天流", False)
+
 
 class UnmuteMaiCommand(PlusCommand):
     """Master 用来让 Bot 在当前聊天流取消静音的命令。"""
     command_name = COMMAND_UNMUTE_NAME
-    command_description = "让Bot在当前聊天流取消静音并开始思考"
+    command_description = "让Bot在当前聊天流取消静音并开始思考；--all / --streams / --match 批量解除"
     # command_aliases = [] # 不再使用 PlusCommand 的 aliases，由 Handler 处理
     chat_type_allow = ChatType.ALL # 允许在群聊和私聊中使用
 
@@ -103,69 +243,116 @@ class UnmuteMaiCommand(PlusCommand):
 
         stream_id = chat_stream.stream_id
 
-        # 获取存储实例
-        plugin_storage = storage_api.get_local_storage(PLUGIN_NAME) # --- 修改：使用 get_local_storage ---
-
-        # 获取插件配置
+        # 获取插件配置 (编译后的快照)
+        config = config_state.current
         # 检查插件主功能是否启用
-        plugin_enabled = self.get_config("plugin.enabled", True)
-        if not plugin_enabled:
-            await send_api.text_to_stream("❌ 插件已被禁用。", stream_id)
+        if not config.plugin_enabled:
+            get_notice_queue().notify(stream_id, "❌ 插件已被禁用。")
             return (False, "插件已禁用", False) # --- 修改：返回元组 ---
 
         # 检查静音功能是否启用
-        mute_enabled = self.get_config("features.mute_enabled", True)
-        if not mute_enabled:
-            await send_api.text_to_stream("❌ 静音功能已被禁用。", stream_id)
+        if not config.mute_enabled:
+            get_notice_queue().notify(stream_id, "❌ 静音功能已被禁用。")
             return (False, "静音功能已禁用", False) # --- 修改：返回元组 ---
 
-        # 从存储中移除该聊天流的禁言记录
-        current_muted_streams: Dict[str, float] = plugin_storage.get(STORAGE_KEY_MUTED_STREAMS, {})
-        if stream_id in current_muted_streams:
-            del current_muted_streams[stream_id]
-            plugin_storage.set(STORAGE_KEY_MUTED_STREAMS, current_muted_streams) # --- 修改：使用 plugin_storage.set ---
-            print(f"[MuteAndUnmutePlugin] Unmuted stream {stream_id} via command.")
-            print(f"[UnmuteMaiCommand] DEBUG: Removed mute for stream {stream_id} from storage. Current muted streams: {current_muted_streams}") # 添加调试日志
+        # 批量解除禁言 (--all / --streams / --match)
+        try:
+            bulk = _parse_bulk(args)
+        except ValueError as e:
+            get_notice_queue().notify(stream_id, f"❌ {e}")
+            return (False, str(e), False)
+        if bulk is not None:
+            # 批量操作影响其他聊天流，仅限 Master
+            if not config.is_master(get_sender_id(getattr(self, 'message', None))):
+                get_notice_queue().notify(stream_id, BULK_DENIED_MESSAGE)
+                return (False, "批量操作仅限 Master", False)
+            return self._execute_bulk(bulk, config, stream_id)
+
+        # 解除禁言并把确认放入发送队列；两步之间没有 await，同一聊天流的提示按入队顺序发出
+        mute_registry = get_mute_registry()
+        # 从禁言注册表中移除该聊天流的禁言记录
+        if mute_registry.unmute(stream_id):
+            logger.info("Unmuted stream %s via command.", stream_id)
         else:
-            print(f"[MuteAndUnmutePlugin] Attempted to unmute stream {stream_id} via command, but it was not muted.")
+            logger.debug("Attempted to unmute stream %s via command, but it was not muted.", stream_id)
             # 即使未被禁言，也可能需要发送消息，但这里我们只在解除时发送
             # 可以选择发送一个提示，说明当前并未禁言
             # await send_api.text_to_stream("我当前并未被禁言哦。", stream_id)
             # 为了与原逻辑一致，我们只在成功解除时发送消息
-            await self.send_text("我当前并未被禁言哦。") # --- 修改：使用 self.send_text ---
+            get_notice_queue().notify(stream_id, "我当前并未被禁言哦。")
             return (False, f"尝试取消 {stream_id} 的禁言，但该聊天流未被禁言。", False) # --- 修改：返回元组 ---
 
         # 从配置中获取提示词
-        unmute_message = self.get_config("messages.unmute_start", "好的，我恢复发言了！")
+        unmute_message = config.unmute_start
 
-        # 发送确认消息 (使用 self.send_text)
-        await self.send_text(unmute_message) # --- 修改：使用 self.send_text ---
+        # 确认消息由发送队列限速发出，命令不等待网络发送
+        get_notice_queue().notify(stream_id, unmute_message)
 
         # 尝试触发一次主动思考
         # 这里需要判断是否需要思考，根据 PlusCommand 的返回值约定，第三个 bool 表示是否需要思考
-        # 通常，执行了明确的命令后，可以触发一次思考
-        try:
-            replyer = await generator_api.get_replyer(chat_stream=chat_stream)
-            if replyer:
-                success, reply_set, prompt = await generator_api.generate_reply(
-                    chat_stream=chat_stream,
-                    action_data={"type": "unmute_trigger", "message": "Master has unmuted me."}, # 模拟动作数据
-                    reply_to="", # 不回复特定消息
-                    available_actions=[], # 不提供具体动作，让模型决定
-                    enable_tool=False, # 暂时禁用工具调用
-                    return_prompt=False
-                )
-                if success:
-                    print(f"[MuteAndUnmutePlugin] Attempted to trigger thinking after unmute in {stream_id}.")
-                else:
-                    print(f"[MuteAndUnmutePlugin] Failed to generate reply/trigger thinking after unmute in {stream_id}.")
-            else:
-                print(f"[MuteAndUnmutePlugin] Could not get replyer for stream {stream_id} to trigger thinking.")
-        except Exception as e:
-            print(f"[MuteAndUnmutePlugin] Error trying to trigger thinking after unmute: {e}")
+        # 通常，执行了明确的命令后，可以触发一次思考；生成放到后台任务池中，命令不等待 LLM 往返
+        get_thinking_pool().submit(stream_id, lambda: _trigger_thinking(
+            stream_id, {"type": "unmute_trigger", "message": "Master has unmuted me."}, chat_stream # 模拟动作数据
+        ))
 
         return (True, f"已取消 {stream_id} 的禁言，并尝试触发思考。", True) # --- 修改：返回元组 ---
 
+    def _execute_bulk(self, selection: BulkSelection, config: Any, stream_id: str) -> Tuple[bool, Optional[str], bool]:
+        """
+        批量解除禁言：一次批量更新注册表 (只落盘一次)，只向确实被解除的聊天流发送提示 (经限速的发送队列)。
+        批量解除时不触发主动思考，避免同时唤起大量生成。
+        """
+        stream_ids = _bulk_target_streams(selection)
+        if not stream_ids:
+            get_notice_queue().notify(stream_id, "❌ 没有匹配的聊天流。")
+            return (False, "批量解除禁言没有匹配的聊天流", False)
+
+        unmuted = get_mute_registry().unmute_many(stream_ids)
+        queued = _queue_bulk_notices(unmuted, config.unmute_start)
+
+        logger.info("Bulk unmuted %s of %s selected stream(s) (%s %s), %s notice(s) queued.",
+                    len(unmuted), len(stream_ids), selection.flag, selection.value or "", queued)
+        get_notice_queue().notify(stream_id, f"已在 {len(unmuted)} 个聊天流解除禁言 (共选中 {len(stream_ids)} 个)。")
+        return (True, f"已批量解除 {len(unmuted)} 个聊天流的禁言", False)
+
+
+class MuteStatsCommand(PlusCommand):
+    """查看禁言处理各阶段耗时的分位数与事件计数。"""
+    command_name = COMMAND_STATS_NAME
+    command_description = "查看禁言处理各阶段的耗时 (p50/p95/p99) 与事件计数；export 导出 Prometheus 文本，reset 清空统计"
+    chat_type_allow = ChatType.ALL # 允许在群聊和私聊中使用
+
+    async def execute(self, args: CommandArgs) -> Tuple[bool, Optional[str], bool]:
+        chat_stream: ChatStream = self.chat_stream
+        if not chat_stream:
+            return (False, "无法获取当前聊天流信息。", False)
+
+        stream_id = chat_stream.stream_id
+        metrics = get_mute_metrics()
+        action = "" if args is None or args.is_empty() else args.get_args()[0].lower()
+
+        if action == "reset":
+            # 清空统计会影响所有聊天流的观测数据，仅限 Master
+            if not config_state.current.is_master(get_sender_id(getattr(self, 'message', None))):
+                get_notice_queue().notify(stream_id, STATS_RESET_DENIED_MESSAGE)
+                return (False, "清空统计仅限 Master", False)
+            metrics.reset()
+            get_notice_queue().notify(stream_id, "已清空禁言处理的耗时统计与计数。")
+            return (True, "已清空统计", False)
+
+        if action == "export":
+            if not metrics.export_path:
+                get_notice_queue().notify(stream_id, "❌ 未配置 [metrics] prometheus_path，无法导出。")
+                return (False, "未配置导出路径", False)
+            if not metrics.write_prometheus():
+                get_notice_queue().notify(stream_id, f"❌ 写入 {metrics.export_path} 失败，详见日志。")
+                return (False, "导出失败", False)
+            get_notice_queue().notify(stream_id, f"已导出到 {metrics.export_path}。")
+            return (True, f"已导出到 {metrics.export_path}", False)
+
+        get_notice_queue().notify(stream_id, metrics.summary())
+        return (True, "已发送禁言处理统计", False)
+
 
 # --- 修改：Chatter 组件来处理别名、@唤醒和禁言检查 ---
 class MuteControlChatter(BaseChatter):
@@ -179,27 +366,63 @@ class MuteControlChatter(BaseChatter):
     def __init__(self, stream_id: str, action_manager: "ChatterActionManager"):
         super().__init__(stream_id, action_manager)
         # 初始化时只接收 stream_id 和 action_manager
-        # 配置在 execute 方法中通过 self.get_config 获取
-        # 初始化实例属性为 None 或默认值
-        self.mute_aliases: List[str] = []
-        self.unmute_aliases: List[str] = []
-        self.plugin_enabled_val: bool = True
-        self.mute_enabled_val: bool = True
-        self.at_unmute_enabled_val: bool = True
-        self.default_mute_minutes_val: int = 10
-        self.messages_config_val: Dict[str, str] = {}
-        print(f"[MuteControlChatter] Initialized instance for stream {self.stream_id}, waiting for config in execute.") # --- 添加：调试日志 ---
+        # 配置由插件编译为只读快照 (config_state.current)，execute 中一次属性访问即可读取
+        chatter_logger.debug("Initialized instance for stream %s.", self.stream_id) # --- 添加：调试日志 ---
+
+    def _fast_path(self, message: Any, stream_id: str, config: Any, mute_registry: Any, sampled: bool, metrics: MuteMetrics) -> Optional[dict]:
+        """
+        快速路径：已确定不是别名的消息，能直接判定结果时返回 Chatter 结果，否则返回 None 走完整流程。
+        只有被采样的消息 (sampled) 才计时，未采样时不调用计时器。
+        """
+        if sampled:
+            start = time.perf_counter_ns()
+            muted = mute_registry.is_muted(stream_id)
+            metrics.observe(STAGE_REGISTRY, time.perf_counter_ns() - start)
+        else:
+            muted = mute_registry.is_muted(stream_id)
+        if not muted:
+            # 未被禁言且不是别名：@ 唤醒也无从谈起，不做任何处理
+            return {
+                "success": True,
+                "stream_id": stream_id,
+                "message": "Chatter executed (fast path), no blocking action taken."
+            }
+
+        if config.at_unmute_enabled and message_may_mention(message):
+            # 被禁言且可能 @ 了 Bot (按 @ 标记与 at 段判断，无法判断时也算)，需要完整的 @ 检查
+            return None
+
+        metrics.incr(COUNTER_INTERCEPTED)
+        return {
+            "success": True,
+            "stream_id": stream_id,
+            "plan_created": True,
+            "actions_count": 0,
+            "block_follow_up_processing": True,
+            "message": "Message intercepted due to mute (fast path)."
+        }
 
     async def execute(self, context: StreamContext) -> dict:
         """
         执行 Chatter 的核心逻辑。
         检查最新消息是否为别名、@唤醒，并检查禁言状态。
+        事件计数逐条记录；整条消息的总耗时与各阶段耗时只对采样到的消息记录 ([metrics] stage_sample_every，见 mute_metrics)。
         """
-        # 获取存储实例 (与 PlusCommand 一样的方式)
-        plugin_storage = storage_api.get_local_storage(PLUGIN_NAME)
-        print(f"[MuteControlChatter] DEBUG: Got storage instance for {PLUGIN_NAME}. Checking muted streams at start of execute...") # 添加调试日志
-        initial_muted_streams = plugin_storage.get(STORAGE_KEY_MUTED_STREAMS, {})
-        print(f"[MuteControlChatter] DEBUG: Initial muted streams from storage in execute: {initial_muted_streams}") # 添加调试日志
+        metrics = get_mute_metrics()
+        metrics.incr(COUNTER_MESSAGES)
+        if not metrics.sample():
+            return await self._execute(context, False, metrics)
+        start = time.perf_counter_ns()
+        try:
+            return await self._execute(context, True, metrics)
+        finally:
+            metrics.observe(STAGE_TOTAL, time.perf_counter_ns() - start)
+
+    async def _execute(self, context: StreamContext, sampled: bool, metrics: MuteMetrics) -> dict:
+        # 禁言状态统一从进程内的禁言注册表查询，不再每条消息读取 storage
+        mute_registry = get_mute_registry()
+        # 配置快照在插件加载/配置变化时编译，这里只取引用 (一次属性访问，不再单独计时)
+        config = config_state.current
 
         # --- 从 context 获取 stream_id ---
         # BaseChatter 实例本身有 self.stream_id，StreamContext 也有 stream_id
@@ -209,360 +432,231 @@ class MuteControlChatter(BaseChatter):
         # --- 从 context 获取最新的消息 ---
         last_message = context.get_last_message()
         if not last_message:
-            print(f"[MuteControlChatter] No last message found in context for stream {stream_id}. Skipping checks.")
+            chatter_logger.debug("No last message found in context for stream %s. Skipping checks.", stream_id)
             return {"success": True, "stream_id": stream_id, "message": "No last message in context."}
 
-                # --- 从 last_message 获取信息 ---
-        # 尝试获取 content
-        # 根据错误日志和 MoFox 架构，message 对象很可能是 DatabaseMessages 类型
-        # 尝试常见的属性名，特别是根据 'message_storage' 日志，可能包含 processed_plain_text 或 plain_text
-        # 也可能是 text, raw_content, content 等
-        # 尝试从最可能的属性开始
-        message_content = getattr(last_message, 'processed_plain_text', None)
-        if not message_content:
-            message_content = getattr(last_message, 'plain_text', None)
-        if not message_content:
-            message_content = getattr(last_message, 'text', None)
-        if not message_content:
-            message_content = getattr(last_message, 'content', None)
-        if not message_content:
-            message_content = getattr(last_message, 'raw_content', None)
-        if not message_content:
-            # 如果以上都失败，尝试获取原始消息段并手动拼接文本
-            # 这需要了解 DatabaseMessages 的具体结构，例如是否有 segments 属性
-            # 假设 DatabaseMessages 有 segments 属性，包含消息段列表
-            # 每个段可能有 type 和 data 属性
-            # 这里只处理 text 类型的段
-            segments = getattr(last_message, 'segments', [])
-            text_parts = []
-            for seg in segments:
-                if seg.get('type') == 'text':
-                    text_parts.append(seg.get('data', {}).get('text', ''))
-            message_content = ''.join(text_parts)
+        # --- 从 last_message 获取信息 ---
+        # 消息对象可能是 DatabaseMessages 等不同类型，文本所在的属性各不相同
+        # get_message_text 按消息类型记住有效的属性，并把去除首尾空白后的文本缓存在消息上
+        if sampled:
+            start = time.perf_counter_ns()
+        message_content = get_message_text(last_message)
+        if sampled:
+            text_done = time.perf_counter_ns()
+            metrics.observe(STAGE_TEXT, text_done - start)
 
         if not message_content:
-            print(f"[MuteControlChatter] No text content found in last message for stream {stream_id}. Skipping checks.")
+            chatter_logger.debug("No text content found in last message for stream %s. Skipping checks.", stream_id)
             return {"success": True, "stream_id": stream_id, "message": "No text content in last message."}
 
-        # --- 在 execute 中首次获取配置并缓存到实例属性 ---
-        # 尝试调用 self.get_config
-        try:
-            # 检查插件主功能是否启用
-            plugin_enabled = self.get_config("plugin.enabled", True) # <--- 尝试调用 ---
-            mute_enabled = self.get_config("features.mute_enabled", True) # <--- 尝试调用 ---
-            # at_unmute_enabled = self.get_config("features.at_unmute_enabled", True) # Chatter 中可能用不到这个开关，但仍可获取
-            mute_aliases = self.get_config("aliases.mute", ["绫绫闭嘴"]) # <--- 尝试调用 ---
-            unmute_aliases = self.get_config("aliases.unmute", ["绫绫张嘴"]) # <--- 尝试调用 ---
-            default_mute_minutes = self.get_config("defaults.default_mute_minutes", 10) # <--- 尝试调用 ---
-            messages_config = self.get_config("messages", {}) # <--- 尝试调用 ---
-
-            # 将获取到的配置存储为实例属性，以供后续逻辑使用
-            self.plugin_enabled_val = plugin_enabled
-            self.mute_enabled_val = mute_enabled
-            # self.at_unmute_enabled_val = at_unmute_enabled # 可选
-            self.mute_aliases = mute_aliases
-            self.unmute_aliases = unmute_aliases
-            self.default_mute_minutes_val = default_mute_minutes
-            self.messages_config_val = messages_config
-
-            print(f"[MuteControlChatter] Loaded config from plugin in execute for stream {stream_id}. Aliases: mute={self.mute_aliases}, unmute={self.unmute_aliases}")
-
-        except AttributeError:
-            # 如果 self.get_config 不存在，则回退到使用默认值或从 storage_api 获取
-            # 这意味着 BaseChatter 可能没有 get_config 方法
-            print(f"[MuteControlChatter] WARNING: 'self' object has no attribute 'get_config'. Using defaults.")
-            self.plugin_enabled_val = True
-            self.mute_enabled_val = True
-            # self.at_unmute_enabled_val = True # 可选
-            self.mute_aliases = ["绫绫闭嘴"]
-            self.unmute_aliases = ["绫绫张嘴"]
-            self.default_mute_minutes_val = 10
-            self.messages_config_val = {}
-            # 如果需要从 storage_api 获取，可以在这里尝试
-            # 但这需要在 execute 时进行，且可能性能较差
-            # 或者，如果框架不支持，可以考虑在 on_plugin_loaded 时将配置存入 storage，然后在这里读取
-            # 但这种方式不如工厂函数优雅，且可能存在延迟
-            # 最坏的情况是，如果框架不提供获取配置的途径，那么这个 Chatter 就无法工作
-            # 让我们先尝试 storage_api
-            try:
-                plugin_storage = storage_api.get_local_storage(PLUGIN_NAME)
-                cached_config = plugin_storage.get("chatter_config", {}) # 使用一个特定的键
-                if cached_config:
-                    self.plugin_enabled_val = cached_config.get("plugin", {}).get("enabled", True)
-                    self.mute_enabled_val = cached_config.get("features", {}).get("mute_enabled", True)
-                    # self.at_unmute_enabled_val = cached_config.get("features", {}).get("at_unmute_enabled", True) # 可选
-                    self.mute_aliases = cached_config.get("aliases", {}).get("mute", ["绫绫闭嘴"])
-                    self.unmute_aliases = cached_config.get("aliases", {}).get("unmute", ["绫绫张嘴"])
-                    self.default_mute_minutes_val = cached_config.get("defaults", {}).get("default_mute_minutes", 10)
-                    self.messages_config_val = cached_config.get("messages", {})
-                    print(f"[MuteControlChatter] Loaded config from storage in execute for stream {self.stream_id}. Aliases: mute={self.mute_aliases}, unmute={self.unmute_aliases}")
-                else:
-                    print(f"[MuteControlChatter] WARNING: Config not found in storage for stream {self.stream_id}. Using defaults.")
-            except Exception as e:
-                print(f"[MuteControlChatter] ERROR loading config from storage in execute for stream {self.stream_id}: {e}. Using defaults.")
-        
         # --- 1. 检查是否为别名 ---
-        # 检查 Mute 别名
-        for alias in self.mute_aliases:
-            if message_content.strip().startswith(alias):
-                print(f"[MuteControlChatter] Mute alias '{alias}' detected in stream {stream_id} (via Chatter).")
-                # 定义一个辅助函数来执行核心逻辑
-                async def _execute_mute_logic_direct_from_chatter(context_stream_id):
-                    # 获取存储实例
-                    plugin_storage = storage_api.get_local_storage(PLUGIN_NAME)
-
-                    # 检查插件主功能是否启用 # --- 修改：使用实例属性 ---
-                    if not self.plugin_enabled_val:
-                        await send_api.text_to_stream("❌ 插件已被禁用。", context_stream_id)
-                        return False, "Plugin is disabled"
-
-                    # 检查静音功能是否启用 # --- 修改：使用实例属性 ---
-                    if not self.mute_enabled_val:
-                        await send_api.text_to_stream("❌ 静音功能已被禁用。", context_stream_id)
-                        return False, "Mute feature is disabled"
-
-                    # 使用实例属性中的默认时长
-                    duration_minutes = self.default_mute_minutes_val # --- 修改：使用实例属性 ---
-
-                    # 计算解除禁言的时间
-                    unmute_time = datetime.now() + timedelta(minutes=duration_minutes)
-
-                    # 更新存储中的禁言列表
-                    current_muted_streams: Dict[str, float] = plugin_storage.get(STORAGE_KEY_MUTED_STREAMS, {})
-                    current_muted_streams[context_stream_id] = unmute_time.timestamp() # 存储时间戳
-                    plugin_storage.set(STORAGE_KEY_MUTED_STREAMS, current_muted_streams)
+        # 所有别名在配置编译时构建为前缀树；先用别名首字符/长度廉价预筛，可能命中时才扫描前缀树
+        # 预筛与匹配合计为一次别名阶段耗时
+        alias_matcher = config.alias_matcher
+        alias_match = alias_matcher.match(message_content) if alias_matcher.may_match(message_content) else None
+        if sampled:
+            metrics.observe(STAGE_ALIAS, time.perf_counter_ns() - text_done)
+
+        # --- 快速路径 ---
+        # 绝大多数消息既不是别名也没有 @ Bot：直接按禁言状态判定，跳过 @ 扫描等后续步骤
+        if alias_match is None:
+            fast_result = self._fast_path(last_message, stream_id, config, mute_registry, sampled, metrics)
+            if fast_result is not None:
+                metrics.incr(COUNTER_FAST_PATH)
+                return fast_result
 
-                    # 从配置中获取提示词
-                    mute_message_template = self.messages_config_val.get("mute_start", "好的，我将在当前聊天中保持安静，直到 {unmute_time_str}。") # --- 修改：使用实例属性 ---
-                    unmute_time_str = unmute_time.strftime('%H:%M')
-                    mute_message = mute_message_template.format(unmute_time_str=unmute_time_str)
-
-                    # 发送确认消息
-                    await send_api.text_to_stream(mute_message, context_stream_id)
-
-                    print(f"[MuteControlChatter] Muted stream {context_stream_id} for {duration_minutes} minutes until {unmute_time}")
-                    return True, f"已设置在 {context_stream_id} 禁言 {duration_minutes} 分钟至 {unmute_time}"
-
-                # 调用辅助函数
-                success, message_result = await _execute_mute_logic_direct_from_chatter(stream_id)
-                if success:
-                    print(f"[MuteControlChatter] Processed mute alias '{alias}' in chatter. Result: {message_result}")
-                    # Chatter 通常不直接拦截流程，它更多是做分析和决策
-                    # 如果需要拦截，可能需要框架的其他机制
-                    # 这里我们只执行逻辑
-                else:
-                    print(f"[MuteControlChatter] Failed to process mute alias '{alias}' in chatter. Error: {message_result}")
-                break # 找到一个别名后就跳出循环
+        # 检查 Mute 别名
+        if alias_match is not None and alias_match.kind == ALIAS_KIND_MUTE:
+            alias = alias_match.alias
+            metrics.incr(COUNTER_ALIAS_MUTE)
+            chatter_logger.debug("Mute alias '%s' detected in stream %s (via Chatter).", alias, stream_id)
+            # 定义一个辅助函数来执行核心逻辑 (提示放入发送队列，整个过程没有 await)
+            def _execute_mute_logic_direct_from_chatter(context_stream_id):
+                # 检查插件主功能是否启用
+                if not config.plugin_enabled:
+                    get_notice_queue().notify(context_stream_id, "❌ 插件已被禁用。")
+                    return False, "Plugin is disabled"
+
+                # 检查静音功能是否启用
+                if not config.mute_enabled:
+                    get_notice_queue().notify(context_stream_id, "❌ 静音功能已被禁用。")
+                    return False, "Mute feature is disabled"
+
+                # 使用实例属性中的默认时长
+                duration_minutes = config.default_mute_minutes
+
+                # 计算解除禁言的时间
+                unmute_time = datetime.now() + timedelta(minutes=duration_minutes)
+
+                # 更新禁言注册表
+                # 幂等：多人连续刷别名时，已禁言且截止时间没有比当前晚出冷却窗口的请求不写存储也不回复
+                start = time.perf_counter_ns()
+                extended = mute_registry.mute_if_extends(context_stream_id, unmute_time.timestamp(), config.mute_cooldown_seconds)
+                if sampled:
+                    metrics.observe(STAGE_REGISTRY, time.perf_counter_ns() - start)
+                if not extended:
+                    chatter_logger.debug("Stream %s is already muted past %s, ignoring repeated mute alias.", context_stream_id, unmute_time)
+                    return True, f"{context_stream_id} 已处于禁言中，忽略重复的禁言请求"
+
+                # 从配置中获取提示词
+                mute_message_template = config.mute_start
+                unmute_time_str = unmute_time.strftime('%H:%M')
+                mute_message = mute_message_template.format(unmute_time_str=unmute_time_str)
+
+                # 确认消息由发送队列限速发出，连续刷别名时相同的待发提示只保留一条
+                start = time.perf_counter_ns()
+                get_notice_queue().notify(context_stream_id, mute_message)
+                if sampled:
+                    metrics.observe(STAGE_NOTIFY, time.perf_counter_ns() - start)
+
+                chatter_logger.info("Muted stream %s for %s minutes until %s", context_stream_id, duration_minutes, unmute_time)
+                return True, f"已设置在 {context_stream_id} 禁言 {duration_minutes} 分钟至 {unmute_time}"
+
+            # 调用辅助函数 (修改状态与提示入队之间没有 await，不会被并发的禁言/解除打断)
+            success, message_result = _execute_mute_logic_direct_from_chatter(stream_id)
+            if success:
+                chatter_logger.info("Processed mute alias '%s' in chatter. Result: %s", alias, message_result)
+                # Chatter 通常不直接拦截流程，它更多是做分析和决策
+                # 如果需要拦截，可能需要框架的其他机制
+                # 这里我们只执行逻辑
+            else:
+                chatter_logger.error("Failed to process mute alias '%s' in chatter. Error: %s", alias, message_result)
 
         # 检查 Unmute 别名
-        for alias in self.unmute_aliases:
-            if message_content.startswith(alias):
-                # 定义一个辅助函数来执行 unmute 逻辑
-                async def _execute_unmute_logic_direct_from_chatter(context_stream_id):
-                    # 获取存储实例
-                    plugin_storage = storage_api.get_local_storage(PLUGIN_NAME)
-
-                    # 获取插件配置
-                    # 检查插件主功能是否启用 # --- 修改：使用实例属性 ---
-                    if not self.plugin_enabled_val:
-                        await send_api.text_to_stream("❌ 插件已被禁用。", context_stream_id)
-                        return False, "Plugin is disabled."
-
-                    # 检查静音功能是否启用 # --- 修改：使用实例属性 ---
-                    if not self.mute_enabled_val:
-                        await send_api.text_to_stream("❌ 静音功能已被禁用。", context_stream_id)
-                        return False, "Mute feature is disabled."
-
-                    # 从存储中移除该聊天流的禁言记录
-                    current_muted_streams: Dict[str, float] = plugin_storage.get(STORAGE_KEY_MUTED_STREAMS, {})
-                    if context_stream_id in current_muted_streams:
-                        del current_muted_streams[context_stream_id]
-                        plugin_storage.set(STORAGE_KEY_MUTED_STREAMS, current_muted_streams)
-                        print(f"[MuteControlChatter] Unmuted stream {context_stream_id} via alias handler (from chatter).")
-                    else:
-                        print(f"[MuteControlChatter] Attempted to unmute stream {context_stream_id} via alias handler (from chatter), but it was not muted.")
-                        # 即使未被禁言，也可能需要发送消息
-                        await send_api.text_to_stream("我当前并未被禁言哦。", context_stream_id)
-                        return False, f"尝试取消 {context_stream_id} 的禁言，但该聊天流未被禁言。"
-
-                    # 从配置中获取提示词
-                    unmute_message = self.messages_config_val.get("unmute_start", "好的，我恢复发言了！") # --- 修改：使用实例属性 ---
-
-                    # 发送确认消息
-                    await send_api.text_to_stream(unmute_message, context_stream_id)
-
-                    # 尝试触发一次主动思考
-                    # 需要 chat_stream 对象
-                    # 通过 chat_api 获取 ChatManager，再获取 ChatStream
-                    try:
-                        from src.chat.message_receive.chat_stream import get_chat_manager # 获取 ChatManager 单例
-                        chat_manager = get_chat_manager()
-                        chat_stream_obj = await chat_manager.get_stream(context_stream_id) # 尝试从 ChatManager 获取 ChatStream 对象
-                        if chat_stream_obj:
-                            # 如果能获取到 ChatStream，再尝试触发思考
-                            replyer =await generator_api.get_replyer(chat_stream=chat_stream_obj)
-                            if replyer:
-                                success, reply_set, prompt = await generator_api.generate_reply(
-                                    chat_stream=chat_stream_obj,
-                                    action_data={"type": "unmute_trigger", "message": "Bot was unmuted via alias (from chatter)."}, # 模拟动作数据
-                                    reply_to="", # 不回复特定消息
-                                    available_actions=[], # 不提供具体动作，让模型决定
-                                    enable_tool=False, # 暂时禁用工具调用
-                                    return_prompt=False
-                                )
-                                if success:
-                                    print(f"[MuteControlChatter] Attempted to trigger thinking after unmute alias (from chatter) in {context_stream_id}.")
-                                else:
-                                    print(f"[MuteControlChatter] Failed to generate reply/trigger thinking after unmute alias (from chatter) in {context_stream_id}.")
-                            else:
-                                print(f"[MuteControlChatter] Could not get replyer for stream {context_stream_id} to trigger thinking after unmute alias (from chatter).")
-                        else:
-                            print(f"[MuteControlChatter] Warning: Could not get ChatStream object from ChatManager for {context_stream_id} to trigger thinking after unmute alias (from chatter).")
-                    except Exception as e:
-                        print(f"[MuteControlChatter] Error trying to get ChatStream from ChatManager or trigger thinking after unmute alias (from chatter): {e}")
-
-                    return True, f"已取消 {context_stream_id} 的禁言，并尝试触发思考。"
-
-                # 调用辅助函数
-                success, message_result = await _execute_unmute_logic_direct_from_chatter(stream_id)
-                if success:
-                    print(f"[MuteControlChatter] Processed unmute alias '{alias}' in chatter. Result: {message_result}")
+        elif alias_match is not None and alias_match.kind == ALIAS_KIND_UNMUTE:
+            alias = alias_match.alias
+            metrics.incr(COUNTER_ALIAS_UNMUTE)
+            # 定义一个辅助函数来执行 unmute 逻辑 (提示放入发送队列，整个过程没有 await)
+            def _execute_unmute_logic_direct_from_chatter(context_stream_id):
+                # 获取插件配置
+                # 检查插件主功能是否启用
+                if not config.plugin_enabled:
+                    get_notice_queue().notify(context_stream_id, "❌ 插件已被禁用。")
+                    return False, "Plugin is disabled."
+
+                # 检查静音功能是否启用
+                if not config.mute_enabled:
+                    get_notice_queue().notify(context_stream_id, "❌ 静音功能已被禁用。")
+                    return False, "Mute feature is disabled."
+
+                # 从禁言注册表中移除该聊天流的禁言记录
+                start = time.perf_counter_ns()
+                unmuted = mute_registry.unmute(context_stream_id)
+                if sampled:
+                    metrics.observe(STAGE_REGISTRY, time.perf_counter_ns() - start)
+                if unmuted:
+                    chatter_logger.info("Unmuted stream %s via alias handler (from chatter).", context_stream_id)
                 else:
-                    print(f"[MuteControlChatter] Failed to process unmute alias '{alias}' in chatter. Error: {message_result}")
-                break # 找到一个别名后就跳出循环
+                    chatter_logger.debug("Attempted to unmute stream %s via alias handler (from chatter), but it was not muted.", context_stream_id)
+                    # 即使未被禁言，也可能需要发送消息
+                    get_notice_queue().notify(context_stream_id, "我当前并未被禁言哦。")
+                    return False, f"尝试取消 {context_stream_id} 的禁言，但该聊天流未被禁言。"
+
+                # 从配置中获取提示词
+                unmute_message = config.unmute_start
+
+                # 确认消息由发送队列限速发出
+                start = time.perf_counter_ns()
+                get_notice_queue().notify(context_stream_id, unmute_message)
+                if sampled:
+                    metrics.observe(STAGE_NOTIFY, time.perf_counter_ns() - start)
+
+                # 尝试触发一次主动思考 (在后台任务池中执行，ChatStream 由任务通过 ChatManager 获取)
+                get_thinking_pool().submit(context_stream_id, lambda: _trigger_thinking(
+                    context_stream_id,
+                    {"type": "unmute_trigger", "message": "Bot was unmuted via alias (from chatter)."}, # 模拟动作数据
+                    log=chatter_logger,
+                ))
+
+                return True, f"已取消 {context_stream_id} 的禁言，并尝试触发思考。"
+
+            # 调用辅助函数 (修改状态与提示入队之间没有 await，不会被并发的禁言/解除打断)
+            success, message_result = _execute_unmute_logic_direct_from_chatter(stream_id)
+            if success:
+                chatter_logger.info("Processed unmute alias '%s' in chatter. Result: %s", alias, message_result)
+            else:
+                chatter_logger.error("Failed to process unmute alias '%s' in chatter. Error: %s", alias, message_result)
 
         # --- 2. 检查是否为 @ 唤醒 ---
         # 先检查功能开关
-        if not self.at_unmute_enabled_val:
-            print(f"[MuteControlChatter] @ unmute feature is disabled, skipping @ check for stream {stream_id}.")
+        if not config.at_unmute_enabled:
+            chatter_logger.debug("@ unmute feature is disabled, skipping @ check for stream %s.", stream_id)
         else:
-            print(f"[MuteControlChatter] @ unmute feature is enabled, checking for @ in stream {stream_id}.")
-            # 尝试从 last_message 获取 mentioned_user_ids
-            # last_message 应该是 Message 或其子类的实例
-            # 根据 MoFox 消息结构，@ 信息在 message_segment 中
-            mentioned_user_ids = []
-
-            message_segment = getattr(last_message, 'message_segment', None)
-            if message_segment:
-                # message_segment 是 Seg 类型
-                # 需要递归遍历 Seg 或 Seg.data (如果是 seglist)
-                def extract_at_ids(segment):
-                    ids = []
-                    if segment.type == "at":
-                        # seg.data 可能是 "昵称:QQ号", "QQ号", 或者 {"qq": "QQ号"}
-                        at_data = segment.data
-                        if isinstance(at_data, str):
-                            # 尝试按冒号分割，取后半部分作为 QQ 号
-                            parts = at_data.split(":", 1)
-                            if len(parts) == 2:
-                                ids.append(parts[1]) # 取 QQ 号部分
-                            else:
-                                ids.append(at_data) # 如果没有冒号，整个字符串可能是 QQ 号
-                        elif isinstance(at_data, dict) and 'qq' in at_data:
-                            # 处理 {'qq': 'QQ号'} 格式
-                            ids.append(str(at_data['qq'])) # 确保 ID 是字符串
-                    elif segment.type == "seglist" and isinstance(segment.data, list):
-                        # 递归处理列表中的每个 segment
-                        for sub_seg in segment.data:
-                            ids.extend(extract_at_ids(sub_seg))
-                    return ids
-
-                mentioned_user_ids = extract_at_ids(message_segment)
-
-            print(f"[MuteControlChatter] Extracted @ mentions from message_segment: {mentioned_user_ids}") # 添加调试日志
-
-            if mentioned_user_ids:
-                try:
-                    from src.config.config import global_config
-                    bot_id = str(global_config.bot.qq_account) # 确保 bot_id 也是字符串
-                    print(f"[MuteControlChatter] Bot ID (from config): {bot_id}") # 添加调试日志
-                except ImportError:
-                    print("[MuteControlChatter] Error: Could not import global_config to get bot_id for @ check.")
+            chatter_logger.debug("@ unmute feature is enabled, checking for @ in stream %s.", stream_id)
+            # 根据 MoFox 消息结构，@ 信息在 message_segment 中 (可能嵌套在 seglist 里)
+            # 迭代扫描消息段，遇到第一个 @Bot 即停止，不再先提取全部 @ 再比较
+            start = time.perf_counter_ns()
+            if global_config is None:
+                if next(iter_mentions(getattr(last_message, 'message_segment', None)), None) is not None:
+                    chatter_logger.error("Could not import global_config to get bot_id for @ check.")
                     return {"success": False, "stream_id": stream_id, "error_message": "Failed to get bot ID."}
+                bot_mentioned = False
+            else:
+                bot_id = str(global_config.bot.qq_account) # 确保 bot_id 也是字符串
+                bot_mentioned = message_mentions(last_message, (bot_id,))
+            if sampled:
+                metrics.observe(STAGE_MENTION, time.perf_counter_ns() - start)
+
+            if bot_mentioned:
+                chatter_logger.debug("Bot @%s mentioned in stream %s (via Chatter). Checking mute status for auto-unmute.", bot_id, stream_id)
+                # 检查是否处于禁言状态
+                # 检查与解除在同一步完成 (中间没有 await)，不会被并发的禁言/解除打断
+                start = time.perf_counter_ns()
+                unmuted = mute_registry.unmute_if_muted(stream_id)
+                if sampled:
+                    metrics.observe(STAGE_REGISTRY, time.perf_counter_ns() - start)
+                if unmuted:
+                    # Bot 被 @ 且正处于禁言状态，自动解除禁言
+                    metrics.incr(COUNTER_AT_UNMUTE)
+                    chatter_logger.info("Unmuted stream %s because Bot was mentioned (@) (from chatter).", stream_id)
+
+                    # 从配置中获取提示词
+                    at_unmute_message = config.at_unmute
 
-                print(f"[MuteControlChatter] Checking if bot_id '{bot_id}' is in extracted mentioned_user_ids {mentioned_user_ids}")
-                if bot_id in mentioned_user_ids:
-                    print(f"[MuteControlChatter] Bot @{bot_id} mentioned in stream {stream_id} (via Chatter). Checking mute status for auto-unmute.")
-                    # 检查是否处于禁言状态
-                    plugin_storage = storage_api.get_local_storage(PLUGIN_NAME)
-                    current_muted_streams: Dict[str, float] = plugin_storage.get(STORAGE_KEY_MUTED_STREAMS, {})
-                    if stream_id in current_muted_streams:
-                        mute_until_timestamp = current_muted_streams[stream_id]
-                        current_time = time.time()
-                        if current_time < mute_until_timestamp:
-                            # Bot 被 @ 且正处于禁言状态，自动解除禁言
-                            del current_muted_streams[stream_id]
-                            plugin_storage.set(STORAGE_KEY_MUTED_STREAMS, current_muted_streams)
-                            print(f"[MuteControlChatter] Unmuted stream {stream_id} because Bot was mentioned (@) (from chatter).")
-
-                            # 从配置中获取提示词
-                            at_unmute_message = self.messages_config_val.get("at_unmute", "我被 @ 了，所以恢复发言啦！") # --- 修改：使用实例属性 ---
-
-                            # 发送解除禁言的消息
-                            await send_api.text_to_stream(at_unmute_message, stream_id)
-
-                            # 尝试触发一次主动思考 (同样使用 ChatManager)
-                            try:
-                                from src.chat.message_receive.chat_stream import get_chat_manager # 获取 ChatManager 单例
-                                chat_manager = get_chat_manager() 
-                                chat_stream_obj = await chat_manager.get_stream(stream_id) # 尝试从 ChatManager 获取 ChatStream 对象
-                                if chat_stream_obj:
-                                    # 如果能获取到 ChatStream，再尝试触发思考
-                                    replyer = await generator_api.get_replyer(chat_stream=chat_stream_obj) # <--- 加 await --->
-                                    if replyer:
-                                        success, reply_set, prompt = await generator_api.generate_reply(
-                                            chat_stream=chat_stream_obj,
-                                            action_data={"type": "at_unmute_trigger", "message": f"Bot was mentioned (@) by {getattr(last_message, 'user_info', {}).get('user_nickname', 'Someone')} (from chatter)."}, # 模拟动作数据
-                                            reply_to="", # 不回复特定消息
-                                            available_actions=[], # 不提供具体动作，让模型决定
-                                            enable_tool=False, # 暂时禁用工具调用
-                                            return_prompt=False
-                                        )
-                                        if success:
-                                            print(f"[MuteControlChatter] Attempted to trigger thinking after @ unmute (from chatter) in {stream_id}.")
-                                        else:
-                                            print(f"[MuteControlChatter] Failed to generate reply/trigger thinking after @ unmute (from chatter) in {stream_id}.")
-                                    else:
-                                        print(f"[MuteControlChatter] Could not get replyer for stream {stream_id} to trigger thinking after @ unmute (from chatter).")
-                                else:
-                                    print(f"[MuteControlChatter] Warning: Could not get ChatStream object from ChatManager for {stream_id} to trigger thinking after @ unmute (from chatter).")
-                            except Exception as e:
-                                print(f"[MuteControlChatter] Error trying to get ChatStream from ChatManager or trigger thinking after @ unmute (from chatter): {e}")
-
-                            # 这里不返回特殊标记，因为 Chatter 通常不直接阻断流程
-                            # 但我们可以设置一个内部状态，或者依赖其他机制来确保 Bot 响应这次 @
-
-                    else:
-                        print(f"[MuteControlChatter] Bot was mentioned (@) in stream {stream_id} (via Chatter), but it was not muted.")
+                    # 解除禁言的提示放入发送队列，由后台任务限速发出
+                    start = time.perf_counter_ns()
+                    get_notice_queue().notify(stream_id, at_unmute_message)
+                    if sampled:
+                        metrics.observe(STAGE_NOTIFY, time.perf_counter_ns() - start)
+
+                    # 尝试触发一次主动思考 (同样在后台任务池中执行)
+                    get_thinking_pool().submit(stream_id, lambda: _trigger_thinking(
+                        stream_id,
+                        {"type": "at_unmute_trigger", "message": f"Bot was mentioned (@) by {getattr(last_message, 'user_info', {}).get('user_nickname', 'Someone')} (from chatter)."}, # 模拟动作数据
+                        log=chatter_logger,
+                    ))
+
+                    # 这里不返回特殊标记，因为 Chatter 通常不直接阻断流程
+                    # 但我们可以设置一个内部状态，或者依赖其他机制来确保 Bot 响应这次 @
 
                 else:
-                    print(f"[MuteControlChatter] Bot ID '{bot_id}' was not found in the extracted mentioned_user_ids list {mentioned_user_ids} for stream {stream_id}.")
+                    chatter_logger.debug("Bot was mentioned (@) in stream %s (via Chatter), but it was not muted.", stream_id)
             else:
-                print(f"[MuteControlChatter] No user IDs found in message_segment for @ mentions for stream {stream_id}.")
+                chatter_logger.debug("Bot was not mentioned (@) in stream %s (via Chatter).", stream_id)
         # --- 3. 检查当前聊天流是否被禁言，并决定是否返回拦截标记 ---
-        # 使用 self.stream_id (实例属性)
-        current_muted_streams: Dict[str, float] = plugin_storage.get(STORAGE_KEY_MUTED_STREAMS, {})
-        print(f"[MuteControlChatter] Checking mute status for stream {stream_id}. Current muted streams from storage: {current_muted_streams}") # 添加调试日志
-        current_muted_streams = plugin_storage.get(STORAGE_KEY_MUTED_STREAMS, {}) # 再次获取，确认是否有变化
-        print(f"[MuteControlChatter] Final muted streams from storage in execute (for check): {current_muted_streams}") # 添加调试日志
-
+        # 使用 self.stream_id (实例属性)，手动禁言与安静时段取较晚的截止时间
+        # (安静时段的状态已预先算好，只在切换时刻重新计算)
+        start = time.perf_counter_ns()
+        current_time = time.time()
+        mute_until_timestamp = mute_registry.muted_until(stream_id, current_time)
+        if sampled:
+            metrics.observe(STAGE_REGISTRY, time.perf_counter_ns() - start)
 
-        if stream_id in current_muted_streams:
-            mute_until_timestamp = current_muted_streams[stream_id]
-            current_time = time.time()
-            print(f"[MuteControlChatter] Stream {stream_id} is muted until timestamp {mute_until_timestamp}. Current time is {current_time}.") # 添加调试日志
+        if mute_until_timestamp is not None:
+            chatter_logger.debug("Stream %s is muted until timestamp %s. Current time is %s.", stream_id, mute_until_timestamp, current_time) # 添加调试日志
 
             if current_time < mute_until_timestamp:
                 # 当前时间仍在禁言时间内
-                print(f"[MuteControlChatter] New message in muted stream {stream_id} (via Chatter). Time remaining: {timedelta(seconds=int(mute_until_timestamp - current_time))}.")
+                chatter_logger.debug("New message in muted stream %s (via Chatter). Time remaining: %.0fs.", stream_id, mute_until_timestamp - current_time)
                 # 从配置中获取禁言期间的提示词（如果有的话）
-                mute_reply_message = self.messages_config_val.get("muted_reply", "") # 默认为空，不回复 # --- 修改：使用实例属性 ---
+                mute_reply_message = config.muted_reply # 默认为空，不回复
                 if mute_reply_message:
                     # 可以选择是否回复一条消息告知用户处于禁言状态
                     # 但通常禁言就是不回复，所以这里可以选择不发送
                     # await send_api.text_to_stream(mute_reply_message, stream_id)
                     pass
                 # 返回 HandlerResult，设置 continue_process=False 以拦截消息
+                metrics.incr(COUNTER_INTERCEPTED)
                 return {
                     "success": True,
                     "stream_id": stream_id,
@@ -571,14 +665,9 @@ class MuteControlChatter(BaseChatter):
                     "block_follow_up_processing": True, # 关键：标记阻止后续处理
                     "message": "Message intercepted due to mute (from Chatter)."
                 }
-            else:
-                # 禁言时间已过，移除记录
-                print(f"[MuteControlChatter] Mute expired for stream {stream_id} (checked via Chatter). Removing from list.")
-                del current_muted_streams[stream_id]
-                plugin_storage.set(STORAGE_KEY_MUTED_STREAMS, current_muted_streams)
-                # print(f"[MuteControlChatter] Mute expired for stream {stream_id} (checked via Chatter). Removed from muted list.")
+            # 禁言时间已过的记录由注册表的后台清理任务统一移除，这里不再处理
         else:
-            print(f"[MuteControlChatter] Stream {stream_id} is NOT in the muted list at all.")
+            chatter_logger.debug("Stream %s is NOT in the muted list at all.", stream_id)
 
         # 如果没有别名、@唤醒或禁言拦截，则不阻止后续处理
         return {
@@ -620,6 +709,12 @@ class MuteAndUnmutePlugin(BasePlugin):
                 default=True,
                 description="是否启用 @Bot 唤醒功能。如果为 false，@Bot 将不会解除禁言。",
                 example=True
+            ),
+            "expire_notify_enabled": ConfigField(
+                type=bool,
+                default=False,
+                description="禁言到期自动解除时，是否在对应聊天流发送 unmute_start 提示消息。",
+                example=False
             )
         },
         "defaults": {
@@ -628,6 +723,20 @@ class MuteAndUnmutePlugin(BasePlugin):
                 default=10,
                 description="Bot 静音的默认时长（单位：分钟）。",
                 example=30
+            ),
+            "mute_cooldown_seconds": ConfigField(
+                type=float,
+                default=30.0,
+                description="重复禁言的冷却窗口（单位：秒）。已禁言时，新的截止时间不比当前截止时间晚这么多的禁言请求被忽略，不写入存储也不回复。0 表示只忽略不会延长禁言的请求。",
+                example=30.0
+            )
+        },
+        "permissions": {
+            "master_users": ConfigField(
+                type=list,
+                default=[],
+                description="可以使用批量操作 (--all / --streams / --match) 与 /mute_stats reset 的用户ID列表。留空则任何人都不能使用这些操作。",
+                example=["123456789"]
             )
         },
         "aliases": {
@@ -669,39 +778,198 @@ class MuteAndUnmutePlugin(BasePlugin):
                 description="Bot 被 @ 时自动解除禁言后发送的提示消息。",
                 example="我被 @ 了，所以恢复发言啦！"
             )
+        },
+        "logging": {
+            "level": ConfigField(
+                type=str,
+                default="INFO",
+                description="插件日志级别 (DEBUG / INFO / WARNING / ERROR)。生产环境建议关闭 DEBUG。",
+                example="INFO"
+            ),
+            "queue_enabled": ConfigField(
+                type=bool,
+                default=True,
+                description="是否通过后台线程写出日志，避免日志 I/O 阻塞事件循环。",
+                example=True
+            )
+        },
+        "persistence": {
+            "journal_enabled": ConfigField(
+                type=bool,
+                default=True,
+                description="是否用追加式日志持久化禁言状态。启用后禁言在 Bot 重启后依然有效；关闭则每次变更整表写入 storage。",
+                example=True
+            ),
+            "journal_path": ConfigField(
+                type=str,
+                default="data/mute_and_unmute_plugin/mute_journal.jsonl",
+                description="追加式日志文件路径 (相对于 MoFox-Core 运行目录)。",
+                example="data/mute_and_unmute_plugin/mute_journal.jsonl"
+            ),
+            "compact_threshold": ConfigField(
+                type=int,
+                default=1000,
+                description="日志追加多少条后压缩一次 (把当前状态写为 storage 快照并清空日志)。",
+                example=1000
+            ),
+            "flush_window_ms": ConfigField(
+                type=int,
+                default=200,
+                description="写入合并窗口 (毫秒)。窗口内的所有禁言变更合并为一次落盘；0 表示每次变更立即落盘。",
+                example=200
+            )
+        },
+        "thinking": {
+            "max_concurrency": ConfigField(
+                type=int,
+                default=2,
+                description="解除禁言后“主动思考”最多同时进行几次生成。批量解除禁言时超出的部分排队等待。",
+                example=2
+            ),
+            "timeout_seconds": ConfigField(
+                type=float,
+                default=30.0,
+                description="单次主动思考的超时时间 (秒)，超时后放弃本次生成。0 表示不限制。",
+                example=30.0
+            ),
+            "max_pending": ConfigField(
+                type=int,
+                default=100,
+                description="排队与进行中的主动思考任务上限，超出时新的触发被丢弃。",
+                example=100
+            )
+        },
+        "quiet_hours": {
+            "rules": ConfigField(
+                type=list,
+                default=[],
+                description="每日安静时段，格式为 \"<stream_id> HH:MM-HH:MM\" (本地时间，可跨零点，\"00:00-24:00\" 表示全天)。时段内 Bot 保持静音，@Bot 或取消静音命令可提前结束当前时段。",
+                example=["<stream_id> 23:00-08:00"]
+            )
+        },
+        "sender": {
+            "max_concurrency": ConfigField(
+                type=int,
+                default=4,
+                description="同时发送提示消息的最大数量 (所有聊天流合计)。",
+                example=4
+            ),
+            "rate_per_second": ConfigField(
+                type=float,
+                default=5.0,
+                description="所有聊天流合计每秒最多发送的提示消息条数，避免批量操作时触发平台限流。0 表示不限速。",
+                example=5.0
+            ),
+            "per_stream_rate_per_second": ConfigField(
+                type=float,
+                default=0.5,
+                description="单个聊天流每秒最多发送的提示消息条数。0 表示不限速。",
+                example=0.5
+            ),
+            "per_stream_burst": ConfigField(
+                type=int,
+                default=2,
+                description="单个聊天流允许连续发出的提示条数 (令牌桶容量)，超出后按 per_stream_rate_per_second 限速。",
+                example=2
+            ),
+            "max_pending_per_stream": ConfigField(
+                type=int,
+                default=10,
+                description="单个聊天流排队中的提示上限，超出时丢弃新的提示。相同的待发提示总会合并为一条。",
+                example=10
+            )
+        },
+        "metrics": {
+            "enabled": ConfigField(
+                type=bool,
+                default=True,
+                description="是否记录禁言处理各阶段的耗时直方图与事件计数 (/mute_stats 查看)。",
+                example=True
+            ),
+            "prometheus_path": ConfigField(
+                type=str,
+                default="",
+                description="定期以 Prometheus 文本格式写出统计的文件路径 (相对于 MoFox-Core 运行目录)。留空则不导出。",
+                example="data/mute_and_unmute_plugin/metrics.prom"
+            ),
+            "export_interval_seconds": ConfigField(
+                type=float,
+                default=60.0,
+                description="写出统计文件的间隔 (秒)。",
+                example=60.0
+            ),
+            "stage_sample_every": ConfigField(
+                type=int,
+                default=16,
+                description="每条消息路径上的阶段耗时每 N 条消息记录一条 (1 表示逐条记录)。事件计数不采样。",
+                example=16
+            )
         }
     }
 
     async def on_plugin_loaded(self):
         """
         插件加载时的钩子函数。
-        清空存储中所有已保存的禁言列表，确保插件状态与程序状态一致。
-        并将插件配置缓存到 storage，供 Chatter 使用。
+        将禁言注册表绑定到插件 storage，并从快照与追加式日志恢复重启前仍未过期的禁言。
+        并将插件配置编译为只读快照供各组件使用，config.toml 变化时自动重新编译。
         """
         # --- 修改：获取存储实例 ---
         plugin_storage = storage_api.get_local_storage(PLUGIN_NAME)
 
-        # 获取当前存储的禁言列表
-        current_muted_streams: Dict[str, float] = plugin_storage.get(STORAGE_KEY_MUTED_STREAMS, {})
+        # 将 self.config (加载后的配置) 编译为快照 (同时设置插件日志)，并监视 config.toml 的变化
+        config_state.update(self.config)
+        config_state.watch_file(self._config_file_path())
+        logger.info("已编译插件配置，供各组件使用。")
 
-        if current_muted_streams:
-            # 如果列表不为空，则清空它
-            plugin_storage.set(STORAGE_KEY_MUTED_STREAMS, {})
-            print(f"[MuteAndUnmutePlugin] 在插件加载时清空了 {len(current_muted_streams)} 条旧的禁言记录。")
-        else:
-            print(f"[MuteAndUnmutePlugin] 插件加载时，禁言列表为空，无需清空。")
-
-        # 将当前加载的配置缓存到 storage，供 Chatter 使用
-        # 将 self.config (加载后的配置) 存储起来
-        config_to_cache = {
-            "plugin": self.config.get("plugin", {}),
-            "features": self.config.get("features", {}),
-            "defaults": self.config.get("defaults", {}),
-            "aliases": self.config.get("aliases", {}),
-            "messages": self.config.get("messages", {}),
-        }
-        plugin_storage.set("chatter_config", config_to_cache)
-        print(f"[MuteAndUnmutePlugin] 已将配置加载到 storage 中，供 Chatter 使用。")
+        # 禁言注册表由插件持有，所有组件共享同一份内存禁言表
+        # 从 storage 快照和追加式日志恢复重启前的禁言状态 (已过期的记录会被丢弃)
+        config = config_state.current
+        journal = MuteJournal(config.journal_path) if config.journal_enabled else None
+        self.mute_registry = get_mute_registry()
+        restored_count = self.mute_registry.bind_storage(
+            plugin_storage, journal, config.journal_compact_threshold, config.flush_window_ms
+        )
+        logger.info("插件加载时恢复了 %s 条未过期的禁言记录。", restored_count)
+
+        # 启动后台过期清理任务，到期的禁言按批移除
+        self.mute_registry.start_sweeper(self._on_mutes_expired)
+
+        # 所有提示消息经限速的发送队列发出 (限速参数随配置快照更新)，每次实际发送的耗时记入 send 阶段
+        get_notice_queue().bind(get_mute_metrics().timed(STAGE_SEND, send_api.text_to_stream))
+
+        # 按配置定期把统计写为 Prometheus 文本 (导出路径随配置快照更新)
+        get_mute_metrics().start_export()
+
+    async def on_plugin_unloaded(self):
+        """
+        插件卸载时的钩子函数。
+        停止后台任务 (包括尚未完成的主动思考与尚未发出的提示)，并把写入缓冲中尚未落盘的禁言变更写出；
+        最后停止日志的后台线程 (写完队列中的日志) 并移除插件安装的处理器。
+        """
+        await self.mute_registry.stop_sweeper()
+        await config_state.stop_watching()
+        await get_thinking_pool().shutdown()
+        await get_notice_queue().shutdown()
+        await get_mute_metrics().stop_export()
+        self.mute_registry.close()
+        stats = self.mute_registry.flush_stats()
+        logger.info("插件卸载，禁言状态已落盘 (共 %s 次写入，平均 %.3fms，最大 %.3fms)。",
+                    stats["flush_count"], stats["avg_flush_ms"], stats["max_flush_ms"])
+        shutdown_logging()
+
+    def _config_file_path(self) -> str:
+        """插件 config.toml 的路径 (MoFox-Core/config/plugins/<plugin_name>/config.toml)。"""
+        return os.path.join("config", "plugins", PLUGIN_NAME, self.config_file_name)
+
+    async def _on_mutes_expired(self, stream_ids: List[str]):
+        """禁言到期回调：按配置在对应聊天流发送恢复发言的提示。"""
+        logger.info("%s mute(s) expired and were removed.", len(stream_ids))
+        get_mute_metrics().incr(COUNTER_EXPIRED, len(stream_ids))
+        config = config_state.current
+        if not config.expire_notify_enabled:
+            return
+        # 提示经限速的发送队列发出，大批禁言同时到期时不会一次性触发平台限流
+        _queue_bulk_notices(stream_ids, config.unmute_start)
 
     def get_plugin_components(self) -> List[Tuple[ComponentInfo, Type]]:
         components = []
@@ -709,10 +977,12 @@ class MuteAndUnmutePlugin(BasePlugin):
         # 注册主命令 (用于 /mute_mai 和 /unmute_mai)
         components.append((MuteMaiCommand.get_plus_command_info(), MuteMaiCommand)) # --- 修改：使用 get_plus_command_info ---
         components.append((UnmuteMaiCommand.get_plus_command_info(), UnmuteMaiCommand)) # --- 修改：使用 get_plus_command_info ---
+        # 注册统计命令 (/mute_stats)
+        components.append((MuteStatsCommand.get_plus_command_info(), MuteStatsCommand))
 
         # --- 修改：注册 Chatter 组件 (处理别名、@唤醒和禁言检查) ---
         # 直接传递 Chatter 类，框架负责实例化
-        # 配置由 Chatter 在其 execute 方法中通过 self.get_config 或其他方式获取
+        # 配置由 Chatter 在其 execute 方法中通过 config_state.current 获取
         components.append((MuteControlChatter.get_chatter_info(), MuteControlChatter)) # --- 修改：直接传递类 ---        
         
         return components
\ No newline at end of file